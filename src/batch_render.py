@@ -0,0 +1,176 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from canvas_writer import SAVE_FORMATS, write_image
+from capture_config import parse_size
+from drawing_canvas import DrawingCanvas
+from session_file import Session
+from stroke_journal import SHAPE_NAMES
+
+
+def scaled_strokes(session, scale_x, scale_y):
+    """Session strokes as item dicts relative to the session origin, coordinates and brush sizes scaled"""
+    brush_scale = (scale_x + scale_y) / 2
+    items = session.items
+    x0 = np.rint((items['x0'].astype(np.int32) - session.x) * scale_x).astype(np.int32).tolist()
+    y0 = np.rint((items['y0'].astype(np.int32) - session.y) * scale_y).astype(np.int32).tolist()
+    x1 = np.rint((items['x1'].astype(np.int32) - session.x) * scale_x).astype(np.int32).tolist()
+    y1 = np.rint((items['y1'].astype(np.int32) - session.y) * scale_y).astype(np.int32).tolist()
+    thickness = np.maximum(1, np.rint(items['thickness'] * brush_scale)).astype(np.int32).tolist()
+    shapes = items['shape'].tolist()
+    colors = list(zip(items['b'].tolist(), items['g'].tolist(), items['r'].tolist()))
+
+    bounds = session.stroke_index.tolist()
+    for s in range(len(bounds) - 1):
+        stroke = []
+        for i in range(bounds[s], bounds[s + 1]):
+            shape = SHAPE_NAMES[shapes[i]]
+            item = {'color': colors[i], 'thickness': thickness[i], 'shape': shape}
+            if shape == 'NORMAL':
+                item['start'] = (x0[i], y0[i])
+                item['end'] = (x1[i], y1[i])
+            else:
+                item['point'] = (x0[i], y0[i])
+            stroke.append(item)
+        yield stroke
+
+
+def render_session(job):
+    """
+    Render one session file (runs in a worker process).
+    job: (input path, output path, scale, size, fmt)
+    Returns: (input path, output path, segments, seconds, error)
+    """
+    path, output, scale, size, fmt = job
+    start = time.perf_counter()
+    try:
+        session = Session(path)
+        try:
+            if size is not None:
+                width, height = size
+            else:
+                width = max(1, round(session.width * scale))
+                height = max(1, round(session.height * scale))
+            scale_x = width / session.width
+            scale_y = height / session.height
+
+            # Same brush code as the live canvas
+            canvas = DrawingCanvas(width, height)
+            for stroke in scaled_strokes(session, scale_x, scale_y):
+                canvas.render_stroke(stroke)
+
+            font_scale = (scale_x + scale_y) / 2
+            for text, (x, y), color, _ in session.text_items():
+                cv2.putText(canvas.canvas, text,
+                            (round((x - session.x) * scale_x), round((y - session.y) * scale_y)),
+                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, color,
+                            max(1, round(2 * font_scale)))
+            segments = len(session.items)
+        finally:
+            session.close()
+
+        if not write_image(output, canvas.canvas, fmt):
+            raise IOError("encoder failed")
+        return path, output, segments, time.perf_counter() - start, None
+    except Exception as e:
+        return path, output, 0, time.perf_counter() - start, str(e)
+
+
+def glob_root(pattern):
+    """Directory part of a glob pattern before its first wildcard ('a/b/**/*.x' -> 'a/b')"""
+    parts = []
+    for part in pattern.replace(os.sep, '/').split('/'):
+        if any(c in part for c in '*?['):
+            break
+        parts.append(part)
+    return '/'.join(parts) or '.'
+
+
+def collect_inputs(inputs):
+    """
+    Expand files, directories and glob patterns into session file paths.
+    Returns [(path, name)] - name is the path relative to the folder or the
+    pattern's fixed prefix (the basename for a plain file), without extension.
+    """
+    found = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            found.extend((path, entry) for path in
+                         sorted(glob.glob(os.path.join(entry, '**', '*.vhds'), recursive=True)))
+        elif any(c in entry for c in '*?['):
+            found.extend((path, glob_root(entry)) for path in sorted(glob.glob(entry, recursive=True)))
+        else:
+            found.append((entry, os.path.dirname(entry)))
+    return [(path, os.path.splitext(os.path.relpath(path, root or '.'))[0]) for path, root in found]
+
+
+def duplicate_outputs(outputs):
+    """Output paths claimed by more than one input"""
+    seen = set()
+    duplicates = set()
+    for output in outputs:
+        key = os.path.normcase(os.path.abspath(output))
+        if key in seen:
+            duplicates.add(output)
+        seen.add(key)
+    return sorted(duplicates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render saved drawing sessions (.vhds) to images")
+    parser.add_argument('inputs', nargs='+', help="session files, folders or glob patterns")
+    parser.add_argument('-o', '--output-dir', default='output/renders')
+    parser.add_argument('--scale', type=float, default=1.0, help="output scale (default 1.0)")
+    parser.add_argument('--size', type=parse_size, help="output size WIDTHxHEIGHT (overrides --scale)")
+    parser.add_argument('--format', default='png', choices=sorted(SAVE_FORMATS))
+    parser.add_argument('--suffix', default='', help="added to output names, e.g. _thumb")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("No session files found")
+        return 1
+
+    # Sub-folders of the inputs are mirrored under the output folder
+    extension = SAVE_FORMATS[args.format]
+    jobs = []
+    for path, name in inputs:
+        output = os.path.join(args.output_dir, f"{name}{args.suffix}{extension}")
+        jobs.append((path, output, args.scale, args.size, args.format))
+    duplicates = duplicate_outputs(job[1] for job in jobs)
+    if duplicates:
+        print(f"Several inputs would be rendered to {', '.join(duplicates)} - render them separately")
+        return 1
+
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"Rendering {len(jobs)} sessions with {workers} workers...")
+
+    start = time.perf_counter()
+    done = failed = segments = 0
+    with Pool(workers) as pool:
+        for path, output, count, seconds, error in pool.imap_unordered(render_session, jobs, chunksize=4):
+            done += 1
+            if error:
+                failed += 1
+                print(f"[{done}/{len(jobs)}] FAILED {path}: {error}")
+            else:
+                segments += count
+                print(f"[{done}/{len(jobs)}] {output} ({count} segments, {seconds * 1000:.0f} ms)")
+
+    elapsed = time.perf_counter() - start
+    print("-" * 70)
+    print(f"Rendered {done - failed}/{len(jobs)} sessions in {elapsed:.2f} s "
+          f"({(done - failed) / elapsed:.1f} sessions/s, {segments / elapsed:,.0f} segments/s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
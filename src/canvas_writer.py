@@ -0,0 +1,136 @@
+import cv2
+import os
+import queue
+import threading
+from datetime import datetime
+
+from session_file import save_session
+
+
+# Supported save formats: extension and how the compression setting maps to imwrite params
+SAVE_FORMATS = {
+    'png': '.png',             # Lossless, compression 0-9 (speed vs size)
+    'webp': '.webp',           # Lossy, compression = quality 1-100
+    'webp_lossless': '.webp',  # Lossless WebP
+    'bmp': '.bmp',             # Uncompressed, fastest to write
+}
+
+
+def imwrite_params(fmt, compression=None):
+    """Get cv2.imwrite params for format and compression setting"""
+    if fmt == 'png':
+        level = 3 if compression is None else max(0, min(9, compression))
+        return [cv2.IMWRITE_PNG_COMPRESSION, level]
+    if fmt == 'webp':
+        quality = 90 if compression is None else max(1, min(100, compression))
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if fmt == 'webp_lossless':
+        return [cv2.IMWRITE_WEBP_QUALITY, 101]  # Quality above 100 selects lossless
+    return []
+
+
+def make_filename(output_dir="output", fmt='png'):
+    """Timestamped output filename for format (milliseconds keep queued saves apart)"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    return f"{output_dir}/drawing_{timestamp}{SAVE_FORMATS[fmt]}"
+
+
+def write_image(filename, image, fmt='png', compression=None):
+    """Encode and write image, creating the output folder if needed"""
+    output_dir = os.path.dirname(filename)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+    return cv2.imwrite(filename, image, imwrite_params(fmt, compression))
+
+
+class CanvasWriter:
+    """
+    Background image / session writer.
+    Snapshots are queued from the render thread and encoded/written by a worker
+    thread, so the frame loop never blocks on encoding or disk I/O.
+    """
+    def __init__(self, output_dir="output", fmt='png', compression=None, max_pending=4):
+        if fmt not in SAVE_FORMATS:
+            raise ValueError(f"Unsupported save format: {fmt}")
+
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.compression = compression
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.completed = queue.Queue()  # (filename, success, error message)
+
+        self.worker = threading.Thread(target=self._run, name="CanvasWriter", daemon=True)
+        self.worker.start()
+
+    def submit(self, image, fmt=None, compression=None):
+        """
+        Queue a snapshot of image for saving (copies it, never blocks)
+        Returns: filename, or None if the queue is full
+        """
+        fmt = fmt or self.fmt
+        if compression is None:
+            compression = self.compression
+
+        filename = make_filename(self.output_dir, fmt)
+        snapshot = image.copy()
+        return self.submit_task(filename, lambda: write_image(filename, snapshot, fmt, compression))
+
+    def submit_session(self, canvas, filename=None):
+        """
+        Queue the canvas history, text and image for saving as a session file.
+        Only shallow snapshots are taken here; packing happens on the worker.
+        Returns: filename, or None if the queue is full
+        """
+        if filename is None:
+            filename = make_filename(self.output_dir, 'png')[:-len('.png')] + '.vhds'
+        history = list(canvas.stroke_history)
+        text_items = list(canvas.text_items)
+        raster = canvas.session_raster()
+        if raster is not None:
+            raster = raster.copy()
+        x, y, width, height = canvas.bounds()
+        return self.submit_task(filename, lambda: save_session(
+            filename, width, height, history, text_items, raster, origin=(x, y)) is not None)
+
+    def submit_task(self, filename, write):
+        """
+        Queue write() to run on the worker (never blocks)
+        Returns: filename, or None if the queue is full
+        """
+        try:
+            self.pending.put_nowait((filename, write))
+        except queue.Full:
+            return None
+        return filename
+
+    def _run(self):
+        """Worker loop - encode and write queued snapshots"""
+        while True:
+            job = self.pending.get()
+            if job is None:
+                self.pending.task_done()
+                break
+
+            filename, write = job
+            try:
+                ok = write()
+                self.completed.put((filename, ok, None if ok else "encoder failed"))
+            except Exception as e:
+                self.completed.put((filename, False, str(e)))
+            finally:
+                self.pending.task_done()
+
+    def poll_completed(self):
+        """Get finished saves since last call (call from the render thread)"""
+        results = []
+        while True:
+            try:
+                results.append(self.completed.get_nowait())
+            except queue.Empty:
+                return results
+
+    def close(self):
+        """Finish pending saves and stop the worker"""
+        self.pending.put(None)
+        self.worker.join()
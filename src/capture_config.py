@@ -0,0 +1,325 @@
+import argparse
+import sys
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+# Resolutions tried (after the requested one) when probing
+PROBE_SIZES = ((1280, 720), (960, 540), (640, 480))
+
+
+def fourcc_code(text):
+    """'MJPG' -> OpenCV FOURCC int"""
+    return cv2.VideoWriter_fourcc(*text.ljust(4)[:4])
+
+
+def fourcc_text(code):
+    """OpenCV FOURCC int (as returned by CAP_PROP_FOURCC) -> 'MJPG', '' if unknown"""
+    code = int(code)
+    text = "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+    return text if text.isprintable() and text.strip() else ""
+
+
+def parse_size(text):
+    """'1280x720' -> (1280, 720) (argparse type for every size option)"""
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("size must be WIDTHxHEIGHT, e.g. 320x180")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive, got {text}")
+    return width, height
+
+
+class CaptureConfig:
+    """
+    Requested capture mode. fourcc None keeps the driver's default format,
+    buffer_size None keeps its default queue depth. With probe=True every
+    format / resolution pair is tried and the fastest one is kept (see negotiate).
+    source is a camera index or a video file path.
+    """
+    def __init__(self, source=0, width=1280, height=720, fps=30, fourcc='MJPG',
+                 buffer_size=1, probe=False, probe_frames=8, fourccs=('MJPG', 'YUYV')):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc
+        self.buffer_size = buffer_size
+        self.probe = probe
+        self.probe_frames = probe_frames
+        self.fourccs = fourccs
+
+    @property
+    def device(self):
+        """Camera index (for per-camera files), 0 for a video file"""
+        return self.source if isinstance(self.source, int) else 0
+
+    @classmethod
+    def from_args(cls, args):
+        """Config from the --camera / --capture-* command line options"""
+        source = int(args.camera) if str(args.camera).isdigit() else args.camera
+        width, height = args.capture_size
+        fourcc = None if args.fourcc.lower() == 'any' else args.fourcc.upper()
+        buffer_size = args.buffer_size or None
+        probe = args.probe_capture and isinstance(source, int)  # probing would eat a file's frames
+        return cls(source, width, height, args.capture_fps, fourcc, buffer_size, probe)
+
+
+def add_arguments(parser):
+    """--camera / --capture-* options for an argparse parser"""
+    parser.add_argument('--camera', default='0',
+                        help="camera index or video file (default 0)")
+    parser.add_argument('--capture-size', type=parse_size, default='1280x720',
+                        help="requested capture resolution (default 1280x720)")
+    parser.add_argument('--capture-fps', type=int, default=30,
+                        help="requested capture fps (default 30)")
+    parser.add_argument('--fourcc', default='MJPG',
+                        help="capture format, e.g. MJPG, YUYV or 'any' for the driver default")
+    parser.add_argument('--buffer-size', type=int, default=1,
+                        help="frames queued by the driver, 0 for its default (default 1)")
+    parser.add_argument('--probe-capture', action='store_true',
+                        help="try every camera format / resolution and keep the fastest")
+
+
+def apply_mode(cap, fourcc, width, height, fps, buffer_size):
+    """Request a mode; the format goes first, V4L2 only applies it before the size"""
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, fourcc_code(fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    if buffer_size:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+
+def current_mode(cap):
+    """The mode the device actually runs: {fourcc, width, height, fps, buffer_size}"""
+    return {
+        'fourcc': fourcc_text(cap.get(cv2.CAP_PROP_FOURCC)),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps': cap.get(cv2.CAP_PROP_FPS),
+        'buffer_size': int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def measure_fps(cap, frames):
+    """Frames per second actually delivered by read() over a few frames"""
+    if not cap.read()[0]:  # the first frame after a mode change is often slow
+        return 0.0
+    start = time.perf_counter()
+    for _ in range(frames):
+        if not cap.read()[0]:
+            return 0.0
+    return frames / max(time.perf_counter() - start, 1e-6)
+
+
+def probe_modes(cap, config):
+    """
+    Try each format at the requested and fallback resolutions.
+    Returns [(mode, measured fps)] for the modes the device accepted.
+    """
+    sizes = [(config.width, config.height)] + [s for s in PROBE_SIZES if s != (config.width, config.height)]
+    results = []
+    seen = set()
+    for fourcc in config.fourccs:
+        for width, height in sizes:
+            apply_mode(cap, fourcc, width, height, config.fps, config.buffer_size)
+            mode = current_mode(cap)
+            key = (mode['fourcc'], mode['width'], mode['height'])
+            if key in seen or (fourcc and mode['fourcc'] and mode['fourcc'] != fourcc):
+                continue  # the driver fell back to a mode that was already measured
+            seen.add(key)
+            results.append((mode, measure_fps(cap, config.probe_frames)))
+    return results
+
+
+def best_mode(results, config):
+    """Prefer modes reaching ~the requested fps, then the largest, then the fastest"""
+    target = (config.fps or 30) * 0.9
+    max_area = config.width * config.height
+
+    def score(result):
+        mode, fps = result
+        area = mode['width'] * mode['height']
+        return (fps >= target, area <= max_area, min(area, max_area), fps)
+    return max(results, key=score)
+
+
+def negotiate(cap, config):
+    """
+    Configure cap for config and return the mode it actually runs.
+    With config.probe the measured modes are tried first and the best one is applied.
+    """
+    fourcc = config.fourcc
+    width, height = config.width, config.height
+    if config.probe:
+        results = probe_modes(cap, config)
+        if results:
+            mode, _ = best_mode(results, config)
+            fourcc = mode['fourcc'] or fourcc
+            width, height = mode['width'], mode['height']
+    apply_mode(cap, fourcc, width, height, config.fps, config.buffer_size)
+    return current_mode(cap)
+
+
+class CaptureStats:
+    """Read latency (time blocked in read()) and delivered fps over recent frames"""
+    def __init__(self, window=120):
+        self.latencies = deque(maxlen=window)
+        self.times = deque(maxlen=window)
+        self.frames = 0
+        self.failed = 0
+        self.dropped = 0  # frames the camera produced while the app was busy
+        self.nominal_fps = 0.0
+
+    def record(self, started, finished, ok):
+        if not ok:
+            self.failed += 1
+            return
+        if self.nominal_fps and self.times:
+            # Frames that arrived while the app was busy between reads (a slow camera isn't a drop)
+            missed = int((started - self.times[-1]) * self.nominal_fps + 0.5) - 1
+            if missed > 0:
+                self.dropped += missed
+        self.frames += 1
+        self.latencies.append(finished - started)
+        self.times.append(finished)
+
+    @property
+    def fps(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / max(self.times[-1] - self.times[0], 1e-6)
+
+    @property
+    def latency_ms(self):
+        """(mean, max) read latency in milliseconds"""
+        if not self.latencies:
+            return 0.0, 0.0
+        return sum(self.latencies) / len(self.latencies) * 1000, max(self.latencies) * 1000
+
+    def summary(self):
+        mean, worst = self.latency_ms
+        return (f"{self.fps:.1f} fps, read {mean:.1f} ms (max {worst:.1f} ms), "
+                f"{self.frames} frames, {self.dropped} dropped, {self.failed} failed reads")
+
+
+class CaptureDevice:
+    """
+    cv2.VideoCapture with a negotiated mode and timed reads.
+
+    Wraps any object with the VideoCapture interface (isOpened / set / get /
+    read / release), so a video file or a fake capture can stand in for a camera.
+    """
+    def __init__(self, cap, config=None):
+        self.cap = cap
+        self.config = config or CaptureConfig()
+        self.stats = CaptureStats()
+        self.mode = negotiate(cap, self.config) if cap.isOpened() else None
+        if self.mode is not None and isinstance(self.config.source, int):
+            self.stats.nominal_fps = self.mode['fps']  # a file is read as fast as it decodes
+
+    @classmethod
+    def open(cls, config):
+        """Open config.source (camera index or video file) and negotiate its mode"""
+        return cls(cv2.VideoCapture(config.source), config)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def read(self, image=None):
+        started = time.perf_counter()
+        ret, frame = self.cap.read(image)
+        self.stats.record(started, time.perf_counter(), ret)
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+    def describe(self):
+        """One line with the negotiated mode"""
+        if self.mode is None:
+            return "capture not opened"
+        mode = self.mode
+        return (f"{mode['fourcc'] or 'default format'} {mode['width']}x{mode['height']} "
+                f"@ {mode['fps']:g} fps, buffer {mode['buffer_size'] if mode['buffer_size'] > 0 else 'default'}")
+
+
+class _SyntheticCamera:
+    """
+    Fake USB camera for the negotiation demo: raw YUYV is bandwidth-limited to
+    a few fps at high resolutions, MJPG isn't, and read() blocks until the
+    next frame is due.
+    """
+    BANDWIDTH = 1280 * 720 * 10  # raw pixels per second the "USB link" carries
+
+    def __init__(self):
+        self.props = {cv2.CAP_PROP_FOURCC: fourcc_code('YUYV'), cv2.CAP_PROP_FRAME_WIDTH: 640,
+                      cv2.CAP_PROP_FRAME_HEIGHT: 480, cv2.CAP_PROP_FPS: 30, cv2.CAP_PROP_BUFFERSIZE: 4}
+        self.next_frame = time.perf_counter()
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return float(self.props.get(prop, 0))
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FOURCC and fourcc_text(value) not in ('YUYV', 'MJPG'):
+            return False
+        self.props[prop] = value
+        return True
+
+    def delivered_fps(self):
+        fps = min(self.props[cv2.CAP_PROP_FPS], 30)
+        if fourcc_text(self.props[cv2.CAP_PROP_FOURCC]) == 'YUYV':
+            area = self.props[cv2.CAP_PROP_FRAME_WIDTH] * self.props[cv2.CAP_PROP_FRAME_HEIGHT]
+            fps = min(fps, self.BANDWIDTH / area)
+        return fps
+
+    def read(self, image=None):
+        now = time.perf_counter()
+        self.next_frame = max(self.next_frame + 1 / self.delivered_fps(), now)
+        time.sleep(self.next_frame - now)
+        shape = (int(self.props[cv2.CAP_PROP_FRAME_HEIGHT]), int(self.props[cv2.CAP_PROP_FRAME_WIDTH]), 3)
+        if image is None or image.shape != shape:
+            image = np.zeros(shape, dtype=np.uint8)
+        return True, image
+
+    def release(self):
+        pass
+
+
+def _report(label, device, frames):
+    for _ in range(frames):
+        device.read()
+    print(f"{label:12s} {device.describe()}: {device.stats.summary()}")
+
+
+if __name__ == "__main__":
+    # python src/capture_config.py [camera index | video file] [--probe]
+    # - negotiate a real device, or compare default vs probed modes on a fake USB camera
+    args = [a for a in sys.argv[1:] if a != '--probe']
+    if args:
+        source = int(args[0]) if args[0].isdigit() else args[0]
+        device = CaptureDevice.open(CaptureConfig(source, probe='--probe' in sys.argv))
+        if not device.isOpened():
+            sys.exit(f"Cannot open {source}")
+        _report("negotiated", device, 60)
+        device.release()
+    else:
+        _report("driver", CaptureDevice(_SyntheticCamera(), CaptureConfig(fourcc=None, buffer_size=None)), 30)
+        _report("MJPG", CaptureDevice(_SyntheticCamera(), CaptureConfig()), 30)
+        _report("probed", CaptureDevice(_SyntheticCamera(), CaptureConfig(probe=True)), 30)
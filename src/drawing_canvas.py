@@ -1,14 +1,193 @@
 import cv2
 import numpy as np
-from datetime import datetime
-import random
+from canvas_writer import make_filename, write_image
+from stroke_simplify import simplify_stroke
+
+
+# Spray brush: particles per stamp and particle radius range
+SPRAY_PARTICLES = 40
+SPRAY_RADII = (1, 3)
+
+
+def item_bounds(item):
+    """Pixel bounds (x0, y0, x1, y1) a stroke item can touch"""
+    thickness = item['thickness']
+    if item['shape'] == 'NORMAL':
+        (x0, y0), (x1, y1) = item['start'], item['end']
+        pad = thickness // 2 + 2
+        return min(x0, x1) - pad, min(y0, y1) - pad, max(x0, x1) + pad, max(y0, y1) + pad
+    x, y = item['point']
+    pad = thickness + 1
+    return x - pad, y - pad, x + pad, y + pad
+
+
+def points_bounds(points, pad):
+    """Bounds (x0, y0, x1, y1) of points grown by pad"""
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad
+
+
+def draw_item(canvas, item, offset=(0, 0)):
+    """Render one recorded stroke item onto canvas, whose top-left sits at offset"""
+    ox, oy = offset
+    if item['shape'] == 'NORMAL':
+        (x0, y0), (x1, y1) = item['start'], item['end']
+        cv2.line(canvas, (x0 - ox, y0 - oy), (x1 - ox, y1 - oy), item['color'], item['thickness'])
+    elif item['shape'] in ('CIRCLE', 'SQUARE'):
+        draw_stamps(canvas, item['shape'], [item['point']], item['color'], item['thickness'], offset)
+
+
+def stamp_spacing(shape, thickness):
+    """
+    Distance between interpolated points. Squares and spray clouds must overlap their
+    neighbours; circles are drawn as one thick polyline, so points only shape the curve.
+    """
+    if shape == 'CIRCLE':
+        return max(4, thickness)
+    if shape == 'SQUARE':
+        return max(1, thickness)
+    return max(2, thickness * 2)
+
+
+def interpolate_span(p0, p1, p2, spacing):
+    """
+    Catmull-Rom points on the span p1 -> p2 (p1 excluded, p2 included), about spacing apart.
+    p0 is the point before p1. The tangent at p2 is extrapolated from p1 -> p2, so a span
+    can be drawn as soon as p2 arrives, and live drawing and replay give the same path.
+    """
+    (x0, y0), (x1, y1), (x2, y2) = p0, p1, p2
+    steps = int(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5 // spacing)
+    if steps <= 1:
+        return [p2]
+    x3, y3 = 2 * x2 - x1, 2 * y2 - y1
+    # Catmull-Rom in Horner form: p1 + t * (b + t * (c + t * d))
+    b = np.array([x2 - x0, y2 - y0]) * 0.5
+    c = np.array([2 * x0 - 5 * x1 + 4 * x2 - x3, 2 * y0 - 5 * y1 + 4 * y2 - y3]) * 0.5
+    d = np.array([3 * x1 - x0 - 3 * x2 + x3, 3 * y1 - y0 - 3 * y2 + y3]) * 0.5
+    t = np.arange(1, steps + 1)[:, None] / steps
+    points = np.rint((x1, y1) + t * (b + t * (c + t * d))).astype(np.int32)
+    return [tuple(p) for p in points.tolist()]
+
+
+def stamp_path(points, spacing):
+    """Interpolated path through recorded stamp points"""
+    path = [points[0]]
+    for i in range(1, len(points)):
+        path += interpolate_span(points[max(i - 2, 0)], points[i - 1], points[i], spacing)
+    return path
+
+
+def draw_stamps(canvas, shape, points, color, thickness, offset=(0, 0)):
+    """
+    Stamp a CIRCLE / SQUARE brush at every point.
+    Circles along a path are one thick polyline (a 2r thick line is exactly an r disc).
+    """
+    pts = np.array(points, dtype=np.int32).reshape(-1, 2) - np.array(offset, dtype=np.int32)
+    if shape == 'CIRCLE':
+        if len(pts) == 1:
+            pts = np.repeat(pts, 2, axis=0)
+        cv2.polylines(canvas, [pts.reshape(-1, 1, 2)], False, color, 2 * thickness)
+    else:
+        for x, y in pts.tolist():
+            cv2.rectangle(canvas, (x - thickness, y - thickness), (x + thickness, y + thickness), color, -1)
+
+
+def spray_particles(points, thickness, anchor):
+    """
+    Spray particles around each point: (N, 3) array of x, y, radius.
+    Random-looking, but seeded from the points relative to anchor (the stroke's first
+    point), so every render of a stroke (live, undo, replay, batch render, export,
+    broadcast viewers) sprays the same ones, wherever the stroke sits on the board.
+    """
+    seed = (points[0][0] - anchor[0], points[0][1] - anchor[1],
+            points[-1][0] - anchor[0], points[-1][1] - anchor[1], len(points), thickness)
+    rng = np.random.default_rng([v & 0xFFFFFFFF for v in seed])
+    pts = np.repeat(np.array(points, dtype=np.int32).reshape(-1, 2), SPRAY_PARTICLES, axis=0)
+    spread = thickness * 2
+    offsets = rng.integers(-spread, spread + 1, size=pts.shape, dtype=np.int32)
+    radii = rng.integers(SPRAY_RADII[0], SPRAY_RADII[1] + 1, size=(len(pts), 1), dtype=np.int32)
+    return np.hstack([pts + offsets, radii])
+
+
+def spray_span(before, last, point, thickness):
+    """
+    Points one spray item covers: the interpolated path from last (excluded) to point,
+    or point alone when the stroke starts there. before: the spray point before last, or None
+    """
+    if last is None:
+        return [point]
+    return interpolate_span(before if before is not None else last, last, point,
+                            stamp_spacing('SPRAY', thickness))
+
+
+def draw_particles(canvas, particles, color, offset=(0, 0)):
+    """Draw spray particles with one zero-length polyline batch per radius"""
+    for radius in range(SPRAY_RADII[0], SPRAY_RADII[1] + 1):
+        centers = particles[particles[:, 2] == radius, :2] - np.array(offset, dtype=np.int32)
+        if len(centers):
+            dots = np.repeat(centers, 2, axis=0).reshape(-1, 2, 1, 2)
+            cv2.polylines(canvas, list(dots), False, color, 2 * radius)
+
+
+def stroke_runs(stroke):
+    """
+    Group stroke items for batched rendering.
+    Yields (shape, color, thickness, points): connected NORMAL segments as one polyline,
+    consecutive CIRCLE / SQUARE stamps with the same style as one stamp path.
+    A SPRAY item is yielded on its own with its particles (spray_particles) as points.
+    """
+    run = None
+    items = list(stroke)
+    for i, item in enumerate(items):
+        shape = item['shape']
+        if shape == 'SPRAY':
+            if run is not None:
+                yield run[0] + (run[1],)
+                run = None
+            # Same path and particles as the live brush, which starts at the previous item's point
+            thickness = item['thickness']
+            last = items[i - 1].get('point', items[i - 1].get('end')) if i > 0 else None
+            before = items[i - 2]['point'] if i > 1 and items[i - 2]['shape'] == 'SPRAY' else None
+            anchor = items[0].get('point', items[0].get('start'))
+            particles = spray_particles(spray_span(before, last, item['point'], thickness), thickness, anchor)
+            yield 'SPRAY', item['color'], thickness, particles
+            continue
+        key = (shape, item['color'], item['thickness'])
+        if shape == 'NORMAL':
+            if run is not None and run[0] == key and run[1][-1] == item['start']:
+                run[1].append(item['end'])
+                continue
+            new_run = (key, [item['start'], item['end']])
+        else:
+            if run is not None and run[0] == key and run[0][0] != 'NORMAL':
+                run[1].append(item['point'])
+                continue
+            new_run = (key, [item['point']])
+        if run is not None:
+            yield run[0] + (run[1],)
+        run = new_run
+    if run is not None:
+        yield run[0] + (run[1],)
+
+
+def draw_run(canvas, shape, color, thickness, points, offset=(0, 0)):
+    """Render one run from stroke_runs with a single polylines call (or stamp loop)"""
+    if shape == 'SPRAY':
+        draw_particles(canvas, points, color, offset)
+    elif shape == 'NORMAL':
+        pts = np.array(points, dtype=np.int32) - np.array(offset, dtype=np.int32)
+        cv2.polylines(canvas, [pts.reshape(-1, 1, 2)], False, color, thickness)
+    else:
+        draw_stamps(canvas, shape, stamp_path(points, stamp_spacing(shape, thickness)),
+                    color, thickness, offset)
 
 
 class DrawingCanvas:
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        self.reset_surface()
         
         # Drawing settings
         self.current_color = (0, 255, 0)  # Green
@@ -28,9 +207,30 @@ class DrawingCanvas:
         self.stroke_history = []
         self.current_stroke = []
         
+        # One stroke in progress per hand: current_stroke / last_point belong to
+        # stroke_key, the others wait in hand_strokes as (stroke, last point)
+        self.stroke_key = None
+        self.hand_strokes = {}
+        
+        # Finished strokes are simplified (RDP, pixels; 0 = keep every segment)
+        self.simplify_tolerance = 1.0
+        self.items_recorded = 0
+        self.items_stored = 0
+        
+        # Activity counters (metrics endpoint): points drawn, history events by name
+        self.points_drawn = 0
+        self.event_counts = {}
+        
         # Text input
         self.text_input = ""
         self.text_position = None
+        # Text currently on the canvas: (text, position, color, strokes before it)
+        self.text_items = []
+        
+        # History change listeners (journal, broadcast, ...)
+        self.listeners = []
+        # Live drawing listeners (broadcast): every point, before its stroke ends
+        self.live_listeners = []
         
         # Color palette
         self.colors = {
@@ -56,7 +256,15 @@ class DrawingCanvas:
         }
     
     def draw(self, point):
-        """Draw on canvas with current brush shape"""
+        """Draw on canvas with current brush shape (point in view coordinates)"""
+        self.draw_point(self.to_board(point))
+    
+    def draw_point(self, point):
+        """Draw at a canvas position with the current brush (also used to mirror a broadcast)"""
+        self.points_drawn += 1
+        if self.live_listeners:
+            self._notify_live('point', (self.stroke_key, point, self.current_brush_shape,
+                                        self.current_color, self.brush_thickness))
         if self.current_brush_shape == 'NORMAL':
             self._draw_normal(point)
         elif self.current_brush_shape == 'CIRCLE':
@@ -69,113 +277,120 @@ class DrawingCanvas:
     def _draw_normal(self, point):
         """Normal line drawing"""
         if self.last_point is not None:
-            cv2.line(
-                self.canvas,
-                self.last_point,
-                point,
-                self.current_color,
-                self.brush_thickness
-            )
-            self.current_stroke.append({
+            item = {
                 'start': self.last_point,
                 'end': point,
                 'color': self.current_color,
                 'thickness': self.brush_thickness,
                 'shape': 'NORMAL'
-            })
+            }
+            self._paint(item)
+            self.current_stroke.append(item)
         self.last_point = point
     
     def _draw_circle(self, point):
         """Draw with circular brush - INCREASED OPACITY"""
-        # Draw multiple overlapping circles for better visibility
-        for radius_offset in range(0, self.brush_thickness + 1, max(1, self.brush_thickness // 3)):
-            cv2.circle(
-                self.canvas,
-                point,
-                self.brush_thickness - radius_offset,
-                self.current_color,
-                -1
-            )
-        
-        if self.last_point:
-            self.current_stroke.append({
-                'point': point,
-                'color': self.current_color,
-                'thickness': self.brush_thickness,
-                'shape': 'CIRCLE'
-            })
-        self.last_point = point
+        self._draw_stamp('CIRCLE', point)
     
     def _draw_square(self, point):
         """Draw with square brush - INCREASED OPACITY"""
-        half_size = self.brush_thickness
-        top_left = (point[0] - half_size, point[1] - half_size)
-        bottom_right = (point[0] + half_size, point[1] + half_size)
-        
-        # Draw filled square
-        cv2.rectangle(
-            self.canvas,
-            top_left,
-            bottom_right,
-            self.current_color,
-            -1
-        )
-        
-        # Draw additional smaller square for better fill
-        cv2.rectangle(
-            self.canvas,
-            (point[0] - half_size//2, point[1] - half_size//2),
-            (point[0] + half_size//2, point[1] + half_size//2),
-            self.current_color,
-            -1
-        )
-        
-        if self.last_point:
-            self.current_stroke.append({
-                'point': point,
-                'color': self.current_color,
-                'thickness': self.brush_thickness,
-                'shape': 'SQUARE'
-            })
-        self.last_point = point
+        self._draw_stamp('SQUARE', point)
     
     def _draw_spray(self, point):
         """Draw with spray paint effect - INCREASED DENSITY"""
-        num_particles = 40  # Increased from 20
-        for _ in range(num_particles):
-            offset_x = random.randint(-self.brush_thickness*2, self.brush_thickness*2)
-            offset_y = random.randint(-self.brush_thickness*2, self.brush_thickness*2)
-            
-            spray_point = (point[0] + offset_x, point[1] + offset_y)
-            
-            # Check bounds
-            if 0 <= spray_point[0] < self.width and 0 <= spray_point[1] < self.height:
-                # Draw larger particles with varying sizes
-                particle_size = random.randint(1, 3)
-                cv2.circle(
-                    self.canvas,
-                    spray_point,
-                    particle_size,
-                    self.current_color,
-                    -1
-                )
-        
-        if self.last_point:
-            self.current_stroke.append({
-                'point': point,
-                'color': self.current_color,
-                'thickness': self.brush_thickness,
-                'shape': 'SPRAY'
-            })
+        before = self.current_stroke[-2] if len(self.current_stroke) > 1 else None
+        before = before['point'] if before is not None and before['shape'] == 'SPRAY' else None
+        span = spray_span(before, self.last_point, point, self.brush_thickness)
+        anchor = self.current_stroke[0] if self.current_stroke else {'point': point}
+        anchor = anchor.get('point', anchor.get('start'))
+        self._paint_particles(spray_particles(span, self.brush_thickness, anchor), self.current_color)
+        self._record_point('SPRAY', point)
+    
+    def _draw_stamp(self, shape, point):
+        """CIRCLE / SQUARE: stamp along the path from the previous point so fast moves stay solid"""
+        path = self._stamp_path(shape, point)
+        self._paint_stamps(shape, path, self.current_color, self.brush_thickness)
+        self._record_point(shape, point)
+    
+    def _stamp_path(self, shape, point):
+        """Interpolated points from the last point (included) to point"""
+        if self.last_point is None:
+            return [point]
+        before = self.current_stroke[-2] if len(self.current_stroke) > 1 else None
+        p0 = before['point'] if before is not None and before['shape'] == shape else self.last_point
+        spacing = stamp_spacing(shape, self.brush_thickness)
+        return [self.last_point] + interpolate_span(p0, self.last_point, point, spacing)
+    
+    def _record_point(self, shape, point):
+        self.current_stroke.append({
+            'point': point,
+            'color': self.current_color,
+            'thickness': self.brush_thickness,
+            'shape': shape
+        })
         self.last_point = point
     
+    def to_board(self, point):
+        """View (camera frame) position -> canvas position (identity for a plain canvas)"""
+        return point
+    
+    def bounds(self):
+        """Drawn area as (x, y, width, height) in canvas coordinates"""
+        return 0, 0, self.width, self.height
+    
+    def reset_surface(self):
+        """Blank the pixels (history is left alone)"""
+        self.canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+    
+    def load_raster(self, image, origin=(0, 0)):
+        """Use a flattened image of the rect at origin (a session raster). Returns False if it doesn't fit."""
+        if tuple(origin) != (0, 0) or image.shape[:2] != (self.height, self.width):
+            return False
+        self.canvas = image.copy()
+        return True
+    
+    def _paint(self, item):
+        """Render one stroke item onto the canvas pixels"""
+        draw_item(self.canvas, item)
+    
+    def _paint_stamps(self, shape, points, color, thickness):
+        """Render brush stamps along points"""
+        draw_stamps(self.canvas, shape, points, color, thickness)
+    
+    def _paint_run(self, shape, color, thickness, points):
+        """Render one batched run of stroke items"""
+        draw_run(self.canvas, shape, color, thickness, points)
+    
+    def _paint_particles(self, particles, color):
+        """Render spray particles ((N, 3) array of x, y, radius)"""
+        draw_particles(self.canvas, particles, color)
+    
+    def _paint_text(self, text, position, color):
+        cv2.putText(self.canvas, text, position, cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2)
+    
     def erase_all(self):
         """Erase entire canvas (fist gesture)"""
-        self.canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.reset()
+        self.text_input = ""
+        self._notify('erase_all')
+    
+    def reset(self):
+        """Blank canvas and history without notifying listeners (loading, replay)"""
+        self.reset_surface()
         self.stroke_history = []
         self.current_stroke = []
         self.last_point = None
-        self.text_input = ""
+        self.hand_strokes = {}
+        self.text_items = []
+    
+    def add_stroke(self, stroke, render=True):
+        """
+        Append a recorded stroke to history and render it (no notification - replay).
+        render=False when its pixels are already on the canvas (a stroke mirrored point by point)
+        """
+        self.stroke_history.append(stroke)
+        if render:
+            self.render_stroke(stroke)
     
     def clear(self):
         """Clear entire canvas (same as erase_all, kept for compatibility)"""
@@ -186,47 +401,94 @@ class DrawingCanvas:
         if len(self.stroke_history) > 0:
             self.stroke_history.pop()
             self.redraw_from_history()
+            self._notify('undo')
     
     def redraw_from_history(self):
-        """Redraw canvas from stroke history"""
-        self.canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        """Redraw canvas from stroke history (placed text is not part of history)"""
+        self.reset_surface()
+        self.text_items = []
         for stroke in self.stroke_history:
-            for item in stroke:
-                if item['shape'] == 'NORMAL':
-                    cv2.line(
-                        self.canvas,
-                        item['start'],
-                        item['end'],
-                        item['color'],
-                        item['thickness']
-                    )
-                elif item['shape'] == 'CIRCLE':
-                    for radius_offset in range(0, item['thickness'] + 1, max(1, item['thickness'] // 3)):
-                        cv2.circle(
-                            self.canvas,
-                            item['point'],
-                            item['thickness'] - radius_offset,
-                            item['color'],
-                            -1
-                        )
-                elif item['shape'] == 'SQUARE':
-                    half_size = item['thickness']
-                    top_left = (item['point'][0] - half_size, item['point'][1] - half_size)
-                    bottom_right = (item['point'][0] + half_size, item['point'][1] + half_size)
-                    cv2.rectangle(self.canvas, top_left, bottom_right, item['color'], -1)
+            self.render_stroke(stroke)
+    
+    def render_stroke(self, stroke, canvas=None):
+        """Render recorded stroke items onto canvas (defaults to this canvas), one call per run"""
+        for shape, color, thickness, points in stroke_runs(stroke):
+            if canvas is None:
+                self._paint_run(shape, color, thickness, points)
+            else:
+                draw_run(canvas, shape, color, thickness, points)
+    
+    def add_listener(self, listener):
+        """
+        Register listener(event, data) for history changes.
+        Events: 'stroke' (stroke items), 'undo', 'erase_all', 'text' ((text, position, color)),
+        and from a LayeredCanvas 'layer' / 'clear_layer' (layer name),
+        'layer_visible' ((name, visible)) and 'layer_order' ((name, position from the bottom))
+        """
+        self.listeners.append(listener)
+    
+    def _notify(self, event, data=None):
+        """Send history change to listeners"""
+        self.event_counts[event] = self.event_counts.get(event, 0) + 1
+        for listener in self.listeners:
+            listener(event, data)
+    
+    def add_live_listener(self, listener):
+        """
+        Register listener(event, data) for drawing as it happens.
+        Events: 'point' ((stroke key, canvas point, shape, color, thickness)),
+        'stroke_start' / 'stroke_end' (stroke key). A stroke_end is followed by
+        the history 'stroke' event when the stroke had any items.
+        """
+        self.live_listeners.append(listener)
+    
+    def _notify_live(self, event, data=None):
+        for listener in self.live_listeners:
+            listener(event, data)
     
     def start_stroke(self):
         """Start a new stroke"""
         self.current_stroke = []
         self.last_point = None
+        if self.live_listeners:
+            self._notify_live('stroke_start', self.stroke_key)
     
     def end_stroke(self):
-        """End current stroke and save to history"""
+        """End current stroke, simplify it and save to history"""
+        if self.live_listeners:
+            self._notify_live('stroke_end', self.stroke_key)
         if len(self.current_stroke) > 0:
-            self.stroke_history.append(self.current_stroke.copy())
+            stroke = simplify_stroke(self.current_stroke, self.simplify_tolerance)
+            self.items_recorded += len(self.current_stroke)
+            self.items_stored += len(stroke)
+            self.stroke_history.append(stroke)
+            self._notify('stroke', self.stroke_history[-1])
         self.current_stroke = []
         self.last_point = None
     
+    def select_stroke(self, key):
+        """Make key's stroke in progress (e.g. one per hand) the one draw() extends"""
+        if key == self.stroke_key:
+            return
+        if self.current_stroke or self.last_point is not None:
+            self.hand_strokes[self.stroke_key] = (self.current_stroke, self.last_point)
+        self.current_stroke, self.last_point = self.hand_strokes.pop(key, ([], None))
+        self.stroke_key = key
+    
+    def end_all_strokes(self):
+        """End every stroke in progress, the selected one last"""
+        key = self.stroke_key
+        for other in list(self.hand_strokes):
+            self.select_stroke(other)
+            self.end_stroke()
+        self.select_stroke(key)
+        self.end_stroke()
+        self.hand_strokes = {}
+    
+    def compression_ratio(self):
+        """Recorded / stored stroke items since start (1.0 = no simplification)"""
+        return self.items_recorded / self.items_stored if self.items_stored else 1.0
+    
     def change_color(self, key):
         """Change brush color based on key press"""
         if key in self.colors:
@@ -249,30 +511,37 @@ class DrawingCanvas:
         return self.color_names.get(self.current_color, 'Custom')
     
     def add_text(self, text, position):
-        """Add text to canvas"""
+        """Add text to canvas (position in view coordinates)"""
         if text and position:
-            cv2.putText(
-                self.canvas,
-                text,
-                position,
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1.0,
-                self.current_color,
-                2
-            )
+            self.place_text(text, self.to_board(position), self.current_color)
             self.text_input = ""
     
-    def save_canvas(self, output_dir="output"):
-        """Save canvas to file"""
-        import os
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{output_dir}/drawing_{timestamp}.png"
-        cv2.imwrite(filename, self.canvas)
+    def place_text(self, text, position, color, render=True):
+        """
+        Put text on the canvas at a canvas position (also used to replay history).
+        render=False when its pixels are already on the canvas (loaded from a session raster)
+        """
+        if render:
+            self._paint_text(text, position, color)
+        self.text_items.append((text, position, color, len(self.stroke_history)))
+        self._notify('text', (text, position, color))
+    
+    def save_canvas(self, output_dir="output", fmt='png', compression=None):
+        """
+        Save canvas to file (blocking).
+        The app saves through CanvasWriter instead, off the render thread.
+        """
+        filename = make_filename(output_dir, fmt)
+        write_image(filename, self.canvas, fmt, compression)
         return filename
     
     def get_canvas(self):
         """Get current canvas"""
-        return self.canvas
\ No newline at end of file
+        return self.canvas    
+    def board_image(self):
+        """Image of the whole drawn area (see bounds()) - the canvas itself here"""
+        return self.canvas
+    
+    def session_raster(self):
+        """Image saved with a session so loading skips the replay (None: replay only)"""
+        return self.board_image()
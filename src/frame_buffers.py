@@ -0,0 +1,140 @@
+import gc
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+
+class FrameBuffers:
+    """
+    Pool of preallocated per-frame images, shared by the detector and the app.
+
+    Stages pass get(name, shape) as the OpenCV dst argument, so after the first
+    frame capture, flip, color conversion, masks and compositing write into the
+    same arrays every frame. A buffer is reallocated only when its shape changes.
+    With enabled=False get() returns None and OpenCV allocates as usual (for
+    comparing in the allocation audit).
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        if not self.enabled:
+            return None
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self.buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+
+class AllocationAudit:
+    """
+    Per-frame memory churn report (tracemalloc, which also sees numpy / OpenCV
+    image allocations) plus garbage collector runs and pause time.
+    Bytes allocated per frame are the traced peak above the frame's starting usage.
+    Call begin_frame() / end_frame() around each frame.
+    """
+    def __init__(self, report_every=100):
+        self.report_every = report_every
+        self.frame_start = 0
+        self._reset()
+        self._gc_started = None
+
+    def _reset(self):
+        self.frames = 0
+        self.peak_total = 0
+        self.peak_max = 0
+        self.retained = 0
+        self.gc_runs = 0
+        self.gc_seconds = 0.0
+
+    def start(self):
+        tracemalloc.start()
+        gc.callbacks.append(self._on_gc)
+
+    def stop(self):
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        tracemalloc.stop()
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self.gc_runs += 1
+            self.gc_seconds += time.perf_counter() - self._gc_started
+            self._gc_started = None
+
+    def begin_frame(self):
+        tracemalloc.reset_peak()
+        self.frame_start = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        current, peak = tracemalloc.get_traced_memory()
+        allocated = peak - self.frame_start
+        self.frames += 1
+        self.peak_total += allocated
+        self.peak_max = max(self.peak_max, allocated)
+        self.retained += current - self.frame_start
+        if self.report_every and self.frames >= self.report_every:
+            self.report()
+
+    def report(self):
+        """Print and reset the stats gathered since the last report"""
+        if not self.frames:
+            return
+        print(f"Allocation audit ({self.frames} frames): "
+              f"{self.peak_total / self.frames / 1024:.0f} KB/frame allocated "
+              f"(max {self.peak_max / 1024:.0f} KB), {self.retained / 1024:+.0f} KB retained, "
+              f"{self.gc_runs} GC runs ({self.gc_seconds * 1000:.1f} ms paused)")
+        self._reset()
+
+
+def _audit_frames(buffers, width, height, frames):
+    """Pen-mode frame work (flip, pen tracking, composite) on synthetic frames"""
+    from gesture_detector import GestureDetector
+
+    detector = GestureDetector(buffers=buffers)
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    overlay = np.zeros_like(raw)
+
+    def frame_work(i):
+        cv2.circle(raw, (200 + i, 300), 20, (0, 0, 255), -1)  # the red pen tip
+        frame = cv2.flip(raw, 1, buffers.get('frame', raw.shape))
+        detector.detect_pen_tip(frame)
+        cv2.addWeighted(frame, 0.7, overlay, 0.3, 0, buffers.get('composite', frame.shape))
+
+    frame_work(0)  # the first frame fills the pool
+    audit = AllocationAudit(report_every=0)
+    audit.start()
+    start = time.perf_counter()
+    for i in range(1, frames + 1):
+        audit.begin_frame()
+        frame_work(i)
+        audit.end_frame()
+    elapsed = time.perf_counter() - start
+    audit.stop()
+    return audit, elapsed / frames
+
+
+if __name__ == "__main__":
+    # python src/frame_buffers.py [WIDTHxHEIGHT] - allocations per frame with and without the pool
+    import argparse
+    from capture_config import parse_size
+
+    parser = argparse.ArgumentParser(description="Frame allocations with and without the buffer pool")
+    parser.add_argument('size', nargs='?', type=parse_size, default='1920x1080')
+    width, height = parser.parse_args().size
+    size = f"{width}x{height}"
+    for enabled in (False, True):
+        audit, seconds = _audit_frames(FrameBuffers(enabled), width, height, frames=100)
+        label = "buffer pool" if enabled else "allocating"
+        print(f"{label:12s} {size}: {seconds * 1000:.1f} ms/frame, "
+              f"{audit.peak_total / audit.frames / 1024:.0f} KB/frame allocated, "
+              f"{audit.gc_runs} GC runs")
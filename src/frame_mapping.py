@@ -0,0 +1,113 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class FrameMapping:
+    """
+    The app's four resolutions and every conversion between them.
+
+    capture:   camera frames
+    detection: the frame hands and pen are searched in (smaller = cheaper)
+    view:      canvas viewport - drawing, UI, keyboard and indicators live here
+    display:   the window image
+
+    Positions from detection are mapped to view coordinates here, and frames
+    are resized here, so the rest of the app works in view coordinates only.
+    Sizes that aren't given follow capture (detection, view) or view (display);
+    a resize between equal sizes is skipped. Sizes with another aspect ratio
+    than the camera stretch its image - positions stay consistent with it.
+    """
+    def __init__(self, capture_size, detection_size=None, view_size=None, display_size=None, buffers=None):
+        self.capture_size = tuple(capture_size)
+        self.detection_size = tuple(detection_size or capture_size)
+        self.view_size = tuple(view_size or capture_size)
+        self.display_size = tuple(display_size or self.view_size)
+        self.buffers = buffers
+
+    @property
+    def view_shape(self):
+        return self.view_size[1], self.view_size[0], 3
+
+    def _resize(self, frame, size, name):
+        if (frame.shape[1], frame.shape[0]) == size:
+            return frame
+        # Bilinear: INTER_AREA looks slightly better when shrinking but costs
+        # about as much as the detection it saves
+        dst = self.buffers.get(name, (size[1], size[0]) + frame.shape[2:]) if self.buffers else None
+        return cv2.resize(frame, size, dst, interpolation=cv2.INTER_LINEAR)
+
+    def detection_frame(self, frame):
+        """Capture frame at the detection size"""
+        return self._resize(frame, self.detection_size, 'detection')
+
+    def view_frame(self, frame):
+        """Capture frame at the view (canvas) size"""
+        return self._resize(frame, self.view_size, 'view')
+
+    def display_frame(self, frame):
+        """Finished view frame at the window size"""
+        return self._resize(frame, self.display_size, 'display')
+
+    @staticmethod
+    def _scale(point, source, target):
+        return (int(point[0] * target[0] / source[0]), int(point[1] * target[1] / source[1]))
+
+    def detection_to_view(self, point):
+        """Position found in the detection frame -> view coordinates"""
+        return self._scale(point, self.detection_size, self.view_size)
+
+    def display_to_view(self, point):
+        """Window position (e.g. a mouse click) -> view coordinates"""
+        return self._scale(point, self.display_size, self.view_size)
+
+    def describe(self):
+        sizes = (("capture", self.capture_size), ("detection", self.detection_size),
+                 ("canvas", self.view_size), ("display", self.display_size))
+        return ", ".join(f"{name} {w}x{h}" for name, (w, h) in sizes)
+
+
+def _benchmark(frames=50):
+    """
+    Pen detection on 1080p frames at capture size vs a 640x360 detection frame
+    (searching the whole frame, and tracking in the window around the last tip),
+    positions mapped to a 1080p canvas
+    """
+    from frame_buffers import FrameBuffers
+    from gesture_detector import GestureDetector
+
+    rng = np.random.default_rng(0)
+    raw = cv2.GaussianBlur(rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8), (0, 0), 8)
+    frames_with_pen = []
+    for i in range(frames):
+        frame = raw.copy()
+        cv2.circle(frame, (400 + 20 * i, 500), 20, (0, 0, 255), -1)  # the moving red pen tip
+        frames_with_pen.append((frame, (400 + 20 * i, 500)))
+
+    for detection_size in ((1920, 1080), (640, 360)):
+        for tracking in (False, True):
+            buffers = FrameBuffers()
+            mapping = FrameMapping((1920, 1080), detection_size, buffers=buffers)
+            detector = GestureDetector(buffers=buffers)
+            if tracking:  # window tracking needs calibrated ranges; the synthetic pen fits the defaults
+                detector.set_pen_color_range('red', detector.pen_color_range['red'])
+            found = []
+            start = time.perf_counter()
+            for frame, tip in frames_with_pen:
+                detector.pen_position_buffer.clear()
+                if not tracking:
+                    detector.pen_last_tip = None
+                position, detected = detector.detect_pen_tip(mapping.detection_frame(frame))
+                if detected:
+                    found.append((mapping.detection_to_view(position), tip))
+            elapsed = (time.perf_counter() - start) / frames
+            error = max((np.hypot(p[0] - q[0], p[1] - q[1]) for p, q in found), default=float('nan'))
+            print(f"detect {detection_size[0]}x{detection_size[1]} {'tracking' if tracking else 'search  '}: "
+                  f"{elapsed * 1000:.2f} ms/frame, pen found {len(found)}/{frames}, "
+                  f"max canvas error {error:.1f} px")
+
+
+if __name__ == "__main__":
+    # python src/frame_mapping.py - detection cost at full vs reduced detection size
+    _benchmark()
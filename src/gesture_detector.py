@@ -1,83 +1,298 @@
 import cv2
-import mediapipe as mp
 from collections import deque
 import numpy as np
 import math
+import threading
+import time
+
+from frame_buffers import FrameBuffers
+from gesture_templates import GestureTemplates, pose_vector
+
+
+# MediaPipe hand topology (landmark index pairs), same as mp.solutions.hands.HAND_CONNECTIONS
+HAND_CONNECTIONS = np.array([
+    (0, 1), (1, 2), (2, 3), (3, 4),          # Thumb
+    (0, 5), (5, 6), (6, 7), (7, 8),          # Index
+    (5, 9), (9, 10), (10, 11), (11, 12),     # Middle
+    (9, 13), (13, 14), (14, 15), (15, 16),   # Ring
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),  # Pinky + palm
+], dtype=np.int32)
+
+# MediaPipe is imported on first use (see load_mediapipe) - it takes about a second
+mp = None
+
+
+def load_mediapipe():
+    """Import MediaPipe the first time hand tracking is needed"""
+    global mp
+    if mp is None:
+        import mediapipe
+        mp = mediapipe
+    return mp
+
+
+# Seconds close() waits for a MediaPipe warm-up still in progress
+WARM_UP_JOIN_TIMEOUT = 10.0
+
+# Side of the window searched around the last pen position before the whole frame
+# (calibrated colors only - loose default ranges match too much clutter near the pen)
+PEN_SEARCH_SIZE = 240
+# Window tracking falls back to a whole-frame search every this many frames, and when
+# the blob found is less than PEN_AREA_DROP of the last one (the pen may have left the window)
+PEN_FULL_SEARCH_INTERVAL = 15
+PEN_AREA_DROP = 0.5
+# Pen tip contour area limits (pixels); both scale with the frame area relative to 1280x720
+PEN_AREA = (100, 5000)
+PEN_REFERENCE_AREA = 1280 * 720
+
+# Hand overlay detail levels
+LANDMARK_STYLES = ['off', 'minimal', 'full']
+
+# Temporal gesture voting: gesture -> (window frames, enter score, exit score).
+# A gesture's score is the summed confidence of its votes among the last `window`
+# frames. A gesture that reaches `enter` takes over once the current one falls
+# below its `exit` score or holds a smaller share of its own window. Drawing
+# reacts on the first frame; UNDO and ERASE_ALL need a stable majority. NONE is
+# idle and gives way to any gesture that enters.
+GESTURE_VOTING = {
+    'DRAW': (3, 0.5, 0.5),
+    'PINCH': (3, 1.5, 0.5),
+    'NONE': (3, 1.5, float('inf')),
+    'PAUSE': (5, 2.5, 1.0),
+    'THREE_FINGERS': (5, 3.0, 1.0),
+    'UNDO': (6, 3.5, 1.5),
+    'ERASE_ALL': (8, 5.0, 2.0),
+}
+DEFAULT_VOTING = (4, 2.0, 1.0)  # custom gestures
+
+# Per-hand detector state, swapped in by GestureDetector.select_hand
+HAND_STATE = ('position_buffer', 'gesture_sequence', 'gesture_scores', 'stable_gesture')
 
 
 class GestureDetector:
-    def __init__(self, smoothing_frames=10):
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7
-        )
-        self.mp_draw = mp.solutions.drawing_utils
+    def __init__(self, smoothing_frames=10, max_hands=1, buffers=None):
+        self.max_hands = max_hands
+        
+        # Preallocated per-frame images (shared with the app)
+        self.buffers = buffers if buffers is not None else FrameBuffers()
+        
+        # MediaPipe Hands graph, built on first use or by warm_up()
+        self._hands = None
+        self._hands_lock = threading.Lock()
+        self._warm_thread = None
+        self._closed = False
+        self.load_error = None
+        self.load_seconds = None
+        
+        # Hand skeleton overlay: 'off', 'minimal' (bones only) or 'full' (bones + joints)
+        self.landmark_style = 'full'
         
         # Smoothing buffer
         self.smoothing_frames = smoothing_frames
         self.position_buffer = deque(maxlen=smoothing_frames)
         self.pen_position_buffer = deque(maxlen=smoothing_frames)
         
-        # Custom gesture templates
+        # Custom gestures: finger patterns, and recorded landmark poses
         self.custom_gestures = {}
-        self.gesture_sequence = deque(maxlen=10)
+        self.gesture_templates = GestureTemplates()
+        
+        # Recent (gesture, confidence) votes and per-gesture windowed scores
+        self.gesture_voting = dict(GESTURE_VOTING)
+        self.gesture_sequence = deque(maxlen=max(w for w, _, _ in self.gesture_voting.values()) + 1)
+        self.gesture_scores = {}
+        self.stable_gesture = "NONE"
         
-        # Pen detection settings
+        # Smoothing and voting state of the other tracked hands (see select_hand)
+        self.hand_key = None
+        self.hand_states = {}
+        
+        # Pen detection settings: HSV (lower, upper) ranges per pen color, OR-ed together.
+        # Defaults cover typical lighting; a calibrated profile replaces them (see pen_calibration)
         self.pen_color_range = {
-            'red': {
-                'lower1': np.array([0, 120, 70]),
-                'upper1': np.array([10, 255, 255]),
-                'lower2': np.array([170, 120, 70]),
-                'upper2': np.array([180, 255, 255])
-            },
-            'blue': {
-                'lower': np.array([100, 150, 50]),
-                'upper': np.array([140, 255, 255])
-            },
-            'green': {
-                'lower': np.array([40, 50, 50]),
-                'upper': np.array([80, 255, 255])
-            }
+            'red': [
+                (np.array([0, 120, 70]), np.array([10, 255, 255])),
+                (np.array([170, 120, 70]), np.array([180, 255, 255])),
+            ],
+            'blue': [(np.array([100, 150, 50]), np.array([140, 255, 255]))],
+            'green': [(np.array([40, 50, 50]), np.array([80, 255, 255]))],
         }
         self.current_pen_color = 'red'  # Default pen color to track
+        self.pen_kernel = np.ones((5, 5), np.uint8)
+        self.pen_calibrated = set()  # colors with calibrated ranges (window tracking)
+        self.pen_last_tip = None  # unsmoothed position in the previous frame
+        self.pen_last_area = 0
+        self.pen_window_frames = 0  # window hits since the last whole-frame search
+        
+        # Detection counters (metrics endpoint): frames searched / frames with a hit
+        self.hand_frames = 0
+        self.hand_frames_detected = 0
+        self.hands_detected = 0
+        self.pen_frames = 0
+        self.pen_frames_detected = 0
+        
+    @property
+    def hands(self):
+        """MediaPipe Hands graph (imports MediaPipe and builds the graph on first use)"""
+        if self._hands is None:
+            with self._hands_lock:
+                if self._closed:
+                    raise RuntimeError("GestureDetector is closed")
+                if self._hands is None:
+                    start = time.perf_counter()
+                    self.mp_hands = load_mediapipe().solutions.hands
+                    self._hands = self.mp_hands.Hands(
+                        static_image_mode=False,
+                        max_num_hands=self.max_hands,
+                        min_detection_confidence=0.7,
+                        min_tracking_confidence=0.7
+                    )
+                    self.load_seconds = time.perf_counter() - start
+        return self._hands
+    
+    def warm_up(self):
+        """Load hand tracking on a background thread (see hands_ready)"""
+        if self._hands is not None or self._warm_thread is not None:
+            return
         
+        def load():
+            try:
+                self.hands
+            except Exception as e:
+                self.load_error = e
+        self._warm_thread = threading.Thread(target=load, daemon=True)
+        self._warm_thread.start()
+    
+    def hands_ready(self):
+        """True once detect_hands won't block on loading MediaPipe"""
+        return self._hands is not None
+    
+    def close(self):
+        """Release the MediaPipe graph (if it was ever built), after a warm-up in progress"""
+        self._closed = True  # a warm-up that hasn't taken the lock yet won't build the graph
+        if self._warm_thread is not None:
+            self._warm_thread.join(WARM_UP_JOIN_TIMEOUT)
+        with self._hands_lock:
+            if self._hands is not None:
+                self._hands.close()
+                self._hands = None
+    
     def detect_hands(self, frame):
         """Detect hands in frame and return landmarks"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, self.buffers.get('rgb', frame.shape))
         results = self.hands.process(rgb_frame)
+        self.hand_frames += 1
+        if results.multi_hand_landmarks:
+            self.hand_frames_detected += 1
+            self.hands_detected += len(results.multi_hand_landmarks)
         return results
     
+    def hand_landmarks(self, results):
+        """
+        Detected hands as a list of (hand key, landmarks, handedness confidence).
+        Keys are the handedness label ('Left' / 'Right'); further hands with the
+        same label are numbered left to right in the frame ('Right 2').
+        """
+        if not results.multi_hand_landmarks:
+            return []
+        hands = []
+        for i, hand_landmarks in enumerate(results.multi_hand_landmarks):
+            label, score = "Hand", 1.0
+            if results.multi_handedness and i < len(results.multi_handedness):
+                classification = results.multi_handedness[i].classification[0]
+                label, score = classification.label, classification.score
+            hands.append((label, hand_landmarks.landmark[0].x, hand_landmarks.landmark, score))
+        hands.sort(key=lambda hand: (hand[0], hand[1]))
+        
+        counts = {}
+        keyed = []
+        for label, _, landmarks, score in hands:
+            counts[label] = counts.get(label, 0) + 1
+            key = label if counts[label] == 1 else f"{label} {counts[label]}"
+            keyed.append((key, landmarks, score))
+        return keyed
+    
+    def select_hand(self, key):
+        """Switch smoothing and gesture voting state to hand key"""
+        if key == self.hand_key:
+            return
+        self.hand_states[self.hand_key] = tuple(getattr(self, name) for name in HAND_STATE)
+        state = self.hand_states.pop(key, None)
+        if state is None:
+            state = (deque(maxlen=self.smoothing_frames), deque(maxlen=self.gesture_sequence.maxlen),
+                     {}, "NONE")
+        for name, value in zip(HAND_STATE, state):
+            setattr(self, name, value)
+        self.hand_key = key
+    
+    def forget_hand(self, key):
+        """Drop the state of a hand that left the frame"""
+        if key == self.hand_key:
+            self.position_buffer.clear()
+            self.reset_gesture_votes()
+        else:
+            self.hand_states.pop(key, None)
+    
     def detect_pen_tip(self, frame):
         """
         Detect pen/pencil tip using color tracking
         Returns: (x, y) position and detection status
         """
-        # Convert to HSV for better color detection
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
-        # Get color range based on current pen color setting
-        if self.current_pen_color == 'red':
-            mask1 = cv2.inRange(hsv, self.pen_color_range['red']['lower1'], 
-                               self.pen_color_range['red']['upper1'])
-            mask2 = cv2.inRange(hsv, self.pen_color_range['red']['lower2'], 
-                               self.pen_color_range['red']['upper2'])
-            mask = mask1 + mask2
-        elif self.current_pen_color == 'blue':
-            mask = cv2.inRange(hsv, self.pen_color_range['blue']['lower'], 
-                              self.pen_color_range['blue']['upper'])
-        elif self.current_pen_color == 'green':
-            mask = cv2.inRange(hsv, self.pen_color_range['green']['lower'], 
-                              self.pen_color_range['green']['upper'])
+        # With calibrated ranges, look near the last position first - a fixed-size window
+        # is far cheaper than the whole frame. The whole frame (largest blob wins) is still
+        # searched when the window has no pen, periodically, and when the blob shrank.
+        tip = None
+        h, w = frame.shape[:2]
+        scale = h * w / PEN_REFERENCE_AREA  # detection may run on a smaller frame
+        areas = (PEN_AREA[0] * scale, PEN_AREA[1] * scale)
+        size = int(PEN_SEARCH_SIZE * np.sqrt(scale))
+        if (self.pen_last_tip is not None and self.current_pen_color in self.pen_calibrated
+                and self.pen_window_frames < PEN_FULL_SEARCH_INTERVAL and w > size and h > size):
+            x0 = min(max(self.pen_last_tip[0] - size // 2, 0), w - size)
+            y0 = min(max(self.pen_last_tip[1] - size // 2, 0), h - size)
+            tip, area = self._find_pen_tip(frame[y0:y0 + size, x0:x0 + size], (x0, y0), areas, 'pen_window_')
+            if tip is not None and area < self.pen_last_area * PEN_AREA_DROP:
+                tip = None
+        if tip is None:
+            tip, area = self._find_pen_tip(frame, (0, 0), areas, 'pen_')
+            self.pen_window_frames = 0
         else:
+            self.pen_window_frames += 1
+        self.pen_last_tip = tip
+        self.pen_last_area = area
+        self.pen_frames += 1
+        if tip is None:
             return None, False
+        self.pen_frames_detected += 1
+        
+        # Add to smoothing buffer
+        self.pen_position_buffer.append(tip)
+        
+        # Calculate smoothed position
+        smooth_x = int(np.mean([pos[0] for pos in self.pen_position_buffer]))
+        smooth_y = int(np.mean([pos[1] for pos in self.pen_position_buffer]))
+        return (smooth_x, smooth_y), True
+    
+    def _find_pen_tip(self, image, origin, areas, scope):
+        """Center (frame position) and area of the pen-colored blob in image, or (None, 0)"""
+        # Convert to HSV for better color detection (into pooled buffers, no per-frame arrays)
+        buffers = self.buffers
+        mask_shape = image.shape[:2]
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, buffers.get(scope + 'hsv', image.shape))
+        mask = buffers.get(scope + 'mask', mask_shape)
+        
+        # Mask of the current pen color's ranges
+        ranges = self.pen_color_range.get(self.current_pen_color)
+        if not ranges:
+            return None, 0
+        mask = cv2.inRange(hsv, ranges[0][0], ranges[0][1], mask)
+        for lower, upper in ranges[1:]:
+            extra = cv2.inRange(hsv, lower, upper, buffers.get(scope + 'mask2', mask_shape))
+            mask = cv2.bitwise_or(mask, extra, mask)
         
         # Morphological operations to remove noise
-        kernel = np.ones((5, 5), np.uint8)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        opened = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.pen_kernel,
+                                  dst=buffers.get(scope + 'open', mask_shape))
+        mask = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, self.pen_kernel, dst=mask)
         
         # Find contours
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -88,29 +303,30 @@ class GestureDetector:
             
             # Filter out too small or too large areas
             area = cv2.contourArea(largest_contour)
-            if 100 < area < 5000:  # Adjust these values based on pen size
+            if areas[0] < area < areas[1]:  # Adjust PEN_AREA based on pen size
                 # Get center point
                 M = cv2.moments(largest_contour)
                 if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    
-                    # Add to smoothing buffer
-                    self.pen_position_buffer.append((cx, cy))
-                    
-                    # Calculate smoothed position
-                    if len(self.pen_position_buffer) > 0:
-                        smooth_x = int(np.mean([pos[0] for pos in self.pen_position_buffer]))
-                        smooth_y = int(np.mean([pos[1] for pos in self.pen_position_buffer]))
-                        return (smooth_x, smooth_y), True
-        
-        return None, False
+                    return (int(M["m10"] / M["m00"]) + origin[0],
+                            int(M["m01"] / M["m00"]) + origin[1]), area
+        return None, 0
+    
+    def set_pen_color_range(self, color, ranges, calibrated=True):
+        """Replace the HSV ranges of a pen color ([(lower, upper), ...], e.g. from calibration)"""
+        self.pen_color_range[color] = [(np.asarray(lower, dtype=np.uint8), np.asarray(upper, dtype=np.uint8))
+                                       for lower, upper in ranges]
+        if calibrated:
+            self.pen_calibrated.add(color)
+        else:
+            self.pen_calibrated.discard(color)
+        self.pen_last_tip = None
     
     def set_pen_color_tracking(self, color):
         """Set which pen color to track (red, blue, green)"""
         if color in self.pen_color_range:
             self.current_pen_color = color
             self.pen_position_buffer.clear()  # Clear buffer when switching
+            self.pen_last_tip = None
             return True
         return False
     
@@ -144,7 +360,12 @@ class GestureDetector:
         Detect gesture based on finger states
         Returns: gesture_name (str)
         """
-        # Check custom gestures first
+        # Check custom gestures first - recorded poses, then finger patterns
+        if landmarks and frame_shape and len(self.gesture_templates):
+            name = self.gesture_templates.classify(self.landmark_pose(landmarks, frame_shape))
+            if name is not None:
+                return name
+        
         finger_pattern = tuple(fingers_up)
         if finger_pattern in self.custom_gestures:
             return self.custom_gestures[finger_pattern]
@@ -200,6 +421,55 @@ class GestureDetector:
         else:
             return "NONE"
     
+    def vote_gesture(self, gesture, confidence=1.0):
+        """
+        Add this frame's classification to the vote and return the stable gesture.
+        O(1) per frame: each gesture's score drops the vote leaving its window and
+        the new vote is added, no window is re-summed.
+        """
+        sequence = self.gesture_sequence
+        sequence.append((gesture, confidence))
+        scores = self.gesture_scores
+        scores[gesture] = scores.get(gesture, 0.0) + confidence
+        
+        for name in scores:
+            window = self.gesture_voting.get(name, DEFAULT_VOTING)[0]
+            if len(sequence) > window:
+                old_name, old_confidence = sequence[-window - 1]
+                if old_name == name:
+                    scores[name] = max(scores[name] - old_confidence, 0.0)
+        
+        # Strongest challenger that reached its enter score
+        current = self.stable_gesture
+        best, best_share = None, 0.0
+        for name, score in scores.items():
+            window, enter, _ = self.gesture_voting.get(name, DEFAULT_VOTING)
+            if name != current and score >= enter and score / window > best_share:
+                best, best_share = name, score / window
+        
+        window, _, exit_score = self.gesture_voting.get(current, DEFAULT_VOTING)
+        held = scores.get(current, 0.0)
+        if held < exit_score:
+            self.stable_gesture = best or "NONE"
+        elif best is not None and best_share > held / window:
+            self.stable_gesture = best
+        return self.stable_gesture
+    
+    def reset_gesture_votes(self):
+        """Forget the vote history (hand lost)"""
+        self.gesture_sequence.clear()
+        self.gesture_scores.clear()
+        self.stable_gesture = "NONE"
+    
+    def set_gesture_voting(self, gesture, window, enter, exit_score):
+        """Configure the vote window and enter/exit scores for one gesture"""
+        self.gesture_voting[gesture] = (window, enter, exit_score)
+        longest = max(w for w, _, _ in self.gesture_voting.values()) + 1
+        if longest > self.gesture_sequence.maxlen:
+            self.gesture_sequence = deque(self.gesture_sequence, maxlen=longest)
+        self.reset_gesture_votes()
+        self.hand_states.clear()
+    
     def get_pinch_distance(self, landmarks, frame_shape):
         """Calculate distance between thumb and index finger for thickness control"""
         h, w, _ = frame_shape
@@ -236,13 +506,58 @@ class GestureDetector:
         """Add custom gesture template"""
         self.custom_gestures[tuple(finger_pattern)] = name
     
+    def landmark_pose(self, landmarks, frame_shape):
+        """Normalized pose vector of a hand (see gesture_templates.pose_vector)"""
+        h, w = frame_shape[:2]
+        points = np.array([(lm.x * w, lm.y * h) for lm in landmarks], dtype=np.float32)
+        return pose_vector(points)
+    
+    def record_gesture_sample(self, name, landmarks, frame_shape):
+        """Add the current hand pose as a template of custom gesture name"""
+        vector = self.landmark_pose(landmarks, frame_shape)
+        if vector is None:
+            return False
+        self.gesture_templates.add(name, vector)
+        return True
+    
+    def set_landmark_style(self, style):
+        """Set hand overlay detail ('off', 'minimal', 'full')"""
+        if style in LANDMARK_STYLES:
+            self.landmark_style = style
+            return True
+        return False
+    
+    def next_landmark_style(self):
+        """Cycle hand overlay detail"""
+        index = (LANDMARK_STYLES.index(self.landmark_style) + 1) % len(LANDMARK_STYLES)
+        self.landmark_style = LANDMARK_STYLES[index]
+        return self.landmark_style
+    
+    def landmarks_to_array(self, landmarks, frame_shape):
+        """Convert landmark list to (21, 2) int32 array of pixel coordinates"""
+        h, w = frame_shape[:2]
+        points = np.array([(lm.x, lm.y) for lm in landmarks], dtype=np.float32)
+        points *= (w, h)
+        return points.astype(np.int32)
+    
     def draw_hand_landmarks(self, frame, results):
-        """Draw hand landmarks on frame"""
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                self.mp_draw.draw_landmarks(
-                    frame,
-                    hand_landmarks,
-                    self.mp_hands.HAND_CONNECTIONS
-                )
-        return frame
\ No newline at end of file
+        """
+        Draw hand landmarks on frame.
+        All bones are drawn with one cv2.polylines call and all joints with another
+        (zero-length thick segments render as filled dots).
+        """
+        if self.landmark_style == 'off' or not results.multi_hand_landmarks:
+            return frame
+        
+        for hand_landmarks in results.multi_hand_landmarks:
+            points = self.landmarks_to_array(hand_landmarks.landmark, frame.shape)
+            
+            # Bones - (21, 2, 2) array of segments
+            cv2.polylines(frame, points[HAND_CONNECTIONS], False, (224, 224, 224), 2)
+            
+            # Joints
+            if self.landmark_style == 'full':
+                joints = np.repeat(points[:, None, :], 2, axis=1)
+                cv2.polylines(frame, joints, False, (0, 0, 255), 5)
+        
+        return frame
@@ -0,0 +1,271 @@
+import sys
+import time
+from types import SimpleNamespace
+
+
+# Per-hand pipeline state, swapped in by GesturePipeline.select_hand
+HAND_STATE = ('current_gesture', 'prev_gesture', 'pinch_base_distance', 'pinch_base_thickness',
+              'pinch_points')
+
+
+class GesturePipeline:
+    """
+    Hand gesture -> canvas action state machine.
+    Shared by the live app (VirtualDrawingApp.run) and offline video processing,
+    so both draw exactly the same strokes from the same gestures.
+
+    Several hands are tracked independently: select_hand() switches the gesture
+    state here, the smoothing / voting state in the detector and the stroke in
+    progress on the canvas, so each hand draws its own strokes. Pause is shared.
+    """
+    def __init__(self, detector, canvas):
+        self.detector = detector
+        self.canvas = canvas
+
+        self.current_gesture = "NONE"
+        self.prev_gesture = "NONE"
+        self.paused = False
+
+        # Pinch gesture state
+        self.pinch_base_distance = None
+        self.pinch_base_thickness = None
+        self.pinch_points = None  # (thumb, index) positions while pinching
+
+        # Gesture state of the other tracked hands
+        self.hand_key = None
+        self.hand_states = {}
+
+    def detect(self, frame):
+        """
+        Detect hand and classify its gesture (first hand only)
+        Returns: (results, landmarks, finger_pos) - landmarks is None when no hand is found
+        """
+        results, hands = self.detect_all(frame)
+        if not hands:
+            return results, None, None
+        key, landmarks, confidence = hands[0]
+        self.select_hand(key)
+        finger_pos = self.classify(landmarks, confidence, frame.shape)
+        return results, landmarks, finger_pos
+
+    def detect_all(self, frame):
+        """
+        Detect every hand, release the ones that left the frame
+        Returns: (results, [(hand key, landmarks, confidence), ...])
+        """
+        results = self.detector.detect_hands(frame)
+        hands = self.detector.hand_landmarks(results)
+
+        # A hand whose handedness label flipped for a frame keeps its state
+        keys = [key for key, _, _ in hands]
+        tracked = self.tracked_hands()
+        new = [key for key in keys if key not in tracked]
+        missing = [key for key in tracked if key not in keys]
+        if len(new) == 1 and len(missing) == 1:
+            hands = [(missing[0] if key == new[0] else key, landmarks, confidence)
+                     for key, landmarks, confidence in hands]
+            keys = [key for key, _, _ in hands]
+
+        self.release_missing(keys)
+        return results, hands
+
+    def classify(self, landmarks, confidence, frame_shape):
+        """
+        Classify the selected hand's gesture and return its smoothed index finger tip.
+        The gesture is voted over recent frames so a single misclassified frame
+        can't fire an action.
+        """
+        fingers_up = self.detector.get_finger_states(landmarks)
+        gesture = self.detector.detect_gesture(fingers_up, landmarks, frame_shape)
+        self.current_gesture = self.detector.vote_gesture(gesture, confidence)
+        return self.detector.get_index_finger_tip(landmarks, frame_shape)
+
+    def tracked_hands(self):
+        """Keys of the hands seen in the previous frame"""
+        keys = [key for key in self.hand_states if key is not None]
+        if self.hand_key is not None:
+            keys.append(self.hand_key)
+        return keys
+
+    def select_hand(self, key):
+        """Make hand key the one apply() / release() act on"""
+        self.detector.select_hand(key)
+        self.canvas.select_stroke(key)
+        if key == self.hand_key:
+            return
+        self.hand_states[self.hand_key] = tuple(getattr(self, name) for name in HAND_STATE)
+        state = self.hand_states.pop(key, None)
+        if state is None:
+            state = ("NONE", "NONE", None, None, None)
+        for name, value in zip(HAND_STATE, state):
+            setattr(self, name, value)
+        self.hand_key = key
+
+    def release_missing(self, keys):
+        """Finish the strokes of tracked hands that aren't in keys and forget them"""
+        for key in self.tracked_hands():
+            if key not in keys:
+                self.select_hand(key)
+                self.release()
+                self.select_hand(None)
+                self.hand_states.pop(key, None)
+                self.detector.forget_hand(key)
+
+    def apply(self, landmarks, finger_pos, frame_shape):
+        """
+        Apply the current gesture to the canvas
+        Returns: feedback event ('ERASED', 'PAUSED', 'RESUMED', 'UNDO', 'BRUSH') or None
+        """
+        gesture = self.current_gesture
+        changed = gesture != self.prev_gesture
+
+        # While paused only the palm (resume) is handled
+        if self.paused:
+            if gesture == "PAUSE" and changed:
+                self.paused = False
+                return "RESUMED"
+            return None
+
+        if gesture == "DRAW":
+            if changed:
+                self.canvas.start_stroke()
+            self.canvas.draw(finger_pos)
+
+        elif gesture == "ERASE_ALL":
+            if changed:
+                self.canvas.erase_all()
+                return "ERASED"
+
+        elif gesture == "PAUSE":
+            if changed:
+                self.paused = True
+                return "PAUSED"
+
+        elif gesture == "UNDO":
+            if changed:
+                self.canvas.undo()
+                return "UNDO"
+
+        elif gesture == "THREE_FINGERS":
+            if changed:
+                self.canvas.next_brush_shape()
+                return "BRUSH"
+
+        elif gesture == "PINCH":
+            self.pinch_points = self.handle_pinch_gesture(landmarks, frame_shape)
+
+        else:
+            self._release_previous()
+        return None
+
+    def end_frame(self):
+        """Finish a frame in which a hand was seen"""
+        self.prev_gesture = self.current_gesture
+
+    def release(self):
+        """No hand in frame - finish any stroke or pinch in progress"""
+        self.current_gesture = "NONE"
+        self._release_previous()
+        self.prev_gesture = "NONE"
+        self.detector.reset_gesture_votes()
+
+    def _release_previous(self):
+        if self.prev_gesture == "DRAW":
+            self.canvas.end_stroke()
+        if self.prev_gesture == "PINCH":
+            self.pinch_base_distance = None
+            self.pinch_base_thickness = None
+            self.pinch_points = None
+
+    def release_all(self):
+        """Finish every hand's stroke or pinch (end of input)"""
+        self.release_missing([])
+        self.release()
+
+    def handle_pinch_gesture(self, landmarks, frame_shape):
+        """Handle pinch gesture for thickness control"""
+        distance, thumb_pos, index_pos = self.detector.get_pinch_distance(landmarks, frame_shape)
+
+        if self.pinch_base_distance is None:
+            self.pinch_base_distance = distance
+            self.pinch_base_thickness = self.canvas.brush_thickness
+
+        # Calculate new thickness based on pinch distance change
+        distance_ratio = distance / self.pinch_base_distance
+        new_thickness = int(self.pinch_base_thickness * distance_ratio)
+        self.canvas.set_thickness(new_thickness)
+
+        # Visual feedback
+        return thumb_pos, index_pos
+
+
+def _synthetic_hand(x, y):
+    """Index-finger-up (DRAW) landmarks with the wrist at normalized (x, y)"""
+    offsets = [(0, 0),
+               (0.03, -0.03), (0.05, -0.06), (0.06, -0.09), (0.07, -0.11),      # thumb, folded
+               (0.02, -0.10), (0.02, -0.15), (0.02, -0.19), (0.02, -0.23),      # index, up
+               (0.00, -0.10), (0.00, -0.13), (0.00, -0.11), (0.00, -0.09),      # middle, curled
+               (-0.02, -0.09), (-0.02, -0.12), (-0.02, -0.10), (-0.02, -0.08),  # ring, curled
+               (-0.04, -0.08), (-0.04, -0.10), (-0.04, -0.09), (-0.04, -0.07)]  # pinky, curled
+    return [SimpleNamespace(x=x + dx, y=y + dy, z=0.0) for dx, dy in offsets]
+
+
+def benchmark(max_hands=4, frames=300, width=1280, height=720, video=None):
+    """
+    Per-frame cost as the hand count grows.
+    Gesture + drawing cost is measured with synthetic hands drawing circles;
+    with a video, MediaPipe detection is timed for each max_num_hands setting.
+    """
+    import math
+
+    from gesture_detector import GestureDetector
+    from layered_canvas import LayeredCanvas
+
+    print("Gesture + drawing (synthetic hands):")
+    for count in range(1, max_hands + 1):
+        detector = GestureDetector(max_hands=count)
+        pipeline = GesturePipeline(detector, LayeredCanvas(width, height))
+        start = time.perf_counter()
+        for frame in range(frames):
+            for hand in range(count):
+                angle = frame * 0.05 + hand
+                center = ((hand + 0.5) / count, 0.6)
+                landmarks = _synthetic_hand(center[0] + 0.08 * math.cos(angle),
+                                            center[1] + 0.08 * math.sin(angle))
+                pipeline.select_hand(f"Hand {hand}")
+                finger_pos = pipeline.classify(landmarks, 1.0, (height, width, 3))
+                pipeline.apply(landmarks, finger_pos, (height, width, 3))
+                pipeline.end_frame()
+            pipeline.canvas.get_canvas()
+        elapsed = (time.perf_counter() - start) / frames
+        pipeline.release_all()
+        print(f"  {count} hands: {elapsed * 1000:.2f} ms/frame, {len(pipeline.canvas.stroke_history)} strokes")
+
+    if video is None:
+        return
+    import cv2
+
+    print(f"MediaPipe detection ({video}):")
+    for count in range(1, max_hands + 1):
+        cap = cv2.VideoCapture(video)
+        detector = GestureDetector(max_hands=count)
+        total = seen = decoded = 0
+        while decoded < frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            start = time.perf_counter()
+            results = detector.detect_hands(frame)
+            total += time.perf_counter() - start
+            seen += len(results.multi_hand_landmarks or [])
+            decoded += 1
+        cap.release()
+        detector.close()
+        if decoded:
+            print(f"  max {count} hands: {total / decoded * 1000:.2f} ms/frame, "
+                  f"{seen / decoded:.2f} hands/frame")
+
+
+if __name__ == "__main__":
+    # python src/gesture_pipeline.py [video] - per-frame cost for 1..4 hands
+    benchmark(video=sys.argv[1] if len(sys.argv) > 1 else None)
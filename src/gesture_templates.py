@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+
+NUM_LANDMARKS = 21
+WRIST = 0
+MIDDLE_MCP = 9
+
+# Default match distance: RMS landmark offset in palm lengths (wrist to middle knuckle)
+MATCH_DISTANCE = 0.25
+
+
+def pose_vector(points):
+    """
+    Normalized pose vector from (21, 2) landmark positions (pixels).
+    Positions are taken relative to the wrist and divided by the palm length,
+    so the same pose matches anywhere in the frame and at any distance from
+    the camera. Orientation is kept: thumbs up and thumbs down stay different.
+    """
+    points = np.asarray(points, dtype=np.float32)[:, :2]
+    relative = points - points[WRIST]
+    palm = float(np.hypot(*relative[MIDDLE_MCP]))
+    if palm < 1e-6:
+        return None
+    return (relative / palm).ravel()
+
+
+class GestureTemplates:
+    """
+    Custom gestures as recorded landmark poses, matched by nearest neighbour.
+
+    Every template is a normalized pose vector (see pose_vector) with a name;
+    a gesture usually has several templates recorded from live input. All
+    vectors sit in one preallocated matrix, so classifying a frame is a single
+    matrix-vector product over every template.
+    """
+    def __init__(self, max_distance=MATCH_DISTANCE):
+        self.max_distance = max_distance
+        self.names = []
+        self.vectors = np.empty((16, NUM_LANDMARKS * 2), dtype=np.float32)
+        self.norms = np.empty(16, dtype=np.float32)  # squared length of each template
+
+    def __len__(self):
+        return len(self.names)
+
+    def gesture_names(self):
+        """Distinct gesture names, in recording order"""
+        return list(dict.fromkeys(self.names))
+
+    def add(self, name, vector):
+        """Add one template for gesture name"""
+        count = len(self.names)
+        if count == len(self.vectors):
+            self.vectors = np.resize(self.vectors, (count * 2, self.vectors.shape[1]))
+            self.norms = np.resize(self.norms, count * 2)
+        self.vectors[count] = vector
+        self.norms[count] = vector @ vector
+        self.names.append(name)
+
+    def remove(self, name):
+        """Drop every template of gesture name, returns how many were removed"""
+        keep = [i for i, n in enumerate(self.names) if n != name]
+        removed = len(self.names) - len(keep)
+        if removed:
+            count = len(keep)
+            self.vectors[:count] = self.vectors[keep]
+            self.norms[:count] = self.norms[keep]
+            self.names = [self.names[i] for i in keep]
+        return removed
+
+    def nearest(self, vector):
+        """(name, RMS landmark distance) of the closest template, or (None, inf)"""
+        count = len(self.names)
+        if count == 0:
+            return None, float('inf')
+        # |t - v|^2 = |t|^2 - 2 t.v + |v|^2 for all templates at once
+        dist_sq = self.norms[:count] - 2 * (self.vectors[:count] @ vector) + vector @ vector
+        i = int(dist_sq.argmin())
+        return self.names[i], float(np.sqrt(max(dist_sq[i], 0.0) / NUM_LANDMARKS))
+
+    def classify(self, vector):
+        """Name of the matching gesture, or None if no template is close enough"""
+        if vector is None:
+            return None
+        name, distance = self.nearest(vector)
+        return name if distance <= self.max_distance else None
+
+    def save(self, path):
+        """Write templates to an .npz file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        count = len(self.names)
+        with open(path, 'wb') as f:
+            np.savez(f, names=np.array(self.names, dtype=str), vectors=self.vectors[:count])
+
+    def load(self, path):
+        """Replace templates with the ones saved at path, returns False if there is no file"""
+        if not os.path.exists(path):
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            names = [str(name) for name in data['names']]
+            vectors = data['vectors'].astype(np.float32)
+        self.names = []
+        for name, vector in zip(names, vectors):
+            self.add(name, vector)
+        return True
+
+
+def _benchmark(counts=(10, 100, 500, 2000), repeat=2000):
+    """Classification time per frame for growing template sets"""
+    rng = np.random.default_rng(0)
+    base = rng.normal(0, 1, (NUM_LANDMARKS, 2)).astype(np.float32)
+    for count in counts:
+        templates = GestureTemplates()
+        for i in range(count):
+            templates.add(f"G{i % 20}", pose_vector(base + rng.normal(0, 0.3, base.shape)))
+        query = pose_vector(base + rng.normal(0, 0.3, base.shape))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            templates.classify(query)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"{count:5d} templates: {elapsed * 1e6:.1f} us per frame")
+
+
+if __name__ == "__main__":
+    # python src/gesture_templates.py [templates.npz] - list a saved set, or benchmark
+    if len(sys.argv) > 1:
+        templates = GestureTemplates()
+        templates.load(sys.argv[1])
+        for name in templates.gesture_names():
+            print(f"{name}: {templates.names.count(name)} templates")
+    else:
+        _benchmark()
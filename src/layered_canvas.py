@@ -0,0 +1,257 @@
+import cv2
+import numpy as np
+
+from tiled_canvas import TILE_SIZE, TiledCanvas
+
+
+class Layer:
+    """Named layer: its own sparse tiles; strokes and text are tagged with their layer"""
+    def __init__(self, name):
+        self.name = name
+        self.visible = True
+        self.tiles = {}
+
+
+class LayeredCanvas(TiledCanvas):
+    """
+    Tiled board with named layers (bottom to top).
+
+    Each layer paints into its own tiles. self.tiles holds the flattened composite
+    of the visible layers, which the viewport reads. The composite is updated only
+    over the region that changed: ink on the top visible layer is stamped straight
+    into it; anything else re-flattens just the affected tile area. Undo, hide,
+    reorder and clear redo only the work for the affected layer.
+
+    stroke_history / text_items stay one chronological list (journal, sessions,
+    export); stroke_layers / text_layers record which layer each entry is on.
+    """
+    def __init__(self, width, height, tile_size=TILE_SIZE):
+        self.layers = [Layer("Layer 1")]
+        self.active = self.layers[0]
+        self._target = self.active  # layer receiving paint (active, or one being redrawn)
+        self._deferred = False      # redrawing a layer - composite once at the end
+        self.stroke_layers = []
+        self.text_layers = []
+        super().__init__(width, height, tile_size)
+
+    # Layer management
+
+    def get_layer(self, name):
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        return None
+
+    def add_layer(self, name=None):
+        """Add an empty layer on top and make it active"""
+        if name is None:
+            number = len(self.layers) + 1
+            while self.get_layer(f"Layer {number}") is not None:
+                number += 1
+            name = f"Layer {number}"
+        self.select_layer(name)
+        return self.active
+
+    def select_layer(self, name):
+        """Make layer name active, creating it on top if it doesn't exist"""
+        self.end_all_strokes()
+        layer = self.get_layer(name)
+        if layer is None:
+            layer = Layer(name)
+            self.layers.append(layer)
+        self.active = self._target = layer
+        self._notify('layer', name)
+        return layer
+
+    def next_layer(self):
+        """Cycle the active layer (bottom to top)"""
+        index = (self.layers.index(self.active) + 1) % len(self.layers)
+        return self.select_layer(self.layers[index].name)
+
+    def set_visible(self, name, visible):
+        layer = self.get_layer(name)
+        if layer is not None and layer.visible != visible:
+            layer.visible = visible
+            self._compose_tiles(layer.tiles)
+            self._notify('layer_visible', (name, visible))
+
+    def move_layer(self, name, index):
+        """Move layer name to position index (0 = bottom)"""
+        layer = self.get_layer(name)
+        if layer is None:
+            return
+        self.layers.remove(layer)
+        index = max(0, min(index, len(self.layers)))
+        self.layers.insert(index, layer)
+        self._compose_tiles(layer.tiles)
+        self._notify('layer_order', (name, index))
+
+    def clear_layer(self, name):
+        """Remove a layer's strokes and text (the layer itself stays)"""
+        layer = self.get_layer(name)
+        if layer is None:
+            return
+        self.end_all_strokes()
+
+        # Drop its history entries; text keeps its place relative to the remaining strokes
+        removed_before = []
+        removed = 0
+        history = []
+        stroke_layers = []
+        for stroke, owner in zip(self.stroke_history, self.stroke_layers):
+            if owner is layer:
+                removed += 1
+            else:
+                history.append(stroke)
+                stroke_layers.append(owner)
+            removed_before.append(removed)
+        texts = []
+        text_layers = []
+        for (text, position, color, before), owner in zip(self.text_items, self.text_layers):
+            if owner is not layer:
+                shift = removed_before[min(before, len(removed_before)) - 1] if before and removed_before else 0
+                texts.append((text, position, color, before - shift))
+                text_layers.append(owner)
+        self.stroke_history, self.stroke_layers = history, stroke_layers
+        self.text_items, self.text_layers = texts, text_layers
+
+        old_tiles = layer.tiles
+        layer.tiles = {}
+        self._compose_tiles(old_tiles)
+        self._notify('clear_layer', name)
+
+    def layer_state(self):
+        """(active name, active position from 1, layer count, active visible) for the UI"""
+        return (self.active.name, self.layers.index(self.active) + 1, len(self.layers),
+                self.active.visible)
+
+    def memory_bytes(self):
+        """Pixel memory held by layer tiles and the composite"""
+        count = len(self.tiles) + sum(len(layer.tiles) for layer in self.layers)
+        return count * self.tile_size * self.tile_size * 3
+
+    # History
+
+    def erase_all(self):
+        """Erase everything, layers included: the board is back to a single empty layer"""
+        super().erase_all()
+
+    def reset(self):
+        """Blank board back to a single empty layer, without notifying listeners"""
+        self.layers = [Layer("Layer 1")]
+        self.active = self._target = self.layers[0]
+        self.stroke_layers = []
+        self.text_layers = []
+        super().reset()
+
+    def reset_surface(self):
+        for layer in self.layers:
+            layer.tiles = {}
+        super().reset_surface()
+
+    def end_stroke(self):
+        count = len(self.stroke_history)
+        super().end_stroke()
+        if len(self.stroke_history) > count:
+            self.stroke_layers.append(self.active)
+
+    def add_stroke(self, stroke, render=True):
+        self.stroke_layers.append(self.active)
+        super().add_stroke(stroke, render)
+
+    def place_text(self, text, position, color, render=True):
+        self.text_layers.append(self.active)
+        super().place_text(text, position, color, render)
+
+    def load_raster(self, image, origin=(0, 0)):
+        # Sessions don't keep layers - the image (and everything loaded) goes on the active one
+        if not super().load_raster(image, origin):
+            return False
+        self.active.tiles = {key: tile.copy() for key, tile in self.tiles.items()}
+        return True
+
+    def session_raster(self):
+        # A load replays every stroke onto one visible layer, so hidden ink must be in the image
+        if any(not layer.visible for layer in self.layers):
+            return None
+        return super().session_raster()
+
+    def undo(self):
+        """Undo last stroke - only its layer is redrawn"""
+        if len(self.stroke_history) > 0:
+            self.stroke_history.pop()
+            self._redraw_layer(self.stroke_layers.pop())
+            self._notify('undo')
+
+    def redraw_from_history(self):
+        for layer in self.layers:
+            self._redraw_layer(layer)
+
+    def _redraw_layer(self, layer):
+        """Re-render one layer from its strokes and text, then re-flatten its area"""
+        old_tiles = layer.tiles
+        layer.tiles = {}
+        self._target = layer
+        self._deferred = True
+        try:
+            texts = [(text, position, color, before)
+                     for (text, position, color, before), owner in zip(self.text_items, self.text_layers)
+                     if owner is layer]
+            text_pos = 0
+            for index, (stroke, owner) in enumerate(zip(self.stroke_history, self.stroke_layers)):
+                while text_pos < len(texts) and texts[text_pos][3] <= index:
+                    self._paint_text(*texts[text_pos][:3])
+                    text_pos += 1
+                if owner is layer:
+                    self.render_stroke(stroke)
+            for text, position, color, _ in texts[text_pos:]:
+                self._paint_text(text, position, color)
+        finally:
+            self._target = self.active
+            self._deferred = False
+        self._compose_tiles(old_tiles.keys() | layer.tiles.keys())
+
+    # Pixels
+
+    def _paint_region(self, region, paint, tiles=None):
+        layer = self._target
+        super()._paint_region(region, paint, layer.tiles)
+        if self._deferred or not layer.visible:
+            return
+        if layer is self._top_visible():
+            # Opaque ink on the top layer lands on the composite unchanged
+            super()._paint_region(region, paint)
+        else:
+            self._compose_rect(*region)
+
+    def _top_visible(self):
+        for layer in reversed(self.layers):
+            if layer.visible:
+                return layer
+        return None
+
+    def _compose_tiles(self, keys):
+        """Re-flatten whole tiles"""
+        ts = self.tile_size
+        for tx, ty in list(keys):
+            self._compose_rect(tx * ts, ty * ts, (tx + 1) * ts - 1, (ty + 1) * ts - 1)
+
+    def _compose_rect(self, x0, y0, x1, y1):
+        """Re-flatten board rect (inclusive) from the visible layers, bottom to top"""
+        ts = self.tile_size
+        visible = [layer for layer in self.layers if layer.visible]
+        for ty in range(y0 // ts, y1 // ts + 1):
+            for tx in range(x0 // ts, x1 // ts + 1):
+                key = (tx, ty)
+                sources = [layer.tiles[key] for layer in visible if key in layer.tiles]
+                if not sources:
+                    self.tiles.pop(key, None)
+                    continue
+                area = (slice(max(y0 - ty * ts, 0), min(y1 - ty * ts, ts - 1) + 1),
+                        slice(max(x0 - tx * ts, 0), min(x1 - tx * ts, ts - 1) + 1))
+                target = self._tile(self.tiles, tx, ty)[area]
+                target[:] = sources[0][area]
+                for source in sources[1:]:
+                    ink = source[area]
+                    cv2.copyTo(ink, ink.any(axis=2).view(np.uint8), target)
+        self._mark_dirty((x0, y0, x1, y1))
@@ -1,68 +1,239 @@
+import time
+START_TIME = time.perf_counter()  # startup report: launch -> first frame
+
 import cv2
 import numpy as np
 from gesture_detector import GestureDetector
-from drawing_canvas import DrawingCanvas
-from virtual_keyboard import VirtualKeyboard
+from layered_canvas import LayeredCanvas
 from notification_system import NotificationSystem
+from ui_layers import UILayerCache, blend_sprite
+from canvas_writer import CanvasWriter, make_filename
+from stroke_journal import StrokeJournal
+from gesture_pipeline import GesturePipeline
+from frame_buffers import AllocationAudit, FrameBuffers
+from capture_config import CaptureConfig, CaptureDevice, add_arguments, parse_size
+from frame_mapping import FrameMapping
+from pen_calibration import PenCalibrator, load_profile, profile_path, save_profile
 
 
 class VirtualDrawingApp:
-    def __init__(self):
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        
-        ret, frame = self.cap.read()
-        if not ret:
+    def __init__(self, audit_allocations=False, capture_config=None,
+                 detection_size=None, canvas_size=None, display_size=None, broadcast=None,
+                 metrics=None):
+        # Startup phases (name, seconds), reported when the first frame is shown
+        self.startup_times = []
+        self._startup_mark = START_TIME
+        self.mark_startup("imports")
+        
+        # Negotiated capture mode (MJPG, 1-frame driver queue by default) with timed reads
+        self.capture_config = capture_config or CaptureConfig()
+        self.cap = CaptureDevice.open(self.capture_config)
+        if not self.cap.isOpened():
             raise Exception("Failed to access webcam")
         
-        h, w, _ = frame.shape
+        # Frame size without waiting for a frame (some backends only report it after one)
+        w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if not w or not h:
+            ret, frame = self.cap.read()
+            if not ret:
+                raise Exception("Failed to access webcam")
+            h, w, _ = frame.shape
+        self.mark_startup("camera")
         
         # SLOWED DOWN: Increased smoothing from 5 to 10 frames
-        self.detector = GestureDetector(smoothing_frames=10)
-        self.canvas = DrawingCanvas(w, h)
-        self.keyboard = VirtualKeyboard(w, h)
+        # Two hands: two people (or both hands) can draw at once.
+        # MediaPipe loads in the background; frames show meanwhile (see run)
+        # Per-frame images (capture, flip, color conversion, masks, composite) are
+        # preallocated once and shared with the detector
+        self.buffers = FrameBuffers()
+        self.audit = AllocationAudit() if audit_allocations else None
+        # Capture, detection, canvas and window sizes are independent; positions
+        # found in the detection frame are mapped to canvas coordinates here
+        self.mapping = FrameMapping((w, h), detection_size, canvas_size, display_size, self.buffers)
+        self.detector = GestureDetector(smoothing_frames=10, max_hands=2, buffers=self.buffers)
+        self.detector.warm_up()
+        self.hands_loaded = False
+        self.hands_failed = False
+        # Board larger than the frame: sparse tiles seen through a pan/zoom viewport,
+        # organised in named layers
+        self.canvas = LayeredCanvas(*self.mapping.view_size)
+        self.keyboard = None  # VirtualKeyboard, built when first opened (K)
         self.notifications = NotificationSystem()
         
-        self.current_gesture = "NONE"
-        self.prev_gesture = "NONE"
+        # Autosave: rebuild the canvas from the stroke journal, then keep journaling
+        self.journal = StrokeJournal("output/autosave.journal", flush_interval=2.0)
+        self.restored_records = self.journal.restore(self.canvas)
+        self.journal.start(self.canvas)
+        
+        # Remote viewers: stroke deltas over the network, (host, port) or None
+        self.broadcaster = None
+        if broadcast:
+            from stroke_broadcast import StrokeBroadcaster
+            self.broadcaster = StrokeBroadcaster(*broadcast)
+            self.broadcaster.start(self.canvas)
+            print(f"Broadcasting strokes on {self.broadcaster.host}:{self.broadcaster.port}")
+        self.mark_startup("canvas + journal")
+        
+        # Saves are encoded and written on a background thread
+        self.writer = CanvasWriter(output_dir="output", fmt='png', compression=3)
+        
+        # Pre-rendered ribbon / side panel sprites
+        self.ui_cache = UILayerCache()
+        
+        # Gesture -> canvas actions (shared with offline video processing)
+        self.pipeline = GesturePipeline(self.detector, self.canvas)
+        self.primary_hand = None  # hand key using the keyboard, text placement and recording
+        
+        # Custom gestures recorded from live hand poses
+        self.gestures_path = "output/gestures.npz"
+        self.detector.gesture_templates.load(self.gestures_path)
+        self.gesture_recording = None  # (name, hand frames left) while recording
         
         # UI settings
         self.show_instructions = True
         self.show_ribbon = True
-        self.paused = False
         
         # Pen mode
         self.pen_mode = False
         self.pen_color_tracking = 'red'  # red, blue, or green
         
-        # Pinch gesture state
-        self.pinch_base_distance = None
-        self.pinch_base_thickness = None
+        # Pen color ranges calibrated for this camera (falls back to the built-in ones)
+        self.pen_profile_path = profile_path(self.capture_config.device)
+        for color, ranges in load_profile(self.pen_profile_path).items():
+            self.detector.set_pen_color_range(color, ranges)
+        self.pen_calibrator = None  # PenCalibrator while calibrating
         
         # Text placement mode
         self.text_placement_mode = False
         self.text_position = None
         
+        # Frame counters (metrics endpoint)
+        self.frames_processed = 0
+        self.frame_seconds_total = 0.0  # from a frame's arrival to its display
+        
+        # Prometheus metrics over HTTP, (host, port) or None
+        self.metrics_server = None
+        if metrics:
+            self.start_metrics(*metrics)
+        
+    def start_metrics(self, host, port):
+        """Serve fps, detection, capture, canvas and memory metrics (read only when scraped)"""
+        from metrics import MetricsRegistry, MetricsServer, process_memory
+        
+        registry = MetricsRegistry()
+        stats = self.cap.stats
+        detector = self.detector
+        canvas = self.canvas
+        registry.gauge('uptime_seconds', "Seconds since start", lambda: time.perf_counter() - START_TIME)
+        registry.counter('frames', "Frames processed", lambda: self.frames_processed)
+        registry.counter('frame_processing_seconds', "Time from frame arrival to display",
+                         lambda: self.frame_seconds_total)
+        registry.gauge('fps', "Frames per second over the last 120 frames", lambda: stats.fps)
+        registry.gauge('capture_read_latency_seconds', "Mean time blocked reading a frame",
+                       lambda: stats.latency_ms[0] / 1000)
+        registry.counter('capture_dropped_frames', "Camera frames missed while the app was busy",
+                         lambda: stats.dropped)
+        registry.counter('capture_failed_reads', "Failed frame reads", lambda: stats.failed)
+        registry.gauge('pen_mode', "1 in pen mode, 0 in hand mode", lambda: int(self.pen_mode))
+        registry.counter('hand_detection_frames', "Frames searched for hands", lambda: detector.hand_frames)
+        registry.counter('hand_detection_hits', "Frames with at least one hand",
+                         lambda: detector.hand_frames_detected)
+        registry.counter('hands_detected', "Hands found, summed over frames", lambda: detector.hands_detected)
+        registry.counter('pen_detection_frames', "Frames searched for the pen tip", lambda: detector.pen_frames)
+        registry.counter('pen_detection_hits', "Frames with the pen tip found",
+                         lambda: detector.pen_frames_detected)
+        registry.counter('canvas_points', "Points drawn", lambda: canvas.points_drawn)
+        registry.counter('canvas_events', "Canvas history events (stroke, undo, erase_all, text, ...)",
+                         lambda: dict(canvas.event_counts), label='event')
+        registry.gauge('canvas_strokes', "Strokes in the undo history", lambda: len(canvas.stroke_history))
+        registry.gauge('canvas_layers', "Canvas layers", lambda: len(canvas.layers))
+        registry.gauge('canvas_tile_bytes', "Pixel memory of canvas tiles", canvas.memory_bytes)
+        registry.gauge('frame_buffer_bytes', "Preallocated frame buffer memory", self.buffers.nbytes)
+        registry.gauge('process_resident_bytes', "Resident memory of the app", process_memory)
+        if self.broadcaster:
+            registry.gauge('broadcast_viewers', "Connected stroke viewers", lambda: len(self.broadcaster.clients))
+            registry.counter('broadcast_sent_bytes', "Bytes sent to stroke viewers",
+                             lambda: self.broadcaster.bytes_sent)
+        
+        self.metrics_server = MetricsServer(registry, host, port)
+        self.metrics_server.start()
+        print(f"Metrics on http://{host}:{self.metrics_server.port}/metrics")
+    
+    def mark_startup(self, phase):
+        """Record how long a startup phase took (since the previous mark)"""
+        now = time.perf_counter()
+        self.startup_times.append((phase, now - self._startup_mark))
+        self._startup_mark = now
+    
+    def report_startup(self):
+        """Print the startup timing report (first frame on screen)"""
+        phases = " | ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.startup_times)
+        print(f"Startup: {phases}")
+        print(f"Capture: {self.cap.describe()}")
+        print(f"Resolutions: {self.mapping.describe()}")
+        print(f"Time to first frame: {(time.perf_counter() - START_TIME) * 1000:.0f} ms "
+              f"(hand tracking and keyboard load on demand)")
+    
+    @property
+    def keyboard_visible(self):
+        return self.keyboard is not None and self.keyboard.visible
+    
+    def toggle_keyboard(self):
+        """Show / hide the virtual keyboard, building it the first time"""
+        if self.keyboard is None:
+            from virtual_keyboard import VirtualKeyboard
+            self.keyboard = VirtualKeyboard(self.canvas.width, self.canvas.height)
+        self.keyboard.toggle_visibility()
+        return self.keyboard.visible
+    
+    def check_hands_loaded(self):
+        """True once hand tracking is available; reports the background load once"""
+        if self.hands_loaded:
+            return True
+        if not self.detector.hands_ready():
+            if self.detector.load_error is not None and not self.hands_failed:
+                self.hands_failed = True
+                print(f"Hand tracking failed to load: {self.detector.load_error}")
+                self.notifications.add_notification("Hand tracking unavailable - use pen mode (P)", 4.0, 'error')
+            return False
+        self.hands_loaded = True
+        print(f"Hand tracking loaded in the background in {self.detector.load_seconds:.2f} s "
+              f"({(time.perf_counter() - START_TIME):.2f} s after launch)")
+        self.notifications.add_notification("Hand tracking ready", 1.5, 'success')
+        return True
+    
     def draw_ui_ribbon(self, frame):
-        """Draw UI ribbon with controls"""
+        """Draw UI ribbon with controls (cached sprite, redrawn on state change)"""
         if not self.show_ribbon:
             return frame
         
         h, w, _ = frame.shape
         
-        # Ribbon background
-        overlay = frame.copy()
+        # Everything the ribbon shows - sprite is re-rendered only when this changes
+        state_key = (w, self.pipeline.current_gesture, self.pen_mode, self.pen_color_tracking,
+                     self.pipeline.paused, self.canvas.current_color,
+                     self.canvas.current_brush_shape, self.canvas.brush_thickness,
+                     self.canvas.layer_state())
+        sprite, mask = self.ui_cache.get('ribbon', state_key,
+                                         lambda: self._render_ribbon(w))
+        
+        # Blend only the ribbon region
+        return blend_sprite(frame, sprite, 0, 0, 0.85, mask)
+    
+    def _render_ribbon(self, w):
+        """Render ribbon sprite (ribbon_height x w)"""
         ribbon_height = 120
-        cv2.rectangle(overlay, (0, 0), (w, ribbon_height), (50, 50, 50), -1)
+        # +1 row: cv2.rectangle fills its bottom edge inclusively
+        overlay = np.full((ribbon_height + 1, w, 3), (50, 50, 50), dtype=np.uint8)
         
         # Status section with PAUSE/PEN indicator
-        status_text = f"Gesture: {self.current_gesture}"
+        status_text = f"Gesture: {self.pipeline.current_gesture}"
         if self.pen_mode:
             status_text += f" [PEN MODE - {self.pen_color_tracking.upper()}]"
             cv2.putText(overlay, status_text, (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 165, 0), 2)
-        elif self.paused:
+        elif self.pipeline.paused:
             status_text += " [PAUSED]"
             cv2.putText(overlay, status_text, (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
@@ -70,6 +241,12 @@ class VirtualDrawingApp:
             cv2.putText(overlay, status_text, (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
+        # Active layer
+        name, position, count, visible = self.canvas.layer_state()
+        layer_text = f"Layer: {name} ({position}/{count})" + ("" if visible else " [HIDDEN]")
+        cv2.putText(overlay, layer_text, (w - 330, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255) if visible else (0, 165, 255), 2)
+        
         # Color palette preview
         palette_x = 10
         palette_y = 50
@@ -131,18 +308,24 @@ class VirtualDrawingApp:
                    (10, controls_y + 25),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
         
-        # Blend overlay
-        cv2.addWeighted(overlay, 0.85, frame, 0.15, 0, frame)
-        
-        return frame
+        return overlay, None
     
     def draw_side_instructions(self, frame):
-        """Draw side panel instructions"""
+        """Draw side panel instructions (cached sprite, redrawn on mode change)"""
         if not self.show_instructions or not self.show_ribbon:
             return frame
         
         h, w, _ = frame.shape
+        panel_width = 250
+        
+        sprite, mask = self.ui_cache.get('side_panel', self.pen_mode,
+                                         lambda: self._render_side_instructions(panel_width))
         
+        # Blend only the panel region
+        return blend_sprite(frame, sprite, w - panel_width, 130, 0.7, mask)
+    
+    def _render_side_instructions(self, panel_width):
+        """Render side panel sprite (panel_width wide, origin at panel top-left)"""
         instructions = [
             "GESTURES:",
             "Index: Draw",
@@ -154,22 +337,25 @@ class VirtualDrawingApp:
             "",
             "KEYBOARD:",
             "P: Pen/Pencil Mode",
+            "1/2/3 0: Pen color/Calibrate",
             "UP/DOWN: Thickness",
-            "K: QWERTY Keyboard",
+            "K/L: Keyboard/Hand overlay",
             "G/B/R/Y/W/P/O/C: Colors",
             "S: Save",
+            "E: Export SVG",
+            "A/D/U/N Z/X V: Pan/Zoom",
+            "J/F/I/M/;: Layers",
+            "[ / ]: Record/Drop gesture",
             "Q: Quit",
             "H: Help",
             "T: Ribbon",
         ]
         
-        # Draw semi-transparent background
-        overlay = frame.copy()
-        panel_width = 250
-        cv2.rectangle(overlay, (w - panel_width, 130), (w, 130 + len(instructions) * 25 + 20), 
-                     (40, 40, 40), -1)
+        # Panel background
+        panel_height = len(instructions) * 25 + 20
+        overlay = np.full((panel_height + 1, panel_width, 3), (40, 40, 40), dtype=np.uint8)
         
-        y_offset = 150
+        y_offset = 20
         for instruction in instructions:
             if instruction == "":
                 y_offset += 10
@@ -180,33 +366,105 @@ class VirtualDrawingApp:
             
             # Highlight pen mode
             if "Pen/Pencil Mode" in instruction and self.pen_mode:
-                cv2.putText(overlay, instruction, (w - panel_width + 10, y_offset),
+                cv2.putText(overlay, instruction, (10, y_offset),
                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 165, 0), 2)
             else:
-                cv2.putText(overlay, instruction, (w - panel_width + 10, y_offset),
+                cv2.putText(overlay, instruction, (10, y_offset),
                            cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), font_thickness)
             y_offset += 25
         
-        # Blend overlay
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-        
-        return frame
+        return overlay, None
     
-    def handle_pinch_gesture(self, landmarks, frame_shape):
-        """Handle pinch gesture for thickness control"""
-        distance, thumb_pos, index_pos = self.detector.get_pinch_distance(landmarks, frame_shape)
-        
-        if self.pinch_base_distance is None:
-            self.pinch_base_distance = distance
-            self.pinch_base_thickness = self.canvas.brush_thickness
-        
-        # Calculate new thickness based on pinch distance change
-        distance_ratio = distance / self.pinch_base_distance
-        new_thickness = int(self.pinch_base_thickness * distance_ratio)
-        self.canvas.set_thickness(new_thickness)
-        
-        # Visual feedback
-        return thumb_pos, index_pos
+    def notify_gesture_event(self, event):
+        """Show feedback for a gesture pipeline event"""
+        if event == "ERASED":
+            self.notifications.add_notification("Canvas erased (layers reset)!", 2.0, 'warning')
+        elif event == "PAUSED":
+            self.notifications.add_notification("PAUSED - Show palm again to resume", 2.0, 'info')
+        elif event == "RESUMED":
+            self.notifications.add_notification("Resumed!", 1.5, 'success')
+        elif event == "UNDO":
+            self.notifications.add_notification("Undo last stroke", 1.5, 'info')
+        elif event == "BRUSH":
+            self.notifications.add_notification(f"Brush: {self.canvas.current_brush_shape}", 1.5, 'info')
+    
+    def record_gesture_frame(self, landmarks, frame):
+        """Add one hand frame to the custom gesture being recorded"""
+        name, remaining = self.gesture_recording
+        if self.detector.record_gesture_sample(name, landmarks, frame.shape):
+            remaining -= 1
+        self.gesture_recording = (name, remaining)
+        cv2.putText(frame, f"Recording {name}: {remaining}", (20, frame.shape[0] - 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        
+        if remaining <= 0:
+            self.gesture_recording = None
+            self.detector.gesture_templates.save(self.gestures_path)
+            self.notifications.add_notification(f"Gesture {name} recorded", 2.0, 'success')
+    
+    def calibrate_pen_frame(self, frame):
+        """Sample the pen tip for calibration, then fit and save the profile"""
+        calibrator = self.pen_calibrator
+        if not calibrator.add_frame(frame):
+            calibrator.draw(frame)
+            return
+        self.pen_calibrator = None
+        ranges, background = calibrator.fit(frame)
+        self.detector.set_pen_color_range(calibrator.color, ranges)
+        save_profile(self.pen_profile_path, self.detector.pen_color_range)
+        self.notifications.add_notification(
+            f"{calibrator.color.upper()} pen calibrated ({background * 100:.1f}% background)", 3.0, 'success')
+    
+    def handle_keyboard_hand(self, gesture, finger_pos):
+        """Type on the virtual keyboard with the first hand"""
+        hovered_key = self.keyboard.check_hover(finger_pos)
+        
+        # Swipe typing: record fingertip path starting on a letter key
+        if (self.keyboard.swipe_mode and gesture == "DRAW" and
+                (self.keyboard.swipe_path or (hovered_key and len(hovered_key) == 1))):
+            self.keyboard.add_swipe_point(finger_pos)
+        
+        # Click on keyboard key when drawing gesture over key
+        elif gesture == "DRAW" and hovered_key:
+            clicked_key = self.keyboard.click_key(hovered_key)
+            if clicked_key == 'SAVE':
+                # Enter text placement mode
+                if self.keyboard.get_text():
+                    self.text_placement_mode = True
+                    self.notifications.add_notification("Point where to place text and draw", 3.0, 'info')
+            elif clicked_key == 'HIDE':
+                self.keyboard.toggle_visibility()
+                self.notifications.add_notification("Keyboard hidden", 1.5, 'info')
+            elif clicked_key == 'SWIPE':
+                mode = "ON" if self.keyboard.swipe_mode else "OFF"
+                self.notifications.add_notification(f"Swipe typing {mode}", 1.5, 'info')
+        
+        # Swipe ends when the draw gesture is released
+        if self.keyboard.swipe_path and gesture != "DRAW":
+            self.finish_swipe()
+    
+    def finish_swipe(self):
+        """Decode the current keyboard swipe into a word"""
+        word = self.keyboard.end_swipe()
+        if word:
+            self.notifications.add_notification(f"Swiped: {word}", 1.5, 'success')
+        else:
+            self.notifications.add_notification("No word matched swipe", 1.5, 'warning')
+    
+    def export_svg(self):
+        """Queue a vector export of the stroke history on the background writer"""
+        from vector_export import export_vector  # imported on first export (slow xml imports)
+        
+        path = make_filename("output", 'png')[:-len('.png')] + '.svg'
+        x, y, width, height = self.canvas.bounds()
+        history = list(self.canvas.stroke_history)
+        text_items = list(self.canvas.text_items)
+        
+        if self.writer.submit_task(path, lambda: export_vector(
+                path, width, height, history, text_items, origin=(x, y)) is not None):
+            self.notifications.add_notification("Exporting SVG...", 1.0, 'info')
+        else:
+            self.notifications.add_notification("Save queue full, try again", 2.0, 'warning')
     
     def run(self):
         """Main application loop"""
@@ -225,8 +483,15 @@ class VirtualDrawingApp:
         print("  - UP Arrow: Increase thickness (+1)")
         print("  - DOWN Arrow: Decrease thickness (-1)")
         print("  - K: QWERTY Virtual Keyboard")
+        print("  - L: Hand overlay (off/minimal/full)")
         print("  - G/B/R/Y/W/P/O/C: Colors")
         print("  - S: Save to output folder")
+        print("  - E: Export strokes as SVG")
+        print("  - A/D/U/N: Pan the board left/right/up/down")
+        print("  - Z/X: Zoom in/out, V: Reset view")
+        print("  - J: New layer, F: Next layer")
+        print("  - I: Hide/show layer, M: Raise layer, ;: Clear layer")
+        print("  - [: Record a custom gesture (hold the pose), ]: Drop the last one")
         print("  - Q: Quit")
         print("  - T: Toggle ribbon")
         print("  - H: Toggle help")
@@ -235,28 +500,46 @@ class VirtualDrawingApp:
         print("  2. Press P to enable Pen Mode")
         print("  3. Point the colored tip at the camera to draw")
         print("  4. Press 1/2/3 to switch tracking color (1=Red, 2=Blue, 3=Green)")
+        print("  5. Press 0 and hold the tip in the box to calibrate its color for this camera")
         print("=" * 70)
         
         self.notifications.add_notification("App Started! Press K for keyboard, P for pen mode", 4.0, 'info')
+        if self.restored_records:
+            self.notifications.add_notification(f"Restored {len(self.canvas.stroke_history)} strokes from autosave", 3.0, 'success')
         
+        first_frame_shown = False
+        capture_shape = (self.mapping.capture_size[1], self.mapping.capture_size[0], 3)
+        if self.audit:
+            self.audit.start()
         while True:
-            ret, frame = self.cap.read()
+            if self.audit:
+                self.audit.begin_frame()
+            
+            ret, raw = self.cap.read(self.buffers.get('capture', capture_shape))
             if not ret:
                 break
+            frame_start = time.perf_counter()
+            capture_shape = raw.shape
             
-            frame = cv2.flip(frame, 1)  # Mirror the frame
+            mirrored = cv2.flip(raw, 1, self.buffers.get('frame', raw.shape))  # Mirror the frame
+            # Indicators, compositing and UI work on the frame at canvas size
+            frame = self.mapping.view_frame(mirrored)
             
             # PEN MODE
-            if self.pen_mode:
-                pen_pos, detected = self.detector.detect_pen_tip(frame)
+            if self.pen_mode and self.pen_calibrator:
+                self.calibrate_pen_frame(frame)
+            
+            elif self.pen_mode:
+                pen_pos, detected = self.detector.detect_pen_tip(self.mapping.detection_frame(mirrored))
                 
                 if detected:
+                    pen_pos = self.mapping.detection_to_view(pen_pos)
                     # Draw with pen
-                    if not self.keyboard.visible:
-                        if self.prev_gesture != "DRAW":
+                    if not self.keyboard_visible:
+                        if self.pipeline.prev_gesture != "DRAW":
                             self.canvas.start_stroke()
                         self.canvas.draw(pen_pos)
-                        self.current_gesture = "DRAW"
+                        self.pipeline.current_gesture = "DRAW"
                         
                         # Visual indicator for pen
                         cv2.circle(frame, pen_pos, 15, (0, 255, 255), 3)
@@ -265,12 +548,9 @@ class VirtualDrawingApp:
                                    (pen_pos[0] + 20, pen_pos[1] - 10),
                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
                     
-                    self.prev_gesture = "DRAW"
+                    self.pipeline.prev_gesture = "DRAW"
                 else:
-                    if self.prev_gesture == "DRAW":
-                        self.canvas.end_stroke()
-                    self.current_gesture = "NONE"
-                    self.prev_gesture = "NONE"
+                    self.pipeline.release()
                     
                     # Show "Point pen here" message
                     h, w, _ = frame.shape
@@ -278,42 +558,43 @@ class VirtualDrawingApp:
                                (w//2 - 250, h//2),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
             
-            # HAND MODE
+            # HAND MODE - the camera view keeps running while MediaPipe loads
+            elif not self.check_hands_loaded():
+                h, w, _ = frame.shape
+                cv2.putText(frame, "Loading hand tracking...", (w//2 - 170, h//2),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+            
             else:
-                # Detect hands
-                results = self.detector.detect_hands(frame)
+                # Detect hands and classify their gestures - each hand keeps its own
+                # smoothing, gesture state and stroke, so several people can draw
+                results, hands = self.pipeline.detect_all(self.mapping.detection_frame(mirrored))
                 
-                if results.multi_hand_landmarks:
-                    landmarks = results.multi_hand_landmarks[0].landmark
-                    
-                    # Get finger states and detect gesture
-                    fingers_up = self.detector.get_finger_states(landmarks)
-                    self.current_gesture = self.detector.detect_gesture(fingers_up, landmarks, frame.shape)
+                # Keyboard, text placement and recording stay with one hand until it
+                # leaves the frame (hands are sorted by label, so a hand coming in can't take over)
+                keys = [key for key, _, _ in hands]
+                if self.primary_hand not in keys:
+                    self.primary_hand = keys[0] if keys else None
+                
+                for hand_key, landmarks, confidence in hands:
+                    primary = hand_key == self.primary_hand
+                    self.pipeline.select_hand(hand_key)
+                    finger_pos = self.pipeline.classify(landmarks, confidence, frame.shape)
+                    gesture = self.pipeline.current_gesture
+                    gesture_applied = False
                     
-                    # Get index finger position (smoothed)
-                    finger_pos = self.detector.get_index_finger_tip(
-                        landmarks, frame.shape
-                    )
+                    # Recording a custom gesture - poses are sampled, not acted on
+                    if self.gesture_recording:
+                        if primary:
+                            self.record_gesture_frame(landmarks, frame)
                     
                     # Check keyboard interaction
-                    if self.keyboard.visible:
-                        hovered_key = self.keyboard.check_hover(finger_pos)
-                        
-                        # Click on keyboard key when drawing gesture over key
-                        if self.current_gesture == "DRAW" and hovered_key:
-                            clicked_key = self.keyboard.click_key(hovered_key)
-                            if clicked_key == 'SAVE':
-                                # Enter text placement mode
-                                if self.keyboard.get_text():
-                                    self.text_placement_mode = True
-                                    self.notifications.add_notification("Point where to place text and draw", 3.0, 'info')
-                            elif clicked_key == 'HIDE':
-                                self.keyboard.toggle_visibility()
-                                self.notifications.add_notification("Keyboard hidden", 1.5, 'info')
+                    elif self.keyboard_visible:
+                        if primary:
+                            self.handle_keyboard_hand(gesture, finger_pos)
                     
                     # Text placement mode
                     elif self.text_placement_mode:
-                        if self.current_gesture == "DRAW":
+                        if primary and gesture == "DRAW":
                             # Place text at finger position
                             text = self.keyboard.get_text()
                             if text:
@@ -323,105 +604,94 @@ class VirtualDrawingApp:
                             self.keyboard.clear_text()
                     
                     # Handle gestures (only if not interacting with keyboard)
-                    elif not self.paused:
-                        if self.current_gesture == "DRAW":
-                            if self.prev_gesture != "DRAW":
-                                self.canvas.start_stroke()
-                            self.canvas.draw(finger_pos)
+                    else:
+                        event = self.pipeline.apply(landmarks, finger_pos, frame.shape)
+                        self.notify_gesture_event(event)
+                        gesture_applied = True
+                        
+                        if not self.pipeline.paused and gesture == "DRAW":
                             # Draw visual indicator
                             cv2.circle(frame, finger_pos, 8, self.canvas.current_color, -1)
                             cv2.circle(frame, finger_pos, 10, (255, 255, 255), 2)
-                        
-                        elif self.current_gesture == "ERASE_ALL":
-                            if self.prev_gesture != "ERASE_ALL":
-                                self.canvas.erase_all()
-                                self.notifications.add_notification("Canvas erased!", 2.0, 'warning')
-                        
-                        elif self.current_gesture == "PAUSE":
-                            if self.prev_gesture != "PAUSE":
-                                self.paused = not self.paused
-                                if self.paused:
-                                    self.notifications.add_notification("PAUSED - Show palm again to resume", 2.0, 'info')
-                                else:
-                                    self.notifications.add_notification("Resumed drawing", 1.5, 'success')
-                        
-                        elif self.current_gesture == "UNDO":
-                            if self.prev_gesture != "UNDO":
-                                self.canvas.undo()
-                                self.notifications.add_notification("Undo last stroke", 1.5, 'info')
-                        
-                        elif self.current_gesture == "THREE_FINGERS":
-                            if self.prev_gesture != "THREE_FINGERS":
-                                new_shape = self.canvas.next_brush_shape()
-                                self.notifications.add_notification(f"Brush: {new_shape}", 1.5, 'info')
-                        
-                        elif self.current_gesture == "PINCH":
-                            thumb_pos, index_pos = self.handle_pinch_gesture(landmarks, frame.shape)
+                        elif not self.pipeline.paused and gesture == "PINCH":
                             # Draw line between thumb and index
+                            thumb_pos, index_pos = self.pipeline.pinch_points
                             cv2.line(frame, thumb_pos, index_pos, (255, 0, 255), 2)
                             cv2.circle(frame, thumb_pos, 8, (255, 0, 255), -1)
                             cv2.circle(frame, index_pos, 8, (255, 0, 255), -1)
-                        
-                        else:
-                            if self.prev_gesture == "DRAW":
-                                self.canvas.end_stroke()
-                            if self.prev_gesture == "PINCH":
-                                self.pinch_base_distance = None
-                                self.pinch_base_thickness = None
                     
-                    # Pause mode - show indicator
-                    if self.paused:
-                        if self.current_gesture == "PAUSE":
-                            if self.prev_gesture != "PAUSE":
-                                self.paused = False
-                                self.notifications.add_notification("Resumed!", 1.5, 'success')
+                    # Pause mode - palm resumes (even over the keyboard) - show indicator
+                    if self.pipeline.paused:
+                        if not gesture_applied:
+                            event = self.pipeline.apply(landmarks, finger_pos, frame.shape)
+                            self.notify_gesture_event(event)
                         
-                        # Draw pause indicator
                         cv2.circle(frame, finger_pos, 30, (0, 165, 255), 5)
                         cv2.putText(frame, "PAUSED", 
                                    (finger_pos[0] - 50, finger_pos[1] - 40),
                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
                     
-                    # Draw hand landmarks
+                    self.pipeline.end_frame()
+                
+                if hands:
+                    # Draw hand landmarks; the ribbon shows the primary hand's gesture
                     frame = self.detector.draw_hand_landmarks(frame, results)
-                    
-                    self.prev_gesture = self.current_gesture
+                    self.pipeline.select_hand(self.primary_hand)
+                elif self.keyboard is not None and self.keyboard.swipe_path:
+                    self.finish_swipe()
+            
+            # Report finished background saves
+            for filename, ok, error in self.writer.poll_completed():
+                if ok:
+                    self.notifications.add_notification(f"Saved: {filename}", 3.0, 'success')
+                    print(f"Drawing saved: {filename}")
                 else:
-                    self.current_gesture = "NONE"
-                    if self.prev_gesture == "DRAW":
-                        self.canvas.end_stroke()
-                    if self.prev_gesture == "PINCH":
-                        self.pinch_base_distance = None
-                        self.pinch_base_thickness = None
-                    self.prev_gesture = "NONE"
+                    self.notifications.add_notification(f"Save failed: {filename}", 3.0, 'error')
+                    print(f"Save failed: {filename} ({error})")
             
             # Update keyboard cooldown
-            self.keyboard.update_cooldown()
+            if self.keyboard is not None:
+                self.keyboard.update_cooldown()
             
             # Composite: webcam + drawing canvas
             canvas_overlay = self.canvas.get_canvas()
-            frame = cv2.addWeighted(frame, 0.7, canvas_overlay, 0.3, 0)
+            frame = cv2.addWeighted(frame, 0.7, canvas_overlay, 0.3, 0,
+                                    self.buffers.get('composite', frame.shape))
             
             # Draw UI elements
             frame = self.draw_ui_ribbon(frame)
             frame = self.draw_side_instructions(frame)
-            frame = self.keyboard.draw(frame)
+            if self.keyboard is not None:
+                frame = self.keyboard.draw(frame)
             frame = self.notifications.draw(frame)
             
             # Display
-            cv2.imshow("Virtual Hand-Drawing", frame)
+            cv2.imshow("Virtual Hand-Drawing", self.mapping.display_frame(frame))
+            self.frames_processed += 1
+            self.frame_seconds_total += time.perf_counter() - frame_start
+            if not first_frame_shown:
+                first_frame_shown = True
+                self.report_startup()
             
             # SLOWED DOWN: Changed from 1ms to 10ms delay
             key = cv2.waitKey(10) & 0xFF
+            if self.audit:
+                self.audit.end_frame()
             
             if key == ord('q'):
                 self.notifications.add_notification("Exiting application...", 1.0, 'info')
                 print("\nExiting application...")
                 break
             elif key == ord('s'):
-                filename = self.canvas.save_canvas()
-                self.notifications.add_notification(f"Saved: {filename}", 3.0, 'success')
-                print(f"Drawing saved: {filename}")
+                # Whole board, not just the part in view
+                filename = self.writer.submit(self.canvas.board_image())
+                # Editable session (strokes + text) next to the image
+                if filename and self.writer.submit_session(self.canvas, filename.rsplit('.', 1)[0] + '.vhds'):
+                    self.notifications.add_notification("Saving...", 1.0, 'info')
+                else:
+                    self.notifications.add_notification("Save queue full, try again", 2.0, 'warning')
+            elif key == ord('e'):
+                self.export_svg()
             elif key == ord('h'):
                 self.show_instructions = not self.show_instructions
                 status = "shown" if self.show_instructions else "hidden"
@@ -431,20 +701,27 @@ class VirtualDrawingApp:
                 status = "shown" if self.show_ribbon else "hidden"
                 self.notifications.add_notification(f"Ribbon {status}", 1.0, 'info')
             elif key == ord('k'):
-                self.keyboard.toggle_visibility()
-                if self.keyboard.visible:
+                if self.toggle_keyboard():
                     self.notifications.add_notification("QWERTY Keyboard opened", 2.0, 'info')
                 else:
                     self.notifications.add_notification("Keyboard closed", 1.0, 'info')
+            elif key == ord('l'):
+                # Cycle hand skeleton overlay detail
+                style = self.detector.next_landmark_style()
+                self.notifications.add_notification(f"Hand overlay: {style.upper()}", 1.5, 'info')
             elif key == ord('p'):
                 # Toggle pen mode
                 self.pen_mode = not self.pen_mode
+                self.pipeline.release_all()
                 mode = "PEN" if self.pen_mode else "HAND"
                 self.notifications.add_notification(f"Mode: {mode} (Tracking: {self.pen_color_tracking.upper()})", 3.0, 'info')
                 print(f"\nMode switched to: {mode}")
                 if self.pen_mode:
                     print(f"Point {self.pen_color_tracking.upper()} colored pen/pencil tip to camera")
                     print("Press 1/2/3 to switch color tracking (1=Red, 2=Blue, 3=Green)")
+                    print("Press 0 to calibrate the pen color")
+                else:
+                    self.pen_calibrator = None
             elif key == ord('1'):
                 # Track red pen
                 self.pen_color_tracking = 'red'
@@ -460,6 +737,60 @@ class VirtualDrawingApp:
                 self.pen_color_tracking = 'green'
                 self.detector.set_pen_color_tracking('green')
                 self.notifications.add_notification("Pen tracking: GREEN", 2.0, 'info')
+            elif key == ord('0'):
+                # Calibrate the tracked pen color
+                if not self.pen_mode:
+                    self.notifications.add_notification("Calibration needs pen mode (P)", 2.0, 'warning')
+                else:
+                    self.pipeline.release()
+                    self.pen_calibrator = PenCalibrator(frame.shape, self.pen_color_tracking)
+            elif key in (ord('a'), ord('d'), ord('u'), ord('n')):
+                # Pan the board by a quarter of the view
+                step_x, step_y = self.canvas.width // 4, self.canvas.height // 4
+                dx, dy = {ord('a'): (-step_x, 0), ord('d'): (step_x, 0),
+                          ord('u'): (0, -step_y), ord('n'): (0, step_y)}[key]
+                self.canvas.pan(dx, dy)
+            elif key == ord('z') or key == ord('x'):
+                zoom = self.canvas.zoom_in() if key == ord('z') else self.canvas.zoom_out()
+                self.notifications.add_notification(f"Zoom: {zoom:g}x", 1.0, 'info')
+            elif key == ord('v'):
+                self.canvas.reset_view()
+                self.notifications.add_notification("View reset", 1.0, 'info')
+            elif key == ord('j'):
+                layer = self.canvas.add_layer()
+                self.notifications.add_notification(f"New layer: {layer.name}", 1.5, 'info')
+            elif key == ord('f'):
+                layer = self.canvas.next_layer()
+                self.notifications.add_notification(f"Layer: {layer.name}", 1.0, 'info')
+            elif key == ord('i'):
+                layer = self.canvas.active
+                self.canvas.set_visible(layer.name, not layer.visible)
+                state = "shown" if layer.visible else "hidden"
+                self.notifications.add_notification(f"{layer.name} {state}", 1.5, 'info')
+            elif key == ord('m'):
+                # Raise the active layer one step (top wraps to bottom)
+                layer = self.canvas.active
+                position = self.canvas.layers.index(layer) + 1
+                self.canvas.move_layer(layer.name, position if position < len(self.canvas.layers) else 0)
+                self.notifications.add_notification(f"{layer.name} moved", 1.0, 'info')
+            elif key == ord(';'):
+                self.canvas.clear_layer(self.canvas.active.name)
+                self.notifications.add_notification(f"{self.canvas.active.name} cleared", 1.5, 'warning')
+            elif key == ord('['):
+                # Record a new custom gesture from the next hand frames
+                templates = self.detector.gesture_templates
+                number = len(templates.gesture_names()) + 1
+                while f"CUSTOM {number}" in templates.names:
+                    number += 1
+                self.gesture_recording = (f"CUSTOM {number}", 30)
+                self.pipeline.release_all()
+                self.notifications.add_notification(f"Hold a pose to record CUSTOM {number}", 2.0, 'info')
+            elif key == ord(']'):
+                names = self.detector.gesture_templates.gesture_names()
+                if names:
+                    self.detector.gesture_templates.remove(names[-1])
+                    self.detector.gesture_templates.save(self.gestures_path)
+                    self.notifications.add_notification(f"Gesture {names[-1]} removed", 1.5, 'warning')
             elif key == 82 or key == 0:  # UP Arrow (key code 82 on Windows, 0 on some systems)
                 # Increase thickness
                 new_thickness = self.canvas.brush_thickness + 1
@@ -477,15 +808,54 @@ class VirtualDrawingApp:
                     color_name = self.canvas.get_color_name()
                     self.notifications.add_notification(f"Color: {color_name}", 1.5, 'info')
         
-        # Cleanup
+        # Cleanup - let pending saves and journal writes finish
+        self.writer.close()
+        self.journal.close()
+        if self.broadcaster:
+            self.broadcaster.close()
+        if self.metrics_server:
+            self.metrics_server.close()
+        self.detector.close()
+        if self.audit:
+            self.audit.report()
+            self.audit.stop()
+        print(f"Capture: {self.cap.stats.summary()}")
         self.cap.release()
         cv2.destroyAllWindows()
+        if self.canvas.items_stored:
+            print(f"Stroke simplification: {self.canvas.items_recorded} -> {self.canvas.items_stored} "
+                  f"segments ({self.canvas.compression_ratio():.1f}x smaller history)")
         print("Application closed. Goodbye!")
 
 
 if __name__ == "__main__":
+    import argparse
+    from stroke_broadcast import parse_address
+    
+    parser = argparse.ArgumentParser(description="Virtual hand-drawing app")
+    parser.add_argument('--audit-alloc', action='store_true',
+                        help="report memory allocated per frame and GC pauses every 100 frames")
+    parser.add_argument('--detect-size', type=parse_size, default=None,
+                        help="run hand / pen detection on frames of this size, e.g. 640x360 (default: capture size)")
+    parser.add_argument('--canvas-size', type=parse_size, default=None,
+                        help="drawing canvas size, e.g. 1920x1080 (default: capture size)")
+    parser.add_argument('--display-size', type=parse_size, default=None,
+                        help="window image size (default: canvas size)")
+    parser.add_argument('--broadcast', metavar='[HOST:]PORT', type=parse_address, default=None,
+                        help="serve stroke deltas to remote viewers (localhost unless HOST is given, "
+                             "e.g. 0.0.0.0:8765 for the LAN)")
+    parser.add_argument('--metrics', metavar='[HOST:]PORT', type=parse_address, default=None,
+                        help="serve Prometheus metrics at http://HOST:PORT/metrics (localhost unless HOST is given)")
+    add_arguments(parser)
+    args = parser.parse_args()
     try:
-        app = VirtualDrawingApp()
+        app = VirtualDrawingApp(audit_allocations=args.audit_alloc,
+                                capture_config=CaptureConfig.from_args(args),
+                                detection_size=args.detect_size,
+                                canvas_size=args.canvas_size,
+                                display_size=args.display_size,
+                                broadcast=args.broadcast,
+                                metrics=args.metrics)
         app.run()
     except Exception as e:
         print(f"Error: {e}")
@@ -1,98 +1,123 @@
 import cv2
+import numpy as np
 import time
+from collections import deque
+from ui_layers import blend_sprite, stamp_sprite
 
 
 class NotificationSystem:
     def __init__(self):
-        self.notifications = []
         self.max_notifications = 5
+        self.notifications = deque(maxlen=self.max_notifications)
+        
+        # Pre-rendered notification boxes keyed by (message, type)
+        self.sprite_cache = {}
+        self.max_cached_sprites = 64
+        
+        self.box_height = 50
         
     def add_notification(self, message, duration=2.0, type='info'):
         """
         Add a notification
         type: 'info', 'success', 'warning', 'error'
         """
+        timestamp = time.time()
         notification = {
             'message': message,
-            'timestamp': time.time(),
+            'timestamp': timestamp,
+            'expires': timestamp + duration,
             'duration': duration,
             'type': type,
-            'alpha': 1.0
+            'alpha': 1.0,
+            'sprite': self._get_sprite(message, type)
         }
+        # deque maxlen keeps only the most recent notifications
         self.notifications.append(notification)
+    
+    def _get_sprite(self, message, type):
+        """Get cached (box, text_mask) sprite for a message, rendering it once"""
+        key = (message, type)
+        sprite = self.sprite_cache.get(key)
+        if sprite is None:
+            # Messages like "Thickness: 7" vary - keep the cache bounded
+            if len(self.sprite_cache) >= self.max_cached_sprites:
+                self.sprite_cache.clear()
+            sprite = self._render_sprite(message, type)
+            self.sprite_cache[key] = sprite
+        return sprite
+    
+    def _render_sprite(self, message, type):
+        """
+        Render notification box with border and text.
+        Sprite origin is one pixel above/left of the box, since the
+        2px border extends one pixel outside it.
+        Returns: (box sprite, text mask)
+        """
+        # Color based on type
+        if type == 'success':
+            bg_color = (0, 180, 0)  # Green
+        elif type == 'error':
+            bg_color = (0, 0, 200)  # Red
+        elif type == 'warning':
+            bg_color = (0, 165, 255)  # Orange
+        else:
+            bg_color = (100, 100, 100)  # Gray
+        
+        # Calculate dimensions
+        text_size = cv2.getTextSize(message, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+        box_width = text_size[0] + 40
+        box_height = self.box_height
+        
+        sprite = np.full((box_height + 3, box_width + 3, 3), (255, 255, 255), dtype=np.uint8)
+        
+        # Draw notification box
+        cv2.rectangle(sprite, (1, 1), (box_width + 1, box_height + 1), bg_color, -1)
+        
+        # Draw border
+        cv2.rectangle(sprite, (1, 1), (box_width + 1, box_height + 1), (255, 255, 255), 2)
         
-        # Keep only recent notifications
-        if len(self.notifications) > self.max_notifications:
-            self.notifications.pop(0)
+        # Text is drawn at full opacity on top of the faded box
+        text_mask = np.zeros(sprite.shape[:2], dtype=np.uint8)
+        cv2.putText(text_mask, message, (21, 33), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 255, 2)
+        cv2.putText(sprite, message, (21, 33), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        
+        return sprite, text_mask
     
     def draw(self, frame):
         """Draw all active notifications"""
         current_time = time.time()
         h, w, _ = frame.shape
         
-        # Filter expired notifications
-        self.notifications = [n for n in self.notifications 
-                             if current_time - n['timestamp'] < n['duration']]
-        
         y_offset = 140  # Start below ribbon
+        expired = None
         
         for notification in self.notifications:
+            if current_time >= notification['expires']:
+                if expired is None:
+                    expired = []
+                expired.append(notification)
+                continue
+            
             elapsed = current_time - notification['timestamp']
             
             # Fade out in last 0.5 seconds
             if elapsed > notification['duration'] - 0.5:
                 notification['alpha'] = (notification['duration'] - elapsed) / 0.5
             
-            # Color based on type
-            if notification['type'] == 'success':
-                bg_color = (0, 180, 0)  # Green
-            elif notification['type'] == 'error':
-                bg_color = (0, 0, 200)  # Red
-            elif notification['type'] == 'warning':
-                bg_color = (0, 165, 255)  # Orange
-            else:
-                bg_color = (100, 100, 100)  # Gray
-            
-            # Calculate dimensions
-            text_size = cv2.getTextSize(notification['message'], 
-                                       cv2.FONT_HERSHEY_SIMPLEX, 
-                                       0.6, 2)[0]
-            box_width = text_size[0] + 40
-            box_height = 50
+            sprite, text_mask = notification['sprite']
+            box_width = sprite.shape[1] - 3
             box_x = w - box_width - 20
             box_y = y_offset
             
-            # Create overlay for transparency
-            overlay = frame.copy()
-            
-            # Draw notification box
-            cv2.rectangle(overlay,
-                         (box_x, box_y),
-                         (box_x + box_width, box_y + box_height),
-                         bg_color,
-                         -1)
+            # Fade only the box region, then stamp the text on top
+            blend_sprite(frame, sprite, box_x - 1, box_y - 1, notification['alpha'] * 0.9)
+            stamp_sprite(frame, sprite, box_x - 1, box_y - 1, text_mask)
             
-            # Draw border
-            cv2.rectangle(overlay,
-                         (box_x, box_y),
-                         (box_x + box_width, box_y + box_height),
-                         (255, 255, 255),
-                         2)
-            
-            # Apply transparency
-            cv2.addWeighted(overlay, notification['alpha'] * 0.9, 
-                          frame, 1 - (notification['alpha'] * 0.9), 0, frame)
-            
-            # Draw text
-            text_x = box_x + 20
-            text_y = box_y + 32
-            cv2.putText(frame, notification['message'],
-                       (text_x, text_y),
-                       cv2.FONT_HERSHEY_SIMPLEX,
-                       0.6,
-                       (255, 255, 255),
-                       2)
-            
-            y_offset += box_height + 10
+            y_offset += self.box_height + 10
+        
+        # Drop expired notifications (rare - no per-frame list rebuild)
+        if expired:
+            for notification in expired:
+                self.notifications.remove(notification)
         
-        return frame
\ No newline at end of file
+        return frame
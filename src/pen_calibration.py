@@ -0,0 +1,222 @@
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+
+# (percentile trim, margin scale) tried from loosest to tightest until the background is rejected
+FITS = ((2, 1.0), (5, 0.75), (10, 0.5), (20, 0.25))
+HUE_MARGIN = 4
+SAT_VAL_MARGIN = 30
+MAX_BACKGROUND = 0.002  # fraction of pixels outside the box allowed to match
+
+
+def profile_path(device=0, directory="output"):
+    """Pen profile file for a capture device"""
+    return os.path.join(directory, f"pen_profile_camera{device}.json")
+
+
+def _hue_ranges(hues, trim, margin):
+    """Hue (lower, upper) pairs covering the trimmed hues; two pairs when they wrap past red"""
+    wrapped = hues.max() - hues.min() > 90
+    if wrapped:
+        hues = (hues.astype(np.int16) + 90) % 180  # move red away from the 0/180 seam
+    low, high = np.percentile(hues, (trim, 100 - trim))
+    low, high = int(low) - margin, int(np.ceil(high)) + margin
+    if wrapped:
+        low, high = low - 90, high - 90
+    if high - low >= 179:
+        return [(0, 180)]
+    if low < 0:
+        return [(0, high), (low + 180, 180)]
+    if high > 180:
+        return [(low, 180), (0, high - 180)]
+    return [(low, high)]
+
+
+def fit_ranges(pixels, trim, scale=1.0):
+    """HSV (lower, upper) ranges around the pen pixels ((N, 3) HSV array)"""
+    ranges = []
+    margin = SAT_VAL_MARGIN * scale
+    sat_val = np.percentile(pixels[:, 1:], (trim, 100 - trim), axis=0)
+    s_low, v_low = np.maximum(sat_val[0] - margin, 0).astype(int)
+    s_high, v_high = np.minimum(np.ceil(sat_val[1]) + margin, 255).astype(int)
+    for h_low, h_high in _hue_ranges(pixels[:, 0], trim, int(round(HUE_MARGIN * scale))):
+        ranges.append((np.array([h_low, s_low, v_low]), np.array([h_high, s_high, v_high])))
+    return ranges
+
+
+def range_mask(hsv, ranges):
+    mask = cv2.inRange(hsv, ranges[0][0], ranges[0][1])
+    for lower, upper in ranges[1:]:
+        mask |= cv2.inRange(hsv, lower, upper)
+    return mask
+
+
+def calibrate(pixels, background_hsv=None, box=None, max_background=MAX_BACKGROUND):
+    """
+    Fit HSV ranges to pen tip pixels.
+    With a background frame (HSV) the trim is tightened until at most
+    max_background of the pixels outside box (x0, y0, x1, y1) still match.
+    Returns: (ranges, background fraction or None)
+    """
+    pixels = np.asarray(pixels).reshape(-1, 3)
+    ranges = fit_ranges(pixels, *FITS[0])
+    if background_hsv is None:
+        return ranges, None
+
+    outside = np.ones(background_hsv.shape[:2], dtype=bool)
+    if box is not None:
+        x0, y0, x1, y1 = box
+        outside[y0:y1, x0:x1] = False
+    count = max(int(outside.sum()), 1)
+
+    for trim, scale in FITS:
+        ranges = fit_ranges(pixels, trim, scale)
+        fraction = np.count_nonzero(range_mask(background_hsv, ranges)[outside]) / count
+        if fraction <= max_background:
+            break
+    return ranges, fraction
+
+
+def save_profile(path, color_ranges):
+    """Write {pen color: [(lower, upper), ...]} to a JSON profile"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {color: [[lower.tolist(), upper.tolist()] for lower, upper in ranges]
+            for color, ranges in color_ranges.items()}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def _hsv_bound(values):
+    bound = np.array(values, dtype=int)
+    if bound.shape != (3,) or bound.min() < 0 or bound.max() > 255:
+        raise ValueError(f"not an HSV bound: {values!r}")
+    return bound
+
+
+def load_profile(path):
+    """
+    {pen color: [(lower, upper), ...]} from a JSON profile, or {} if there is none.
+    A profile that can't be read is reported and ignored (the built-in ranges stay).
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return {color: [(_hsv_bound(lower), _hsv_bound(upper)) for lower, upper in ranges]
+                for color, ranges in data.items()}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Pen profile {path} can't be read ({e}), using the default ranges")
+        return {}
+
+
+class PenCalibrator:
+    """
+    Calibration mode: the user holds the pen tip in a box at the frame center
+    while pixels are sampled for a number of frames, then ranges are fitted
+    against the last frame's background.
+    """
+    def __init__(self, frame_shape, color, box_size=40, frames=30):
+        h, w = frame_shape[:2]
+        self.color = color
+        self.box = (w // 2 - box_size // 2, h // 2 - box_size // 2,
+                    w // 2 + box_size // 2, h // 2 + box_size // 2)
+        self.frames = frames
+        self.samples = []
+
+    @property
+    def remaining(self):
+        return self.frames - len(self.samples)
+
+    def add_frame(self, frame):
+        """Sample the box; returns True when enough frames were collected"""
+        x0, y0, x1, y1 = self.box
+        # Inner half of the box - the user's aim isn't perfect
+        dx, dy = (x1 - x0) // 4, (y1 - y0) // 4
+        patch = cv2.cvtColor(frame[y0 + dy:y1 - dy, x0 + dx:x1 - dx], cv2.COLOR_BGR2HSV)
+        self.samples.append(patch.reshape(-1, 3))
+        return self.remaining <= 0
+
+    def fit(self, frame):
+        """Fit ranges from the samples, rejecting the background of frame"""
+        return calibrate(np.concatenate(self.samples), cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), self.box)
+
+    def draw(self, frame):
+        x0, y0, x1, y1 = self.box
+        cv2.rectangle(frame, (x0, y0), (x1, y1), (0, 255, 255), 2)
+        cv2.putText(frame, f"Hold {self.color.upper()} pen tip in the box: {self.remaining}",
+                    (x0 - 200, y0 - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        return frame
+
+
+def _synthetic_scene(width, height, pen_bgr, rng):
+    """Background with warm-colored clutter (one close to the pen) and a pen tip at the center"""
+    frame = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 8)
+    for _ in range(40):
+        color = tuple(int(c) for c in rng.choice([(30, 60, 200), (60, 40, 220), (40, 120, 230),
+                                                  (120, 40, 160)]))
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.circle(frame, center, int(rng.integers(10, 60)), color, -1)
+    cv2.circle(frame, (width // 2, height // 2), 14, pen_bgr, -1)
+    noise = rng.normal(0, 4, frame.shape)  # sensor noise
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def _benchmark(width=1280, height=720, frames=50):
+    """
+    Mask size, contour count and whole-frame pen detection time: default vs calibrated
+    red ranges; then calibrated ranges tracking the pen in a window around its last position
+    """
+    from gesture_detector import GestureDetector
+
+    rng = np.random.default_rng(0)
+    scene = _synthetic_scene(width, height, (20, 20, 190), rng)
+    calibrator = PenCalibrator(scene.shape, 'red')
+    while not calibrator.add_frame(scene):
+        pass
+    ranges, background = calibrator.fit(scene)
+    print(f"Calibrated red: {[(l.tolist(), u.tolist()) for l, u in ranges]}, "
+          f"background match {background * 100:.3f}%")
+
+    hsv = cv2.cvtColor(scene, cv2.COLOR_BGR2HSV)
+    detector = GestureDetector()
+    for label, color_ranges, calibrated in (("default", detector.pen_color_range['red'], False),
+                                            ("calibrated", ranges, True)):
+        detector.set_pen_color_range('red', color_ranges, calibrated)
+        mask = range_mask(hsv, color_ranges)
+        cleaned = cv2.morphologyEx(cv2.morphologyEx(mask, cv2.MORPH_OPEN, detector.pen_kernel),
+                                   cv2.MORPH_CLOSE, detector.pen_kernel)
+        contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        start = time.perf_counter()
+        for _ in range(frames):
+            detector.pen_position_buffer.clear()
+            detector.pen_last_tip = None  # whole-frame search every time
+            position, found = detector.detect_pen_tip(scene)
+        elapsed = (time.perf_counter() - start) / frames
+        print(f"{label:10s}: {np.count_nonzero(mask) / mask.size * 100:5.2f}% of pixels in mask, "
+              f"{len(contours)} contours, {elapsed * 1000:.2f} ms/frame, pen {position if found else 'lost'}")
+
+    # Window tracking (calibrated ranges only): the last position is kept between frames
+    start = time.perf_counter()
+    for _ in range(frames):
+        detector.pen_position_buffer.clear()
+        position, found = detector.detect_pen_tip(scene)
+    elapsed = (time.perf_counter() - start) / frames
+    print(f"{'tracking':10s}: calibrated ranges, window around the last tip, "
+          f"{elapsed * 1000:.2f} ms/frame, pen {position if found else 'lost'}")
+
+
+if __name__ == "__main__":
+    # python src/pen_calibration.py [profile.json] - show a profile, or compare on a synthetic scene
+    if len(sys.argv) > 1:
+        for color, color_ranges in load_profile(sys.argv[1]).items():
+            print(f"{color}: {[(l.tolist(), u.tolist()) for l, u in color_ranges]}")
+    else:
+        _benchmark()
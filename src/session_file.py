@@ -0,0 +1,252 @@
+import mmap
+import numpy as np
+import os
+import struct
+import sys
+
+from stroke_journal import ITEM_DTYPE, stroke_to_array, array_to_stroke
+
+
+SESSION_MAGIC = b'VHDS'
+SESSION_VERSION = 1
+
+# magic, version, board x, y of the top-left corner, width, height, strokes, items,
+# texts, text blob bytes, has raster
+HEADER = struct.Struct('<4sHiiIIIIIIB')
+SECTION_ALIGN = 16
+
+# Text placed on the canvas; 'after' = number of strokes in history when it was placed
+TEXT_DTYPE = np.dtype([
+    ('after', '<u4'),
+    ('b', 'u1'), ('g', 'u1'), ('r', 'u1'),
+    ('x', '<i2'), ('y', '<i2'),
+    ('offset', '<u4'), ('length', '<u2'),
+])
+
+
+class SessionStroke:
+    """
+    Stroke backed by an ITEM_DTYPE array.
+    Behaves like the list of item dicts DrawingCanvas records; dicts are only
+    built when the stroke is actually iterated (e.g. redraw after undo).
+    """
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(array_to_stroke(self.items))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return array_to_stroke(self.items[index])
+        return array_to_stroke(self.items[[index]])[0]
+
+    def copy(self):
+        return SessionStroke(self.items)
+
+
+def stroke_items(stroke):
+    """ITEM_DTYPE array for a stroke (no conversion for loaded strokes)"""
+    if isinstance(stroke, SessionStroke):
+        return stroke.items
+    return stroke_to_array(stroke)
+
+
+def _align(offset):
+    return (offset + SECTION_ALIGN - 1) // SECTION_ALIGN * SECTION_ALIGN
+
+
+def _layout(n_strokes, n_items, n_texts, blob_size, raster_size):
+    """Section offsets: (stroke index, items, texts, text blob, raster, total size)"""
+    index_off = _align(HEADER.size)
+    items_off = _align(index_off + (n_strokes + 1) * 4)
+    texts_off = _align(items_off + n_items * ITEM_DTYPE.itemsize)
+    blob_off = _align(texts_off + n_texts * TEXT_DTYPE.itemsize)
+    raster_off = _align(blob_off + blob_size)
+    return index_off, items_off, texts_off, blob_off, raster_off, raster_off + raster_size
+
+
+def save_session(path, width, height, stroke_history, text_items=(), raster=None, origin=(0, 0)):
+    """
+    Write a session file.
+    stroke_history: list of strokes (item dict lists or SessionStroke)
+    text_items: list of (text, position, color, strokes_before)
+    raster: optional flattened image of the area (height x width x 3 uint8) for instant loading
+    origin: canvas position of the drawing area's top-left corner (boards can extend past 0, 0)
+    """
+    arrays = [stroke_items(stroke) for stroke in stroke_history]
+    counts = np.array([len(a) for a in arrays], dtype=np.uint32)
+    index = np.zeros(len(arrays) + 1, dtype='<u4')
+    np.cumsum(counts, out=index[1:])
+    items = np.concatenate(arrays) if arrays else np.empty(0, dtype=ITEM_DTYPE)
+
+    texts = np.zeros(len(text_items), dtype=TEXT_DTYPE)
+    blob = bytearray()
+    for i, (text, position, color, after) in enumerate(text_items):
+        encoded = text.encode('utf-8')
+        texts[i] = (after, color[0], color[1], color[2], position[0], position[1],
+                    len(blob), len(encoded))
+        blob += encoded
+
+    raster_size = width * height * 3 if raster is not None else 0
+    offsets = _layout(len(arrays), len(items), len(texts), len(blob), raster_size)
+    index_off, items_off, texts_off, blob_off, raster_off, total = offsets
+
+    header = HEADER.pack(SESSION_MAGIC, SESSION_VERSION, origin[0], origin[1], width, height,
+                         len(arrays), len(items), len(texts), len(blob), raster is not None)
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, 'wb') as f:
+        for offset, data in ((0, header), (index_off, index.tobytes()),
+                             (items_off, items.tobytes()), (texts_off, texts.tobytes()),
+                             (blob_off, bytes(blob))):
+            f.seek(offset)
+            f.write(data)
+        if raster is not None:
+            f.seek(raster_off)
+            f.write(np.ascontiguousarray(raster, dtype=np.uint8).tobytes())
+        f.truncate(total)
+    return path
+
+
+def save_canvas_session(path, canvas):
+    """Write a DrawingCanvas (history, text and flattened image) to a session file"""
+    raster = canvas.session_raster()
+    x, y, width, height = canvas.bounds()
+    return save_session(path, width, height, canvas.stroke_history,
+                        canvas.text_items, raster, origin=(x, y))
+
+
+class Session:
+    """
+    Memory-mapped session file.
+    Sections are exposed as numpy views on the mapping - nothing is parsed per record.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.x, self.y, self.width, self.height, n_strokes, n_items,
+         n_texts, blob_size, has_raster) = HEADER.unpack_from(self.map)
+        if magic != SESSION_MAGIC:
+            raise ValueError(f"Not a session file: {path}")
+        if version != SESSION_VERSION:
+            raise ValueError(f"Unsupported session version {version}: {path}")
+
+        raster_size = self.width * self.height * 3 if has_raster else 0
+        index_off, items_off, texts_off, blob_off, raster_off, _ = _layout(
+            n_strokes, n_items, n_texts, blob_size, raster_size)
+
+        self.stroke_index = np.frombuffer(self.map, dtype='<u4', count=n_strokes + 1, offset=index_off)
+        self.items = np.frombuffer(self.map, dtype=ITEM_DTYPE, count=n_items, offset=items_off)
+        self.texts = np.frombuffer(self.map, dtype=TEXT_DTYPE, count=n_texts, offset=texts_off)
+        self.text_blob = self.map[blob_off:blob_off + blob_size]
+        self.raster = None
+        if has_raster:
+            self.raster = np.frombuffer(self.map, dtype=np.uint8, count=raster_size,
+                                        offset=raster_off).reshape(self.height, self.width, 3)
+
+    def __len__(self):
+        return len(self.stroke_index) - 1
+
+    def stroke(self, i):
+        """Items array of stroke i (view on the mapping)"""
+        return self.items[self.stroke_index[i]:self.stroke_index[i + 1]]
+
+    def text_items(self):
+        """Text items as (text, position, color, strokes_before)"""
+        result = []
+        for after, b, g, r, x, y, offset, length in self.texts.tolist():
+            text = self.text_blob[offset:offset + length].decode('utf-8')
+            result.append((text, (x, y), (b, g, r), after))
+        return result
+
+    def load_into(self, canvas):
+        """
+        Load session into a DrawingCanvas.
+        With a raster the pixels come straight from the file and strokes and text are only
+        added to history; otherwise they are rendered from the stroke table.
+        """
+        canvas.reset()
+        render = self.raster is None or not canvas.load_raster(self.raster, (self.x, self.y))
+        for _ in self._build(canvas, len(self) or 1, render):
+            pass
+        return canvas
+
+    def replay(self, canvas, strokes_per_step=1):
+        """
+        Stream the drawing being built up on canvas.
+        Yields the number of strokes drawn after every strokes_per_step strokes.
+        """
+        # Start from a blank canvas (without notifying history listeners)
+        canvas.reset()
+        yield from self._build(canvas, strokes_per_step)
+
+    def _build(self, canvas, strokes_per_step, render=True):
+        """Add strokes and text in their original order; item data is copied out in one block"""
+        items = self.items.copy()
+        bounds = self.stroke_index.tolist()
+        texts = self.text_items()
+        text_pos = 0
+        n = len(self)
+        for i in range(n):
+            while text_pos < len(texts) and texts[text_pos][3] <= i:
+                self._draw_text(canvas, texts[text_pos], render)
+                text_pos += 1
+            canvas.add_stroke(SessionStroke(items[bounds[i]:bounds[i + 1]]), render)
+            if (i + 1) % strokes_per_step == 0 or i == n - 1:
+                yield i + 1
+        for text in texts[text_pos:]:
+            self._draw_text(canvas, text, render)
+
+    @staticmethod
+    def _draw_text(canvas, text_item, render=True):
+        text, position, color, _ = text_item
+        canvas.place_text(text, position, color, render)
+
+    def close(self):
+        # Drop numpy views before closing the mapping
+        self.stroke_index = self.items = self.texts = self.raster = None
+        self.text_blob = None
+        self.map.close()
+
+
+def load_session(path, canvas):
+    """Load a session file into canvas"""
+    session = Session(path)
+    try:
+        session.load_into(canvas)
+    finally:
+        session.close()
+    return canvas
+
+
+if __name__ == "__main__":
+    # Replay a session file in a window: python src/session_file.py <file.vhds>
+    import cv2
+    from tiled_canvas import TiledCanvas
+
+    if len(sys.argv) != 2:
+        print("Usage: python src/session_file.py <session.vhds>")
+        sys.exit(1)
+
+    session = Session(sys.argv[1])
+    canvas = TiledCanvas(session.width, session.height)
+    canvas.pan(session.x, session.y)  # view the saved drawing area
+    for drawn in session.replay(canvas, strokes_per_step=1):
+        cv2.imshow("Session Replay", canvas.get_canvas())
+        if cv2.waitKey(15) & 0xFF == ord('q'):
+            break
+    print(f"Replayed {len(session)} strokes - press any key to close")
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+    session.close()
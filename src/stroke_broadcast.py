@@ -0,0 +1,393 @@
+import asyncio
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from stroke_journal import apply_event, decode_events, encode_event
+
+
+BROADCAST_MAGIC = b'VHDB'
+BROADCAST_VERSION = 1
+HELLO = struct.Struct('<4sHHH')  # magic, version, canvas width, height
+DEFAULT_PORT = 8765
+
+# A viewer this far behind (bytes queued) is dropped instead of slowing everyone down
+MAX_BACKLOG = 4 * 1024 * 1024
+
+
+def parse_address(text, default_host='127.0.0.1'):
+    """'8765' / 'host:8765' -> (host, port)"""
+    host, _, port = text.rpartition(':')
+    return host or default_host, int(port)
+
+
+def history_records(canvas):
+    """The canvas history (strokes, text, layers) as broadcast records, for joining viewers"""
+    records = bytearray()
+    stroke_layers = getattr(canvas, 'stroke_layers', None)
+    text_layers = getattr(canvas, 'text_layers', None)
+    layer = None
+
+    def select(target):
+        nonlocal layer
+        if target is not None and target is not layer:
+            records.extend(encode_event('layer', target.name))
+            layer = target
+
+    texts = list(enumerate(canvas.text_items))
+    for i, stroke in enumerate(canvas.stroke_history):
+        while texts and texts[0][1][3] <= i:
+            j, (text, position, color, _) = texts.pop(0)
+            select(text_layers[j] if text_layers else None)
+            records.extend(encode_event('text', (text, position, color)))
+        select(stroke_layers[i] if stroke_layers else None)
+        records.extend(encode_event('stroke', stroke))
+    for j, (text, position, color, _) in texts:
+        select(text_layers[j] if text_layers else None)
+        records.extend(encode_event('text', (text, position, color)))
+    # Every layer (empty ones too) in its place, with its visibility
+    for index, target in enumerate(getattr(canvas, 'layers', ())):
+        select(target)
+        records.extend(encode_event('layer_order', (target.name, index)))
+        if not target.visible:
+            records.extend(encode_event('layer_visible', (target.name, False)))
+    select(getattr(canvas, 'active', None))
+    return records
+
+
+class StrokeBroadcaster:
+    """
+    Publishes the board to viewers on the network as compact binary records.
+
+    Viewers get a hello (canvas size), the history so far, then every canvas
+    event as it happens: drawn points, stroke start/end, finished strokes,
+    text, undo, erase and layer changes - the stroke journal's record format
+    plus live drawing records. A point is 10-20 bytes, so a drawing hand costs
+    well under a kilobyte per second instead of a video stream.
+
+    The asyncio server runs on its own thread. Canvas listeners (on the app
+    thread) only encode and queue records; one flush per loop iteration sends
+    the batch to every viewer.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.canvas_size = (0, 0)
+
+        self.pending = bytearray()  # records waiting for the loop thread
+        self.pending_history = bytearray()  # the history ones among them
+        self.pending_erase = False
+        self.history = bytearray()  # history records for viewers that join later
+        self.lock = threading.Lock()
+        self.flush_scheduled = False
+
+        self.clients = set()
+        self.bytes_sent = 0
+        self.records = 0
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+    def start(self, canvas):
+        """Start serving canvas; returns once the server is listening (self.port is bound)"""
+        self.canvas_size = (canvas.width, canvas.height)
+        self.history = history_records(canvas)
+        self.thread = threading.Thread(target=self._run, name="StrokeBroadcaster", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        canvas.add_listener(self.on_canvas_event)
+        canvas.add_live_listener(self.on_live_event)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._serve_viewer, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def on_canvas_event(self, event, data):
+        """Canvas history listener - queue the record (no I/O here)"""
+        record = encode_event(event, data)
+        with self.lock:
+            if event == 'erase_all':
+                # Nothing before an erase is needed to rebuild the board
+                self.pending_history.clear()
+                self.pending_erase = True
+            self.pending += record
+            self.pending_history += record
+            self.records += 1
+            self._schedule_flush()
+
+    def on_live_event(self, event, data):
+        """Canvas live drawing listener - queue the record"""
+        record = encode_event(event, data)
+        with self.lock:
+            self.pending += record
+            self.records += 1
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        # Called with the lock held; one wake-up of the loop per batch
+        if not self.flush_scheduled and self.loop is not None:
+            self.flush_scheduled = True
+            self.loop.call_soon_threadsafe(self._flush)
+
+    def _flush(self):
+        """Loop thread: send queued records to every viewer"""
+        with self.lock:
+            data = bytes(self.pending)
+            self.pending.clear()
+            if self.pending_erase:
+                self.history.clear()
+                self.pending_erase = False
+            self.history += self.pending_history
+            self.pending_history.clear()
+            self.flush_scheduled = False
+        if not data:
+            return
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                self._drop(writer)
+                continue
+            writer.write(data)
+            self.bytes_sent += len(data)
+
+    async def _serve_viewer(self, reader, writer):
+        hello = HELLO.pack(BROADCAST_MAGIC, BROADCAST_VERSION, *self.canvas_size)
+        writer.write(hello + self.history)
+        self.bytes_sent += len(hello) + len(self.history)
+        self.clients.add(writer)
+        try:
+            # Viewers don't send anything - wait for them to disconnect
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self._drop(writer)
+
+    def _drop(self, writer):
+        if writer in self.clients:
+            self.clients.discard(writer)
+            writer.close()
+
+    def close(self):
+        """Disconnect viewers and stop the server thread"""
+        if self.loop is None or self.thread is None:
+            return
+
+        async def shutdown():
+            self._flush()
+            self.server.close()
+            for writer in list(self.clients):
+                self._drop(writer)
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+
+class StrokeViewer:
+    """
+    Rebuilds a broadcast board from the record stream.
+    Live points are painted like the drawing app paints them, so the finished
+    stroke record of a stroke seen from its start only goes into history -
+    its pixels are already there, as they are on the board. A stroke joined
+    mid-way shows up when it ends, painted from its record.
+    """
+    def __init__(self, canvas_factory=None):
+        self.canvas_factory = canvas_factory
+        self.canvas = None
+        self.buffer = bytearray()
+        self.bytes_received = 0
+        self.records = 0
+        self.live_strokes = {}  # stroke key -> True if every point was painted live
+        self.ended_live = False  # the stroke record due next was painted live
+
+    def feed(self, data):
+        """Apply every complete record in data (plus what was left over); False on a bad stream"""
+        self.bytes_received += len(data)
+        self.buffer += data
+        offset = 0
+        if self.canvas is None:
+            if len(self.buffer) < HELLO.size:
+                return True
+            magic, version, width, height = HELLO.unpack_from(self.buffer)
+            if magic != BROADCAST_MAGIC or version != BROADCAST_VERSION:
+                return False
+            self.canvas = self._make_canvas(width, height)
+            offset = HELLO.size
+        for event, payload, end in decode_events(bytes(self.buffer), offset):
+            self._apply(event, payload)
+            offset = end
+            self.records += 1
+        del self.buffer[:offset]
+        return True
+
+    def _apply(self, event, payload):
+        if event == 'stroke' and self.ended_live:
+            self.canvas.add_stroke(payload, render=False)
+        elif event == 'point' and not self.live_strokes.setdefault(payload[0], False):
+            # Joined mid-way: without the earlier points the brush can't continue the stroke
+            # (its path and spray particles depend on them) - its record paints it
+            pass
+        else:
+            apply_event(self.canvas, event, payload)
+        # A stroke_end is followed by its stroke record (unless the stroke was empty)
+        self.ended_live = False
+        if event == 'stroke_start':
+            self.live_strokes[payload] = True
+        elif event == 'stroke_end':
+            self.ended_live = self.live_strokes.pop(payload, False)
+        elif event == 'erase_all':
+            # Strokes in progress restart empty on the board - their later points all arrive
+            self.live_strokes = dict.fromkeys(self.live_strokes, True)
+
+    def _make_canvas(self, width, height):
+        if self.canvas_factory is not None:
+            return self.canvas_factory(width, height)
+        from layered_canvas import LayeredCanvas
+        return LayeredCanvas(width, height)
+
+    async def run(self, host='127.0.0.1', port=DEFAULT_PORT, on_update=None):
+        """Follow a broadcaster until it closes the connection"""
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data or not self.feed(data):
+                    break
+                if on_update is not None:
+                    on_update(self)
+        finally:
+            writer.close()
+
+
+def view(host, port, save=None):
+    """Reference viewer window: python src/stroke_broadcast.py view [host:]port"""
+    import cv2
+
+    viewer = StrokeViewer()
+    state = {'dirty': False, 'quit': False}
+
+    def on_update(_):
+        state['dirty'] = True
+
+    async def show():
+        task = asyncio.ensure_future(viewer.run(host, port, on_update))
+        while not task.done():
+            if state['dirty'] and viewer.canvas is not None:
+                state['dirty'] = False
+                cv2.imshow("Board viewer", viewer.canvas.get_canvas())
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                task.cancel()
+                break
+            await asyncio.sleep(1 / 60)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    print(f"Viewing {host}:{port} (Q to quit)")
+    asyncio.run(show())
+    cv2.destroyAllWindows()
+    if save and viewer.canvas is not None:
+        cv2.imwrite(save, viewer.canvas.get_canvas())
+    print(f"Received {viewer.bytes_received} bytes, {viewer.records} records")
+
+
+def _synthetic_session(canvas, rng, strokes=40, points=60):
+    """Draw like two hands would, one point per hand per frame; returns frame count"""
+    frames = 0
+    shapes = ['NORMAL', 'NORMAL', 'CIRCLE', 'SQUARE', 'SPRAY']
+    for s in range(0, strokes, 2):
+        hands = []
+        for key in ('Right', 'Left'):
+            canvas.select_stroke(key)
+            canvas.start_stroke()
+            start = rng.integers(100, [canvas.width - 100, canvas.height - 100])
+            hands.append((key, start, rng.normal(0, 6, 2), shapes[(s // 2) % len(shapes)]))
+        for t in range(points):
+            for key, start, velocity, shape in hands:
+                canvas.select_stroke(key)
+                canvas.current_brush_shape = shape
+                canvas.current_color = tuple(int(c) for c in rng.integers(0, 256, 3))
+                point = np.clip(start + velocity * t, 0, [canvas.width - 1, canvas.height - 1])
+                canvas.draw(tuple(int(v) for v in point))
+            frames += 1
+        canvas.end_all_strokes()
+        if s % 10 == 4:
+            canvas.undo()
+        if s % 16 == 14:
+            canvas.add_text("hello", (200, 200))
+    return frames
+
+
+def _benchmark(viewers=3, width=1280, height=720, fps=30):
+    """Loopback session: bytes and app-thread CPU vs a JPEG video stream, viewer accuracy"""
+    import cv2
+    from layered_canvas import LayeredCanvas
+
+    def run_session(broadcast):
+        canvas = LayeredCanvas(width, height)
+        broadcaster = None
+        clients = []
+        if broadcast:
+            broadcaster = StrokeBroadcaster('127.0.0.1', 0)
+            broadcaster.start(canvas)
+            clients = [StrokeViewer() for _ in range(viewers)]
+            loop = asyncio.new_event_loop()
+            tasks = [loop.create_task(v.run('127.0.0.1', broadcaster.port)) for v in clients]
+            thread = threading.Thread(target=loop.run_until_complete, args=(asyncio.gather(*tasks),))
+            thread.start()
+            while len(broadcaster.clients) < viewers:
+                time.sleep(0.01)
+        start = time.thread_time()
+        frames = _synthetic_session(canvas, np.random.default_rng(0))
+        cpu = time.thread_time() - start
+        if broadcast:
+            broadcaster.close()
+            thread.join()
+            loop.close()
+        return canvas, broadcaster, clients, frames, cpu
+
+    canvas, _, _, frames, base_cpu = run_session(False)
+    canvas, broadcaster, clients, frames, cpu = run_session(True)
+    seconds = frames / fps
+    jpeg = cv2.imencode('.jpg', canvas.get_canvas(), [cv2.IMWRITE_JPEG_QUALITY, 80])[1].nbytes
+    print(f"{frames} frames ({seconds:.0f} s at {fps} fps), {broadcaster.records} records")
+    print(f"stroke deltas: {broadcaster.bytes_sent / viewers / seconds / 1024:.1f} KB/s per viewer, "
+          f"drawing thread {base_cpu / frames * 1e6:.0f} -> {cpu / frames * 1e6:.0f} us/frame")
+    print(f"JPEG video:    {jpeg * fps / 1024:.0f} KB/s per viewer (q80, one encode per frame)")
+    board = canvas.get_canvas()
+    for i, viewer in enumerate(clients):
+        diff = np.count_nonzero(np.any(viewer.canvas.get_canvas() != board, axis=2)) / (width * height)
+        print(f"viewer {i}: {viewer.bytes_received} bytes, {viewer.records} records, "
+              f"{diff * 100:.3f}% of pixels differ from the board")
+
+
+if __name__ == "__main__":
+    # python src/stroke_broadcast.py                     - loopback benchmark
+    # python src/stroke_broadcast.py view [host:]port [out.png] - reference viewer
+    if len(sys.argv) > 1 and sys.argv[1] == 'view':
+        host, port = parse_address(sys.argv[2] if len(sys.argv) > 2 else str(DEFAULT_PORT))
+        view(host, port, sys.argv[3] if len(sys.argv) > 3 else None)
+    else:
+        _benchmark()
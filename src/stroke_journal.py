@@ -0,0 +1,362 @@
+import numpy as np
+import os
+import struct
+import threading
+
+
+JOURNAL_MAGIC = b'VHDJ'
+JOURNAL_VERSION = 1
+HEADER = struct.Struct('<4sH')
+
+# Record types
+REC_STROKE = 1
+REC_UNDO = 2
+REC_ERASE_ALL = 3
+REC_TEXT = 4
+REC_LAYER = 5
+REC_CLEAR_LAYER = 6
+# Live drawing (broadcast only - never journaled)
+REC_POINT = 7
+REC_STROKE_START = 8
+REC_STROKE_END = 9
+# Layer visibility / stacking order (history, like REC_LAYER)
+REC_LAYER_VISIBLE = 10
+REC_LAYER_ORDER = 11
+
+SHAPE_CODES = {'NORMAL': 0, 'CIRCLE': 1, 'SQUARE': 2, 'SPRAY': 3}
+SHAPE_NAMES = {code: name for name, code in SHAPE_CODES.items()}
+
+# One stroke item - 13 bytes. Point shapes store their point in x0/y0 (and x1/y1).
+ITEM_DTYPE = np.dtype([
+    ('shape', 'u1'),
+    ('b', 'u1'), ('g', 'u1'), ('r', 'u1'),
+    ('thickness', 'u1'),
+    ('x0', '<i2'), ('y0', '<i2'),
+    ('x1', '<i2'), ('y1', '<i2'),
+])
+
+STROKE_HEADER = struct.Struct('<BI')   # type, item count
+TEXT_HEADER = struct.Struct('<BBBBhhH')  # type, b, g, r, x, y, byte length
+LAYER_HEADER = struct.Struct('<BH')  # type, name byte length
+LAYER_STATE_HEADER = struct.Struct('<BHH')  # type, visible flag / position, name byte length
+POINT_HEADER = struct.Struct('<BBBBBBhhB')  # type, shape, b, g, r, thickness, x, y, key byte length
+KEY_HEADER = struct.Struct('<BB')  # type, stroke key byte length
+
+LAYER_EVENTS = {'layer': REC_LAYER, 'clear_layer': REC_CLEAR_LAYER}
+LAYER_RECORDS = {code: event for event, code in LAYER_EVENTS.items()}
+LAYER_STATE_EVENTS = {'layer_visible': REC_LAYER_VISIBLE, 'layer_order': REC_LAYER_ORDER}
+LAYER_STATE_RECORDS = {code: event for event, code in LAYER_STATE_EVENTS.items()}
+KEY_EVENTS = {'stroke_start': REC_STROKE_START, 'stroke_end': REC_STROKE_END}
+KEY_RECORDS = {code: event for event, code in KEY_EVENTS.items()}
+
+
+def _encode_key(key):
+    """Stroke key (hand) as bytes - None (single stroke) is empty"""
+    return b'' if key is None else str(key).encode('utf-8')
+
+
+def _decode_key(data):
+    return bytes(data).decode('utf-8') if len(data) else None
+
+
+def stroke_to_array(stroke):
+    """Convert stroke items (dicts) to an ITEM_DTYPE array"""
+    items = np.empty(len(stroke), dtype=ITEM_DTYPE)
+    for i, item in enumerate(stroke):
+        start = item.get('start', item.get('point'))
+        end = item.get('end', start)
+        b, g, r = item['color']
+        items[i] = (SHAPE_CODES[item['shape']], b, g, r, item['thickness'],
+                    start[0], start[1], end[0], end[1])
+    return items
+
+
+def array_to_stroke(items):
+    """Convert ITEM_DTYPE array back to stroke items (dicts)"""
+    stroke = []
+    for shape, b, g, r, thickness, x0, y0, x1, y1 in items.tolist():
+        name = SHAPE_NAMES[shape]
+        item = {'color': (b, g, r), 'thickness': thickness, 'shape': name}
+        if name == 'NORMAL':
+            item['start'] = (x0, y0)
+            item['end'] = (x1, y1)
+        else:
+            item['point'] = (x0, y0)
+        stroke.append(item)
+    return stroke
+
+
+def encode_event(event, data=None):
+    """Encode a canvas history event as a binary record"""
+    if event == 'stroke':
+        items = stroke_to_array(data)
+        return STROKE_HEADER.pack(REC_STROKE, len(items)) + items.tobytes()
+    if event == 'undo':
+        return bytes((REC_UNDO,))
+    if event == 'erase_all':
+        return bytes((REC_ERASE_ALL,))
+    if event == 'text':
+        text, position, color = data
+        encoded = text.encode('utf-8')
+        return TEXT_HEADER.pack(REC_TEXT, color[0], color[1], color[2],
+                                position[0], position[1], len(encoded)) + encoded
+    if event in LAYER_EVENTS:
+        encoded = data.encode('utf-8')
+        return LAYER_HEADER.pack(LAYER_EVENTS[event], len(encoded)) + encoded
+    if event in LAYER_STATE_EVENTS:
+        name, value = data
+        encoded = name.encode('utf-8')
+        return LAYER_STATE_HEADER.pack(LAYER_STATE_EVENTS[event], int(value), len(encoded)) + encoded
+    if event == 'point':
+        key, (x, y), shape, (b, g, r), thickness = data
+        encoded = _encode_key(key)
+        return POINT_HEADER.pack(REC_POINT, SHAPE_CODES[shape], b, g, r, thickness,
+                                 x, y, len(encoded)) + encoded
+    if event in KEY_EVENTS:
+        encoded = _encode_key(data)
+        return KEY_HEADER.pack(KEY_EVENTS[event], len(encoded)) + encoded
+    raise ValueError(f"Unknown canvas event: {event}")
+
+
+def decode_events(buffer, offset=0):
+    """
+    Decode binary records from buffer.
+    Yields: (event, data, end offset). Stops at a truncated (torn) record.
+    """
+    view = memoryview(buffer)
+    size = len(view)
+    while offset < size:
+        rec_type = view[offset]
+        if rec_type == REC_STROKE:
+            if offset + STROKE_HEADER.size > size:
+                return
+            _, count = STROKE_HEADER.unpack_from(view, offset)
+            start = offset + STROKE_HEADER.size
+            end = start + count * ITEM_DTYPE.itemsize
+            if end > size:
+                return
+            items = np.frombuffer(view[start:end], dtype=ITEM_DTYPE)
+            yield 'stroke', array_to_stroke(items), end
+            offset = end
+        elif rec_type == REC_UNDO:
+            offset += 1
+            yield 'undo', None, offset
+        elif rec_type == REC_ERASE_ALL:
+            offset += 1
+            yield 'erase_all', None, offset
+        elif rec_type == REC_TEXT:
+            if offset + TEXT_HEADER.size > size:
+                return
+            _, b, g, r, x, y, length = TEXT_HEADER.unpack_from(view, offset)
+            start = offset + TEXT_HEADER.size
+            end = start + length
+            if end > size:
+                return
+            text = bytes(view[start:end]).decode('utf-8')
+            yield 'text', (text, (x, y), (b, g, r)), end
+            offset = end
+        elif rec_type in LAYER_RECORDS:
+            if offset + LAYER_HEADER.size > size:
+                return
+            _, length = LAYER_HEADER.unpack_from(view, offset)
+            start = offset + LAYER_HEADER.size
+            end = start + length
+            if end > size:
+                return
+            yield LAYER_RECORDS[rec_type], bytes(view[start:end]).decode('utf-8'), end
+            offset = end
+        elif rec_type in LAYER_STATE_RECORDS:
+            if offset + LAYER_STATE_HEADER.size > size:
+                return
+            _, value, length = LAYER_STATE_HEADER.unpack_from(view, offset)
+            start = offset + LAYER_STATE_HEADER.size
+            end = start + length
+            if end > size:
+                return
+            event = LAYER_STATE_RECORDS[rec_type]
+            if event == 'layer_visible':
+                value = bool(value)
+            yield event, (bytes(view[start:end]).decode('utf-8'), value), end
+            offset = end
+        elif rec_type == REC_POINT:
+            if offset + POINT_HEADER.size > size:
+                return
+            _, shape, b, g, r, thickness, x, y, length = POINT_HEADER.unpack_from(view, offset)
+            start = offset + POINT_HEADER.size
+            end = start + length
+            if end > size:
+                return
+            key = _decode_key(view[start:end])
+            yield 'point', (key, (x, y), SHAPE_NAMES[shape], (b, g, r), thickness), end
+            offset = end
+        elif rec_type in KEY_RECORDS:
+            if offset + KEY_HEADER.size > size:
+                return
+            _, length = KEY_HEADER.unpack_from(view, offset)
+            start = offset + KEY_HEADER.size
+            end = start + length
+            if end > size:
+                return
+            yield KEY_RECORDS[rec_type], _decode_key(view[start:end]), end
+            offset = end
+        else:
+            # Corrupt data - keep what was read so far
+            return
+
+
+def apply_event(canvas, event, data):
+    """Apply a decoded history event to a DrawingCanvas"""
+    if event == 'stroke':
+        canvas.add_stroke(data)
+    elif event == 'undo':
+        canvas.undo()
+    elif event == 'erase_all':
+        canvas.erase_all()
+    elif event == 'text':
+        text, position, color = data
+        canvas.place_text(text, position, color)
+    elif event == 'layer':
+        # Layer events come from a LayeredCanvas; other canvases draw everything on one layer
+        if hasattr(canvas, 'select_layer'):
+            canvas.select_layer(data)
+    elif event == 'clear_layer':
+        if hasattr(canvas, 'clear_layer'):
+            canvas.clear_layer(data)
+    elif event == 'layer_visible':
+        if hasattr(canvas, 'set_visible'):
+            canvas.set_visible(*data)
+    elif event == 'layer_order':
+        if hasattr(canvas, 'move_layer'):
+            canvas.move_layer(*data)
+    elif event == 'point':
+        # Live drawing: paint like the drawing app did, the 'stroke' event records it
+        key, point, shape, color, thickness = data
+        canvas.select_stroke(key)
+        canvas.current_brush_shape = shape
+        canvas.current_color = color
+        canvas.brush_thickness = thickness
+        canvas.draw_point(point)
+    elif event in KEY_EVENTS:
+        # Live items are dropped - the 'stroke' record that follows goes into history
+        canvas.select_stroke(data)
+        canvas.start_stroke()
+
+
+class StrokeJournal:
+    """
+    Append-only write-ahead journal of canvas history events.
+    Records are buffered in memory and written + fsynced by a background
+    thread every flush_interval seconds. An erase-all truncates the journal,
+    since nothing before it is needed to rebuild the canvas.
+    """
+    def __init__(self, path="output/autosave.journal", flush_interval=2.0):
+        self.path = path
+        self.flush_interval = flush_interval
+
+        self.buffer = bytearray()
+        self.truncate = False
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.file = None
+        self.flusher = None
+
+    def restore(self, canvas):
+        """
+        Rebuild canvas from the journal on disk.
+        Returns: number of records replayed
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            return 0
+        magic, version = HEADER.unpack_from(data)
+        if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+            return 0
+
+        count = 0
+        valid_end = HEADER.size
+        for event, payload, end in decode_events(data, HEADER.size):
+            apply_event(canvas, event, payload)
+            valid_end = end
+            count += 1
+
+        # Drop a torn tail record left by a crash
+        if valid_end < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+        return count
+
+    def start(self, canvas):
+        """Open journal for appending, attach to canvas and start the flush thread"""
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size
+        if not new_file and not self._header_ok():
+            # Records appended to a foreign / newer-format file could never be restored:
+            # keep it aside and start a fresh journal
+            os.replace(self.path, self.path + '.bad')
+            print(f"Journal {self.path} has an unknown format, moved to {self.path}.bad")
+            new_file = True
+        self.file = open(self.path, 'wb' if new_file else 'ab')
+        if new_file:
+            self.file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION))
+            self.file.flush()
+
+        canvas.add_listener(self.on_canvas_event)
+
+        self.flusher = threading.Thread(target=self._run, name="StrokeJournal", daemon=True)
+        self.flusher.start()
+
+    def _header_ok(self):
+        with open(self.path, 'rb') as f:
+            data = f.read(HEADER.size)
+        magic, version = HEADER.unpack(data)
+        return magic == JOURNAL_MAGIC and version == JOURNAL_VERSION
+
+    def on_canvas_event(self, event, data):
+        """Canvas listener - buffer the event record (no I/O here)"""
+        record = encode_event(event, data)
+        with self.lock:
+            if event == 'erase_all':
+                self.buffer.clear()
+                self.truncate = True
+            else:
+                self.buffer += record
+
+    def _run(self):
+        """Flush thread loop"""
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write buffered records and fsync"""
+        with self.lock:
+            if not self.buffer and not self.truncate:
+                return
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            truncate = self.truncate
+            self.truncate = False
+
+        if truncate:
+            self.file.truncate(HEADER.size)
+            self.file.seek(HEADER.size)
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        """Stop flush thread and write remaining records"""
+        if self.flusher is not None:
+            self.stop_event.set()
+            self.flusher.join()
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
@@ -0,0 +1,168 @@
+import sys
+import time
+
+import numpy as np
+
+
+def simplify_polyline(points, tolerance):
+    """
+    Ramer-Douglas-Peucker polyline simplification.
+    Keeps the end points and every point further than tolerance (pixels)
+    from the simplified path. Distances are to the segment, not the infinite
+    line, so back-and-forth scribbles keep their turning points.
+    """
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return list(points)
+
+    pts = np.asarray(points, dtype=np.float64)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a = pts[first]
+        ab = pts[last] - a
+        ap = pts[first + 1:last] - a
+        length_sq = ab @ ab
+        if length_sq > 0:
+            t = np.clip(ap @ ab / length_sq, 0.0, 1.0)
+            offset = ap - t[:, None] * ab
+        else:
+            offset = ap
+        dist_sq = np.einsum('ij,ij->i', offset, offset)
+
+        i = int(dist_sq.argmax())
+        if dist_sq[i] > tolerance * tolerance:
+            mid = first + 1 + i
+            keep[mid] = True
+            stack.append((first, mid))
+            stack.append((mid, last))
+
+    return [points[i] for i in np.flatnonzero(keep)]
+
+
+def simplify_stroke(stroke, tolerance):
+    """
+    Simplify the NORMAL segments of a stroke.
+    Runs of connected segments with the same color and thickness are treated as one
+    polyline; other brush shapes are kept as they are.
+    """
+    result = []
+    points = None
+    style = None
+
+    def flush():
+        simplified = simplify_polyline(points, tolerance)
+        for start, end in zip(simplified, simplified[1:]):
+            result.append({
+                'start': start,
+                'end': end,
+                'color': style[0],
+                'thickness': style[1],
+                'shape': 'NORMAL'
+            })
+
+    for item in stroke:
+        if item['shape'] == 'NORMAL':
+            item_style = (item['color'], item['thickness'])
+            if points is not None and item_style == style and points[-1] == item['start']:
+                points.append(item['end'])
+                continue
+            if points is not None:
+                flush()
+            points = [item['start'], item['end']]
+            style = item_style
+            continue
+
+        if points is not None:
+            flush()
+            points = None
+        result.append(item)
+
+    if points is not None:
+        flush()
+    return result
+
+
+def _synthetic_strokes(count=200, points=90, seed=0):
+    """Hand-like strokes: smoothed random walks sampled every frame"""
+    rng = np.random.default_rng(seed)
+    strokes = []
+    for _ in range(count):
+        heading = rng.uniform(0, 2 * np.pi)
+        position = rng.uniform(100, 600, 2)
+        path = []
+        for _ in range(points):
+            heading += rng.normal(0, 0.15)
+            position = np.clip(position + 6 * np.array([np.cos(heading), np.sin(heading)])
+                               + rng.normal(0, 0.4, 2), 0, 719)
+            path.append((int(position[0]), int(position[1])))
+        strokes.append([{'start': a, 'end': b, 'color': (0, 255, 0), 'thickness': 5, 'shape': 'NORMAL'}
+                        for a, b in zip(path, path[1:])])
+    return strokes
+
+
+def _time(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(strokes, width, height, tolerances=(0.5, 1.0, 2.0)):
+    """Print compression ratio, redraw / export speedup and pixel difference per tolerance"""
+    from drawing_canvas import DrawingCanvas
+    from vector_export import iter_pdf, iter_svg
+
+    def redraw(history):
+        canvas = DrawingCanvas(width, height)
+        canvas.stroke_history = history
+        canvas.redraw_from_history()
+        return canvas.canvas
+
+    def export(history):
+        for _ in iter_svg(width, height, history):
+            pass
+        for _ in iter_pdf(width, height, history):
+            pass
+
+    segments = sum(len(s) for s in strokes)
+    base_image = redraw(strokes)
+    base_redraw = _time(lambda: redraw(strokes))
+    base_export = _time(lambda: export(strokes))
+    print(f"{len(strokes)} strokes, {segments} items: redraw {base_redraw * 1000:.1f} ms, "
+          f"SVG+PDF export {base_export * 1000:.1f} ms")
+
+    for tolerance in tolerances:
+        start = time.perf_counter()
+        simplified = [simplify_stroke(s, tolerance) for s in strokes]
+        cost = time.perf_counter() - start
+        kept = sum(len(s) for s in simplified)
+        redraw_time = _time(lambda: redraw(simplified))
+        export_time = _time(lambda: export(simplified))
+        changed = np.any(redraw(simplified) != base_image, axis=2).mean()
+        print(f"tolerance {tolerance:g}px: {segments} -> {kept} items "
+              f"(ratio {segments / max(kept, 1):.1f}x, {cost / len(strokes) * 1e6:.0f} us/stroke), "
+              f"redraw {base_redraw / redraw_time:.1f}x faster, export {base_export / export_time:.1f}x faster, "
+              f"{changed * 100:.2f}% pixels differ")
+
+
+if __name__ == "__main__":
+    # python src/stroke_simplify.py [session.vhds] - report on a saved session or synthetic strokes
+    if len(sys.argv) > 1:
+        from session_file import Session, SessionStroke
+
+        session = Session(sys.argv[1])
+        strokes = [list(SessionStroke(session.stroke(i))) for i in range(len(session))]
+        width, height = session.width, session.height
+        session.close()
+    else:
+        strokes = _synthetic_strokes()
+        width, height = 1280, 720
+    report(strokes, width, height)
@@ -0,0 +1,165 @@
+import numpy as np
+
+
+# Small built-in lexicon, used when no word list file is given
+DEFAULT_WORDS = """
+a about after again all also am an and any are as ask at away back be because
+been before best big but by call came can come could day did do does done down
+draw each end even every eye far few find first for from get give go good great
+had has have he hello help her here him his home how i if in into is it its just
+keep kind know last left let life like line little long look made make man many
+may me more most much must my name need never new next no not now number of off
+old on one only open or other our out over own page paint part pen people place
+play point put read red right said same save saw say see set she should show
+side small so some start still stop such take tell text than thank thanks that
+the their them then there these they thing think this those three time to too
+try turn two under up us use very want was water way we well went were what when
+where which while white who why will with word work world would write yes yet
+you your blue green black color colour yellow purple orange cyan brush canvas
+erase undo hand hi ok okay idea note notes class board welcome today tomorrow
+question answer
+""".split()
+
+
+class TrieNode:
+    __slots__ = ('children', 'word')
+
+    def __init__(self):
+        self.children = {}
+        self.word = None
+
+
+class SwipeDecoder:
+    """
+    Decode a swipe (gesture typing) path over the virtual keyboard into words.
+    Candidates are found by walking a trie of the lexicon against the keys the
+    path passes over, then ranked by distance between the path and each word's
+    ideal key-to-key path.
+    """
+    def __init__(self, key_centers, words=None, samples=32):
+        """
+        key_centers: dict mapping lowercase letter -> (x, y) key center
+        words: iterable of words (defaults to DEFAULT_WORDS)
+        samples: number of points paths are resampled to for scoring
+        """
+        self.key_centers = key_centers
+        self.letters = list(key_centers.keys())
+        self.center_array = np.array([key_centers[c] for c in self.letters], dtype=np.float32)
+        self.samples = samples
+
+        self.root = TrieNode()
+        self.templates = {}  # word -> resampled ideal path, built lazily
+        self.add_words(words if words is not None else DEFAULT_WORDS)
+
+    def add_words(self, words):
+        """Add words to the lexicon (words with non-keyboard letters are skipped)"""
+        for word in words:
+            word = word.strip().lower()
+            if not word or any(c not in self.key_centers for c in word):
+                continue
+            node = self.root
+            for c in word:
+                node = node.children.setdefault(c, TrieNode())
+            node.word = word
+
+    def load_words(self, path):
+        """Load a word list file (one word per line)"""
+        with open(path, encoding='utf-8') as f:
+            self.add_words(f)
+
+    @staticmethod
+    def resample(points, n):
+        """Resample polyline to n points equally spaced along its length"""
+        points = np.asarray(points, dtype=np.float32)
+        if len(points) == 1:
+            return np.repeat(points, n, axis=0)
+
+        seg_lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+        cumulative = np.concatenate(([0.0], np.cumsum(seg_lengths)))
+        total = cumulative[-1]
+        if total == 0:
+            return np.repeat(points[:1], n, axis=0)
+
+        targets = np.linspace(0.0, total, n)
+        x = np.interp(targets, cumulative, points[:, 0])
+        y = np.interp(targets, cumulative, points[:, 1])
+        return np.stack((x, y), axis=1)
+
+    def key_sequence(self, path):
+        """Letters under a densely resampled path, with consecutive repeats collapsed"""
+        dense = self.resample(path, self.samples * 2)
+        dists = np.linalg.norm(dense[:, None, :] - self.center_array[None, :, :], axis=2)
+        nearest = np.argmin(dists, axis=1)
+
+        sequence = []
+        for idx in nearest:
+            letter = self.letters[idx]
+            if not sequence or sequence[-1] != letter:
+                sequence.append(letter)
+        return sequence
+
+    def _candidates(self, sequence):
+        """
+        Words whose letters appear in order in the key sequence, starting on the
+        first key and ending on the last key of the path
+        """
+        # next_pos[i][c] - first index >= i where letter c occurs in sequence
+        n = len(sequence)
+        next_pos = [None] * (n + 1)
+        next_pos[n] = {}
+        for i in range(n - 1, -1, -1):
+            next_pos[i] = dict(next_pos[i + 1])
+            next_pos[i][sequence[i]] = i
+
+        first, last = sequence[0], sequence[-1]
+        start = self.root.children.get(first)
+        if start is None:
+            return []
+
+        found = []
+        stack = [(start, 0, first)]
+        while stack:
+            node, pos, prev = stack.pop()
+            if node.word is not None and pos == n - 1:
+                found.append(node.word)
+            for c, child in node.children.items():
+                if c == prev:
+                    # Double letter - stays on the same key
+                    stack.append((child, pos, c))
+                    continue
+                nxt = next_pos[pos + 1].get(c)
+                if nxt is not None:
+                    stack.append((child, nxt, c))
+                    if c == last and nxt < n - 1:
+                        # The path may come back to this key at the end ('cat' over c-a-t-a-t)
+                        stack.append((child, n - 1, c))
+        return list(dict.fromkeys(found))
+
+    def _template(self, word):
+        """Resampled ideal path through the key centers of word"""
+        template = self.templates.get(word)
+        if template is None:
+            template = self.resample([self.key_centers[c] for c in word], self.samples)
+            self.templates[word] = template
+        return template
+
+    def decode(self, path, max_results=5):
+        """
+        Decode swipe path (list of (x, y)) into ranked candidates.
+        Returns: list of (word, score) - lower score is better
+        """
+        if not path:
+            return []
+
+        sequence = self.key_sequence(path)
+        words = self._candidates(sequence)
+        if not words:
+            return []
+
+        # Mean point-to-point distance between path and each word template
+        user = self.resample(path, self.samples)
+        templates = np.stack([self._template(w) for w in words])
+        scores = np.linalg.norm(templates - user[None, :, :], axis=2).mean(axis=1)
+
+        order = np.argsort(scores)[:max_results]
+        return [(words[i], float(scores[i])) for i in order]
@@ -0,0 +1,279 @@
+import math
+
+import cv2
+import numpy as np
+
+from drawing_canvas import (DrawingCanvas, draw_item, draw_particles, draw_run, draw_stamps,
+                            item_bounds, points_bounds)
+from ui_layers import stamp_sprite
+
+
+TILE_SIZE = 256
+ZOOM_LEVELS = [0.25, 0.5, 1.0, 2.0, 4.0]
+
+# Board coordinates are stored as int16 in journals and session files
+BOARD_LIMIT = 32000
+
+
+class TiledCanvas(DrawingCanvas):
+    """
+    Drawing board made of fixed-size tiles, allocated the first time ink lands on them,
+    seen through a pan/zoom viewport the size of the camera frame.
+
+    Stroke history, placed text and listener events use board coordinates;
+    draw() and add_text() take view coordinates like a plain DrawingCanvas.
+    get_canvas() returns the view image, rebuilt only from visible tiles and
+    only where something changed.
+    """
+    def __init__(self, width, height, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.tiles = {}  # (tile x, tile y) -> tile_size x tile_size x 3 image
+
+        # Viewport: board position of the view's top-left pixel and zoom factor
+        self.view_x = 0
+        self.view_y = 0
+        self.zoom = 1.0
+
+        self.view = np.zeros((height, width, 3), dtype=np.uint8)
+        self.dirty = True  # True = whole view, (x0, y0, x1, y1) = board rect, None = clean
+        super().__init__(width, height)
+
+    @property
+    def canvas(self):
+        return self.get_canvas()
+
+    # Coordinates
+
+    def to_board(self, point):
+        """View position -> board position"""
+        return (int(round(self.view_x + point[0] / self.zoom)),
+                int(round(self.view_y + point[1] / self.zoom)))
+
+    def to_view(self, point):
+        """Board position -> view position"""
+        return (int(round((point[0] - self.view_x) * self.zoom)),
+                int(round((point[1] - self.view_y) * self.zoom)))
+
+    def bounds(self):
+        """Area covered by allocated tiles (x, y, width, height), or the view if the board is blank"""
+        if not self.tiles:
+            return (self.view_x, self.view_y,
+                    math.ceil(self.width / self.zoom), math.ceil(self.height / self.zoom))
+        xs = [tx for tx, _ in self.tiles]
+        ys = [ty for _, ty in self.tiles]
+        ts = self.tile_size
+        return (min(xs) * ts, min(ys) * ts,
+                (max(xs) - min(xs) + 1) * ts, (max(ys) - min(ys) + 1) * ts)
+
+    def memory_bytes(self):
+        """Pixel memory held by allocated tiles"""
+        return len(self.tiles) * self.tile_size * self.tile_size * 3
+
+    # Viewport
+
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) view pixels"""
+        self._set_view(self.view_x + dx / self.zoom, self.view_y + dy / self.zoom, self.zoom)
+
+    def set_zoom(self, zoom, center=None):
+        """Zoom keeping the board point under center (view coordinates, default middle) fixed"""
+        if center is None:
+            center = (self.width / 2, self.height / 2)
+        board_x = self.view_x + center[0] / self.zoom
+        board_y = self.view_y + center[1] / self.zoom
+        self._set_view(board_x - center[0] / zoom, board_y - center[1] / zoom, zoom)
+
+    def zoom_in(self):
+        larger = [z for z in ZOOM_LEVELS if z > self.zoom]
+        if larger:
+            self.set_zoom(larger[0])
+        return self.zoom
+
+    def zoom_out(self):
+        smaller = [z for z in ZOOM_LEVELS if z < self.zoom]
+        if smaller:
+            self.set_zoom(smaller[-1])
+        return self.zoom
+
+    def reset_view(self):
+        self._set_view(0, 0, 1.0)
+
+    def _set_view(self, x, y, zoom):
+        span_x = self.width / zoom
+        span_y = self.height / zoom
+        self.view_x = int(round(min(max(x, -BOARD_LIMIT), BOARD_LIMIT - span_x)))
+        self.view_y = int(round(min(max(y, -BOARD_LIMIT), BOARD_LIMIT - span_y)))
+        self.zoom = zoom
+        self.dirty = True
+
+    # Pixels
+
+    def reset_surface(self):
+        """Drop every tile"""
+        self.tiles.clear()
+        self.dirty = True
+
+    def load_raster(self, image, origin=(0, 0)):
+        """
+        Take the board from a flattened image of the rect at origin (a session raster,
+        see bounds()). Blank tiles stay unallocated. Returns False if it isn't tile-aligned.
+        """
+        x, y = origin
+        height, width = image.shape[:2]
+        ts = self.tile_size
+        if x % ts or y % ts or width % ts or height % ts:
+            return False
+        self.reset_surface()
+        for top in range(0, height, ts):
+            for left in range(0, width, ts):
+                block = image[top:top + ts, left:left + ts]
+                if block.any():
+                    self.tiles[((x + left) // ts, (y + top) // ts)] = block.copy()
+        return True
+
+    def _paint(self, item):
+        self._paint_region(item_bounds(item), lambda tile, origin: draw_item(tile, item, origin))
+
+    def _paint_stamps(self, shape, points, color, thickness):
+        region = points_bounds(points, thickness + 1)
+        self._paint_region(region, lambda tile, origin: draw_stamps(tile, shape, points, color,
+                                                                    thickness, origin))
+
+    def _paint_run(self, shape, color, thickness, points):
+        if shape == 'SPRAY':
+            self._paint_particles(points, color)
+            return
+        region = points_bounds(points, thickness + 1)
+        self._paint_region(region, lambda tile, origin: draw_run(tile, shape, color, thickness,
+                                                                 points, origin))
+
+    def _paint_particles(self, particles, color):
+        x0, y0 = particles[:, :2].min(axis=0).tolist()
+        x1, y1 = particles[:, :2].max(axis=0).tolist()
+        pad = int(particles[:, 2].max()) + 1
+        region = (x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+        self._paint_region(region, lambda tile, origin: draw_particles(tile, particles, color, origin))
+
+    def _paint_text(self, text, position, color):
+        (text_w, text_h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 2)
+        x, y = position
+        region = (x - 2, y - text_h - 2, x + text_w + 2, y + baseline + 2)
+
+        def paint(tile, origin):
+            cv2.putText(tile, text, (x - origin[0], y - origin[1]),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2)
+        self._paint_region(region, paint)
+
+    def _paint_region(self, region, paint, tiles=None):
+        """
+        Run paint(image, image origin) for the board rect region on tiles (default: self.tiles).
+        Inside one tile it paints the tile directly. Across tiles it paints once into
+        a patch, so lines aren't clipped differently per tile, and stamps the ink into
+        each tile. Tiles are allocated on demand.
+        """
+        if tiles is None:
+            tiles = self.tiles
+        x0, y0, x1, y1 = region
+        ts = self.tile_size
+        tx0, ty0, tx1, ty1 = x0 // ts, y0 // ts, x1 // ts, y1 // ts
+
+        if tx0 == tx1 and ty0 == ty1:
+            tile = self._tile(tiles, tx0, ty0)
+            paint(tile, (tx0 * ts, ty0 * ts))
+        else:
+            patch = np.zeros((y1 - y0 + 1, x1 - x0 + 1, 3), dtype=np.uint8)
+            paint(patch, (x0, y0))
+            mask = patch.any(axis=2).view(np.uint8)
+            for ty in range(ty0, ty1 + 1):
+                for tx in range(tx0, tx1 + 1):
+                    top, left = max(y0, ty * ts), max(x0, tx * ts)
+                    bottom, right = min(y1, (ty + 1) * ts - 1), min(x1, (tx + 1) * ts - 1)
+                    ink = mask[top - y0:bottom - y0 + 1, left - x0:right - x0 + 1]
+                    # Blank tiles stay unallocated
+                    if (tx, ty) not in tiles and not ink.any():
+                        continue
+                    stamp_sprite(self._tile(tiles, tx, ty), patch, x0 - tx * ts, y0 - ty * ts, mask)
+        self._mark_dirty(region)
+
+    def _tile(self, tiles, tx, ty):
+        tile = tiles.get((tx, ty))
+        if tile is None:
+            tile = tiles[(tx, ty)] = np.zeros((self.tile_size, self.tile_size, 3), dtype=np.uint8)
+        return tile
+
+    def _mark_dirty(self, region):
+        if self.dirty is True:
+            return
+        if self.dirty is None:
+            self.dirty = region
+        else:
+            self.dirty = (min(self.dirty[0], region[0]), min(self.dirty[1], region[1]),
+                          max(self.dirty[2], region[2]), max(self.dirty[3], region[3]))
+
+    def copy_region(self, dest, x, y):
+        """Fill dest with the board pixels whose top-left is at board (x, y)"""
+        h, w = dest.shape[:2]
+        ts = self.tile_size
+        for ty in range(y // ts, (y + h - 1) // ts + 1):
+            top = max(y, ty * ts)
+            bottom = min(y + h, (ty + 1) * ts)
+            for tx in range(x // ts, (x + w - 1) // ts + 1):
+                left = max(x, tx * ts)
+                right = min(x + w, (tx + 1) * ts)
+                target = dest[top - y:bottom - y, left - x:right - x]
+                tile = self.tiles.get((tx, ty))
+                if tile is None:
+                    target[:] = 0
+                else:
+                    target[:] = tile[top - ty * ts:bottom - ty * ts, left - tx * ts:right - tx * ts]
+        return dest
+
+    def board_image(self):
+        """Image of the whole used board (the bounds() rect), not just the view"""
+        x, y, width, height = self.bounds()
+        return self.copy_region(np.empty((height, width, 3), dtype=np.uint8), x, y)
+
+    def get_canvas(self):
+        """View image (width x height), refreshed from the visible tiles that changed"""
+        if self.dirty is None:
+            return self.view
+
+        if self.dirty is True:
+            self._refresh(0, 0, self.width, self.height)
+        else:
+            # Only the view pixels covering the changed board rect
+            x0, y0, x1, y1 = self.dirty
+            step = math.ceil(self.zoom)
+            left = max(math.floor((x0 - self.view_x) * self.zoom), 0)
+            top = max(math.floor((y0 - self.view_y) * self.zoom), 0)
+            right = min(math.floor((x1 - self.view_x) * self.zoom) + step, self.width)
+            bottom = min(math.floor((y1 - self.view_y) * self.zoom) + step, self.height)
+            if left < right and top < bottom:
+                self._refresh(left, top, right, bottom)
+
+        self.dirty = None
+        return self.view
+
+    def _refresh(self, left, top, right, bottom):
+        """
+        Re-render view rect [left, right) x [top, bottom) from the tiles.
+        Zoom levels are whole-number factors, so every view pixel depends on its own
+        block of board pixels and partial updates match a full redraw.
+        """
+        target = self.view[top:bottom, left:right]
+        if self.zoom == 1.0:
+            self.copy_region(target, self.view_x + left, self.view_y + top)
+        elif self.zoom < 1.0:
+            factor = round(1 / self.zoom)
+            region = np.empty(((bottom - top) * factor, (right - left) * factor, 3), dtype=np.uint8)
+            self.copy_region(region, self.view_x + left * factor, self.view_y + top * factor)
+            target[:] = cv2.resize(region, (right - left, bottom - top), interpolation=cv2.INTER_AREA)
+        else:
+            factor = round(self.zoom)
+            left -= left % factor
+            top -= top % factor
+            target = self.view[top:bottom, left:right]
+            region = np.empty((math.ceil((bottom - top) / factor), math.ceil((right - left) / factor), 3),
+                              dtype=np.uint8)
+            self.copy_region(region, self.view_x + left // factor, self.view_y + top // factor)
+            target[:] = region.repeat(factor, axis=0).repeat(factor, axis=1)[:bottom - top, :right - left]
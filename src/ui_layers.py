@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+
+def _clip(frame, sprite, x, y):
+    """Clip sprite placed at (x, y) to frame; returns (frame slices, sprite slices) or None"""
+    h, w = frame.shape[:2]
+    sh, sw = sprite.shape[:2]
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + sw, w), min(y + sh, h)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return ((slice(y0, y1), slice(x0, x1)),
+            (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x)))
+
+
+def blend_sprite(frame, sprite, x, y, opacity=1.0, mask=None):
+    """
+    Blend a pre-rendered sprite into frame at (x, y), in place.
+    Only the sprite's region is touched; the sprite is clipped to the frame.
+    mask: optional per-pixel alpha (HxW float32, 0..1) multiplied with opacity
+    """
+    clipped = _clip(frame, sprite, x, y)
+    if clipped is None or opacity <= 0:
+        return frame
+
+    dst, src = clipped
+    roi = frame[dst]
+    sprite = sprite[src]
+
+    if mask is None:
+        # Uniform alpha - blend the region directly into the frame view
+        cv2.addWeighted(sprite, opacity, roi, 1.0 - opacity, 0, roi)
+    else:
+        alpha = mask[src][:, :, None] * opacity
+        roi[:] = (sprite * alpha + roi * (1.0 - alpha)).astype(np.uint8)
+    return frame
+
+
+def stamp_sprite(frame, sprite, x, y, mask):
+    """Copy sprite pixels where mask (HxW uint8) is non-zero into frame at (x, y), in place"""
+    clipped = _clip(frame, sprite, x, y)
+    if clipped is None:
+        return frame
+
+    dst, src = clipped
+    cv2.copyTo(sprite[src], mask[src], frame[dst])
+    return frame
+
+
+class UILayerCache:
+    """
+    Cache of pre-rendered UI sprites.
+    Each layer is re-rendered only when its state key changes.
+    """
+    def __init__(self):
+        self.layers = {}  # name -> (state_key, sprite, mask)
+
+    def get(self, name, state_key, render):
+        """
+        Get sprite for layer, re-rendering only if state changed
+        render: callable returning (sprite, mask) - mask may be None
+        """
+        cached = self.layers.get(name)
+        if cached is not None and cached[0] == state_key:
+            return cached[1], cached[2]
+
+        sprite, mask = render()
+        self.layers[name] = (state_key, sprite, mask)
+        return sprite, mask
+
+    def invalidate(self, name=None):
+        """Drop one cached layer, or all layers if name is None"""
+        if name is None:
+            self.layers.clear()
+        else:
+            self.layers.pop(name, None)
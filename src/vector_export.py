@@ -0,0 +1,238 @@
+import sys
+from xml.sax.saxutils import escape
+
+from drawing_canvas import stamp_path, stamp_spacing, stroke_runs
+
+
+def _stamp_primitives(shape, color, thickness, points):
+    """Primitives for a CIRCLE / SQUARE run, following the same interpolated path as the canvas"""
+    path = stamp_path(points, stamp_spacing(shape, thickness))
+    if shape == 'CIRCLE':
+        if len(path) == 1:
+            yield 'circle', color, thickness, path[0]
+        else:
+            # Swept disc = round-capped line twice the radius wide
+            yield 'polyline', color, 2 * thickness, path
+    else:
+        for x, y in path:
+            yield 'rect', color, (x - thickness, y - thickness), (x + thickness, y + thickness)
+
+
+def iter_primitives(stroke_history, text_items=()):
+    """
+    Turn stroke history into drawing primitives, grouped like the canvas renders
+    them (stroke_runs): connected NORMAL segments with the same color and
+    thickness become one polyline, spray the same particles as on the canvas.
+    Yields:
+        ('polyline', color, thickness, points)
+        ('circle', color, radius, center)
+        ('rect', color, top_left, bottom_right)
+        ('spray', color, particles)  - [(x, y, radius), ...]
+        ('text', color, position, text)
+    """
+    texts = sorted(text_items, key=lambda t: t[3])
+    text_pos = 0
+
+    for index, stroke in enumerate(stroke_history):
+        while text_pos < len(texts) and texts[text_pos][3] <= index:
+            text, position, color, _ = texts[text_pos]
+            yield 'text', color, position, text
+            text_pos += 1
+
+        for shape, color, thickness, points in stroke_runs(stroke):
+            if shape == 'SPRAY':
+                yield 'spray', color, points.tolist()
+            else:
+                yield from _run_primitives((shape, color, thickness), points)
+
+    for text, position, color, _ in texts[text_pos:]:
+        yield 'text', color, position, text
+
+
+def _run_primitives(style, points):
+    shape, color, thickness = style
+    if shape == 'NORMAL':
+        yield 'polyline', color, thickness, points
+    else:
+        yield from _stamp_primitives(shape, color, thickness, points)
+
+
+_hex_cache = {}
+
+
+def _hex_color(color):
+    """BGR tuple to #rrggbb"""
+    hex_color = _hex_cache.get(color)
+    if hex_color is None:
+        b, g, r = color
+        hex_color = _hex_cache[color] = f"#{r:02x}{g:02x}{b:02x}"
+    return hex_color
+
+
+def iter_svg(width, height, stroke_history, text_items=(), background=(0, 0, 0), origin=(0, 0)):
+    """
+    Stream an SVG document as string chunks (one per element).
+    background: BGR fill color, or None for transparent
+    origin: canvas position of the document's top-left corner
+    """
+    ox, oy = origin
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="{ox} {oy} {width} {height}">\n')
+    if background is not None:
+        yield (f'<rect x="{ox}" y="{oy}" width="{width}" height="{height}" '
+               f'fill="{_hex_color(background)}"/>\n')
+    yield '<g stroke-linecap="round" stroke-linejoin="round">\n'
+
+    for primitive in iter_primitives(stroke_history, text_items):
+        kind, color = primitive[0], _hex_color(primitive[1])
+        if kind == 'polyline':
+            points = " ".join(f"{x},{y}" for x, y in primitive[3])
+            yield (f'<polyline points="{points}" fill="none" stroke="{color}" '
+                   f'stroke-width="{primitive[2]}"/>\n')
+        elif kind == 'circle':
+            (cx, cy), radius = primitive[3], primitive[2]
+            yield f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{color}"/>\n'
+        elif kind == 'rect':
+            (x0, y0), (x1, y1) = primitive[2], primitive[3]
+            yield (f'<rect x="{x0}" y="{y0}" width="{x1 - x0 + 1}" height="{y1 - y0 + 1}" '
+                   f'fill="{color}"/>\n')
+        elif kind == 'spray':
+            particles = "".join(f'<circle cx="{x}" cy="{y}" r="{r}"/>' for x, y, r in primitive[2])
+            yield f'<g fill="{color}">{particles}</g>\n'
+        elif kind == 'text':
+            (x, y), text = primitive[2], primitive[3]
+            yield (f'<text x="{x}" y="{y}" font-family="sans-serif" font-size="30" '
+                   f'fill="{color}">{escape(text)}</text>\n')
+
+    yield '</g>\n</svg>\n'
+
+
+# Bezier control point factor for circle quadrants
+KAPPA = 0.5523
+
+
+def _pdf_color(color):
+    b, g, r = color
+    return f"{r / 255:.3f} {g / 255:.3f} {b / 255:.3f}"
+
+
+def _pdf_circle(cx, cy, r):
+    """Filled circle path from four Bezier quadrants"""
+    k = r * KAPPA
+    return (f"{cx + r} {cy} m "
+            f"{cx + r} {cy + k:.2f} {cx + k:.2f} {cy + r} {cx} {cy + r} c "
+            f"{cx - k:.2f} {cy + r} {cx - r} {cy + k:.2f} {cx - r} {cy} c "
+            f"{cx - r} {cy - k:.2f} {cx - k:.2f} {cy - r} {cx} {cy - r} c "
+            f"{cx + k:.2f} {cy - r} {cx + r} {cy - k:.2f} {cx + r} {cy} c f")
+
+
+def _pdf_text(text):
+    """Escape text for a PDF literal string (standard fonts are Latin-1 only)"""
+    text = text.encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _iter_pdf_content(width, height, stroke_history, text_items, background, origin):
+    """PDF page content operators (PDF y axis points up)"""
+    yield "1 J 1 j\n"
+    if background is not None:
+        yield f"{_pdf_color(background)} rg 0 0 {width} {height} re f\n"
+    if origin != (0, 0):
+        yield f"1 0 0 1 {-origin[0]} {origin[1]} cm\n"
+
+    for primitive in iter_primitives(stroke_history, text_items):
+        kind, color = primitive[0], _pdf_color(primitive[1])
+        if kind == 'polyline':
+            points = primitive[3]
+            path = [f"{points[0][0]} {height - points[0][1]} m"]
+            path += [f"{x} {height - y} l" for x, y in points[1:]]
+            yield f"{color} RG {primitive[2]} w " + " ".join(path) + " S\n"
+        elif kind == 'circle':
+            (cx, cy), r = primitive[3], primitive[2]
+            yield f"{color} rg {_pdf_circle(cx, height - cy, r)}\n"
+        elif kind == 'rect':
+            (x0, y0), (x1, y1) = primitive[2], primitive[3]
+            yield f"{color} rg {x0} {height - y1 - 1} {x1 - x0 + 1} {y1 - y0 + 1} re f\n"
+        elif kind == 'spray':
+            yield f"{color} rg " + " ".join(_pdf_circle(x, height - y, r) for x, y, r in primitive[2]) + "\n"
+        elif kind == 'text':
+            (x, y), text = primitive[2], primitive[3]
+            yield f"BT /F1 30 Tf {color} rg {x} {height - y} Td ({_pdf_text(text)}) Tj ET\n"
+
+
+def iter_pdf(width, height, stroke_history, text_items=(), background=(0, 0, 0), origin=(0, 0)):
+    """
+    Stream a single-page PDF as bytes chunks.
+    The content stream length is written as an indirect object after the
+    stream, so nothing has to be buffered.
+    """
+    offsets = []
+    position = 0
+
+    def emit(data):
+        nonlocal position
+        chunk = data.encode('latin-1')
+        position += len(chunk)
+        return chunk
+
+    def begin_object():
+        offsets.append(position)
+        return emit(f"{len(offsets)} 0 obj\n")
+
+    yield emit("%PDF-1.4\n")
+    yield begin_object() + emit("<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+    yield begin_object() + emit("<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n")
+    yield begin_object() + emit(
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+        "/Resources << /Font << /F1 4 0 R >> >> "
+        "/Contents 5 0 R >>\nendobj\n")
+    yield begin_object() + emit(
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>\nendobj\n")
+
+    yield begin_object() + emit("<< /Length 6 0 R >>\nstream\n")
+    stream_start = position
+    for chunk in _iter_pdf_content(width, height, stroke_history, text_items, background, origin):
+        yield emit(chunk)
+    stream_length = position - stream_start
+    yield emit("endstream\nendobj\n")
+
+    yield begin_object() + emit(f"{stream_length}\nendobj\n")
+
+    xref = position
+    table = "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    yield emit(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n{table}")
+    yield emit(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+
+
+def export_vector(path, width, height, stroke_history, text_items=(), background=(0, 0, 0),
+                  origin=(0, 0)):
+    """
+    Export stroke history to an .svg or .pdf file, streaming chunks to disk.
+    origin: canvas position shown at the page's top-left (boards can extend past 0, 0)
+    """
+    if path.lower().endswith('.pdf'):
+        with open(path, 'wb') as f:
+            for chunk in iter_pdf(width, height, stroke_history, text_items, background, origin):
+                f.write(chunk)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            for chunk in iter_svg(width, height, stroke_history, text_items, background, origin):
+                f.write(chunk)
+    return path
+
+
+if __name__ == "__main__":
+    # Export a session file: python src/vector_export.py <session.vhds> <out.svg|out.pdf>
+    from session_file import Session, SessionStroke
+
+    if len(sys.argv) != 3:
+        print("Usage: python src/vector_export.py <session.vhds> <out.svg|out.pdf>")
+        sys.exit(1)
+
+    session = Session(sys.argv[1])
+    strokes = (SessionStroke(session.stroke(i)) for i in range(len(session)))
+    export_vector(sys.argv[2], session.width, session.height, strokes, session.text_items(),
+                  origin=(session.x, session.y))
+    session.close()
+    print(f"Exported {sys.argv[2]}")
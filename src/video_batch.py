@@ -0,0 +1,181 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+
+from batch_render import duplicate_outputs, glob_root
+from canvas_writer import write_image
+from capture_config import parse_size
+from drawing_canvas import DrawingCanvas
+from frame_mapping import FrameMapping
+from gesture_detector import GestureDetector
+from gesture_pipeline import GesturePipeline
+from session_file import save_canvas_session
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+
+
+def process_video(job):
+    """
+    Turn one recorded video into a drawing (runs in a worker process).
+    Uses the same detector, gesture pipeline and canvas as the live app.
+    job: (input path, output path prefix, mirror, max hands, detection size, canvas size)
+    Sizes are (w, h) or None for the video's frame size.
+    Returns: (input path, stats dict, error)
+    """
+    path, prefix, mirror, max_hands, detection_size, canvas_size = job
+    start = time.perf_counter()
+    try:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError("cannot open video")
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+        detector = GestureDetector(smoothing_frames=10, max_hands=max_hands)
+        canvas = None
+        pipeline = None
+        mapping = None
+        frames = hand_frames = 0
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if mirror:
+                    frame = cv2.flip(frame, 1)
+
+                if canvas is None:
+                    h, w = frame.shape[:2]
+                    mapping = FrameMapping((w, h), detection_size, canvas_size)
+                    canvas = DrawingCanvas(*mapping.view_size)
+                    pipeline = GesturePipeline(detector, canvas)
+
+                # Every hand draws its own strokes (positions in canvas coordinates)
+                results, hands = pipeline.detect_all(mapping.detection_frame(frame))
+                for hand_key, landmarks, confidence in hands:
+                    pipeline.select_hand(hand_key)
+                    finger_pos = pipeline.classify(landmarks, confidence, mapping.view_shape)
+                    pipeline.apply(landmarks, finger_pos, mapping.view_shape)
+                    pipeline.end_frame()
+                if hands:
+                    hand_frames += 1
+                frames += 1
+        finally:
+            cap.release()
+            detector.close()
+
+        if canvas is None:
+            raise IOError("no frames decoded")
+        # Finish strokes still in progress on the last frame
+        pipeline.release_all()
+
+        if not write_image(prefix + '.png', canvas.canvas, 'png'):
+            raise IOError("encoder failed")
+        save_canvas_session(prefix + '.vhds', canvas)
+
+        seconds = time.perf_counter() - start
+        stats = {
+            'video': path,
+            'frames': frames,
+            'hand_frames': hand_frames,
+            'strokes': len(canvas.stroke_history),
+            'stroke_items': canvas.items_stored,
+            'compression_ratio': round(canvas.compression_ratio(), 2),
+            'width': canvas.width,
+            'height': canvas.height,
+            'video_fps': round(video_fps, 2),
+            'seconds': round(seconds, 3),
+            'processing_fps': round(frames / seconds, 2) if seconds else 0.0,
+            'realtime_factor': round(frames / video_fps / seconds, 2) if video_fps and seconds else None,
+        }
+        with open(prefix + '.stats.json', 'w') as f:
+            json.dump(stats, f, indent=2)
+        return path, stats, None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def collect_videos(inputs):
+    """
+    Expand files, directories and glob patterns into video file paths.
+    Returns [(path, name)] - name is relative to the folder or the pattern's
+    fixed prefix (the basename for a plain file), without extension.
+    """
+    found = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for root, _, files in os.walk(entry):
+                found.extend((os.path.join(root, name), entry) for name in sorted(files)
+                             if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif any(c in entry for c in '*?['):
+            found.extend((path, glob_root(entry)) for path in sorted(glob.glob(entry, recursive=True)))
+        else:
+            found.append((entry, os.path.dirname(entry)))
+    return [(path, os.path.splitext(os.path.relpath(path, root or '.'))[0]) for path, root in found]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert recorded gesture videos into drawings (PNG + stroke log + stats)")
+    parser.add_argument('inputs', nargs='+', help="video files, folders or glob patterns")
+    parser.add_argument('-o', '--output-dir', default='output/videos')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--no-mirror', dest='mirror', action='store_false',
+                        help="don't flip frames (the live app mirrors the webcam)")
+    parser.add_argument('--hands', type=int, default=1, help="maximum number of hands to track")
+    parser.add_argument('--detect-size', type=parse_size, default=None,
+                        help="run hand detection on frames of this size, e.g. 640x360")
+    parser.add_argument('--canvas-size', type=parse_size, default=None,
+                        help="drawing size, e.g. 1920x1080 (default: video frame size)")
+    args = parser.parse_args(argv)
+
+    videos = collect_videos(args.inputs)
+    if not videos:
+        print("No videos found")
+        return 1
+
+    # Sub-folders of the inputs are mirrored under the output folder
+    jobs = []
+    for path, name in videos:
+        prefix = os.path.join(args.output_dir, name)
+        jobs.append((path, prefix, args.mirror, args.hands, args.detect_size, args.canvas_size))
+    duplicates = duplicate_outputs(job[1] for job in jobs)
+    if duplicates:
+        print(f"Several videos would be written to {', '.join(duplicates)} - process them separately")
+        return 1
+    # Only once the run is known to go ahead
+    for job in jobs:
+        os.makedirs(os.path.dirname(job[1]), exist_ok=True)
+
+    # One video per process - MediaPipe graphs are per-process and tracking is sequential
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"Processing {len(jobs)} videos with {workers} workers...")
+
+    start = time.perf_counter()
+    done = failed = frames = 0
+    with Pool(workers) as pool:
+        for path, stats, error in pool.imap_unordered(process_video, jobs):
+            done += 1
+            if error:
+                failed += 1
+                print(f"[{done}/{len(jobs)}] FAILED {path}: {error}")
+            else:
+                frames += stats['frames']
+                print(f"[{done}/{len(jobs)}] {path}: {stats['frames']} frames, "
+                      f"{stats['strokes']} strokes, {stats['processing_fps']:.1f} fps")
+
+    elapsed = time.perf_counter() - start
+    print("-" * 70)
+    print(f"Processed {done - failed}/{len(jobs)} videos in {elapsed:.2f} s "
+          f"({frames / elapsed:.1f} frames/s across all workers)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
 import cv2
 import numpy as np
+from ui_layers import UILayerCache, blend_sprite, stamp_sprite
+from swipe_decoder import SwipeDecoder
 
 
 class VirtualKeyboard:
@@ -13,7 +15,7 @@ class VirtualKeyboard:
             ['Q', 'W', 'E', 'R', 'T', 'Y', 'U', 'I', 'O', 'P'],
             ['A', 'S', 'D', 'F', 'G', 'H', 'J', 'K', 'L'],
             ['Z', 'X', 'C', 'V', 'B', 'N', 'M', 'DEL'],
-            ['SPACE', 'CLEAR', 'SAVE', 'HIDE']
+            ['SPACE', 'CLEAR', 'SAVE', 'HIDE', 'SWIPE']
         ]
         
         # Key dimensions
@@ -25,6 +27,11 @@ class VirtualKeyboard:
         self.keyboard_height = (len(self.keys) * (self.key_height + self.key_margin)) + 40
         self.start_y = height - self.keyboard_height - 10
         
+        # Layout index and pre-rendered layers
+        self._build_layout()
+        self.layer_cache = UILayerCache()
+        self.background = np.full((height - self.start_y + 61, width + 1, 3), (30, 30, 30), dtype=np.uint8)
+        
         # Text input
         self.text_input = ""
         
@@ -32,49 +39,29 @@ class VirtualKeyboard:
         self.hovered_key = None
         self.last_clicked_key = None
         self.click_cooldown = 0
+        
+        # Swipe (gesture) typing
+        self.swipe_mode = False
+        self.swipe_path = []
+        self.swipe_candidates = []
+        self.decoder = None  # Built on first use
     
     def toggle_visibility(self):
         """Toggle keyboard visibility"""
         self.visible = not self.visible
         return self.visible
     
-    def draw(self, frame):
-        """Draw QWERTY virtual keyboard on frame"""
-        if not self.visible:
-            return frame
-        
-        # Semi-transparent background
-        overlay = frame.copy()
-        cv2.rectangle(overlay, 
-                     (0, self.start_y - 60), 
-                     (self.width, self.height),
-                     (30, 30, 30), 
-                     -1)
-        frame = cv2.addWeighted(overlay, 0.85, frame, 0.15, 0)
-        
-        # Draw text input display
-        text_display_y = self.start_y - 45
-        cv2.rectangle(frame,
-                     (20, text_display_y),
-                     (self.width - 20, text_display_y + 30),
-                     (50, 50, 50),
-                     -1)
-        cv2.rectangle(frame,
-                     (20, text_display_y),
-                     (self.width - 20, text_display_y + 30),
-                     (200, 200, 200),
-                     2)
-        
-        # Display current text
-        display_text = self.text_input if self.text_input else "Type here..."
-        cv2.putText(frame, display_text,
-                   (30, text_display_y + 22),
-                   cv2.FONT_HERSHEY_SIMPLEX,
-                   0.6,
-                   (255, 255, 255) if self.text_input else (150, 150, 150),
-                   2)
+    def _build_layout(self):
+        """
+        Build the key layout index once.
+        key_rects: (row, col) -> (key, x, y, key_w)
+        col_lookup: per-row array mapping an x pixel to the column under it (-1 = gap)
+        """
+        self.key_rects = {}
+        self.key_positions = {}  # key -> (row, col)
+        self.row_tops = []
+        self.col_lookup = np.full((len(self.keys), self.width + 1), -1, dtype=np.int16)
         
-        # Draw keys
         y_pos = self.start_y
         for row_idx, row in enumerate(self.keys):
             # Calculate starting x position to center the row
@@ -91,99 +78,170 @@ class VirtualKeyboard:
                 row_width = len(row) * (self.key_width + self.key_margin) + 100
                 x_pos = (self.width - row_width) // 2
             
-            for key in row:
-                # Check if hovered
-                is_hovered = (self.hovered_key == key)
-                
+            self.row_tops.append(y_pos)
+            for col_idx, key in enumerate(row):
                 # Adjust width for special keys
                 key_w = self.key_width
                 if key == 'SPACE':
                     key_w = self.key_width * 3
-                elif key in ['CLEAR', 'SAVE', 'HIDE', 'DEL']:
+                elif key in ['CLEAR', 'SAVE', 'HIDE', 'DEL', 'SWIPE']:
                     key_w = self.key_width + 20
                 
-                # Key background
-                key_color = (70, 70, 70) if not is_hovered else (100, 150, 100)
-                cv2.rectangle(frame,
-                            (x_pos, y_pos),
-                            (x_pos + key_w, y_pos + self.key_height),
-                            key_color,
-                            -1)
-                
-                # Key border
-                cv2.rectangle(frame,
-                            (x_pos, y_pos),
-                            (x_pos + key_w, y_pos + self.key_height),
-                            (200, 200, 200),
-                            2)
-                
-                # Key label
-                font_scale = 0.5 if len(key) > 3 else 0.7
-                text_size = cv2.getTextSize(key, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)[0]
-                text_x = x_pos + (key_w - text_size[0]) // 2
-                text_y = y_pos + (self.key_height + text_size[1]) // 2
+                self.key_rects[(row_idx, col_idx)] = (key, x_pos, y_pos, key_w)
+                self.key_positions[key] = (row_idx, col_idx)
                 
-                cv2.putText(frame, key,
-                          (text_x, text_y),
-                          cv2.FONT_HERSHEY_SIMPLEX,
-                          font_scale,
-                          (255, 255, 255),
-                          2)
+                # Key bounds are inclusive on both edges
+                x0 = max(0, x_pos)
+                x1 = min(self.width, x_pos + key_w)
+                if x0 <= x1:
+                    self.col_lookup[row_idx, x0:x1 + 1] = col_idx
                 
                 x_pos += key_w + self.key_margin
             
             y_pos += self.key_height + self.key_margin
         
+        # Pre-rendered layer covers the instruction line above the panel down to the bottom
+        self.layer_y = max(0, self.start_y - 70)
+    
+    def _draw_key(self, img, key, x_pos, y_pos, key_w, is_hovered):
+        """Draw a single key at (x_pos, y_pos)"""
+        # Key background
+        key_color = (70, 70, 70) if not is_hovered else (100, 150, 100)
+        cv2.rectangle(img,
+                    (x_pos, y_pos),
+                    (x_pos + key_w, y_pos + self.key_height),
+                    key_color,
+                    -1)
+        
+        # Key border
+        cv2.rectangle(img,
+                    (x_pos, y_pos),
+                    (x_pos + key_w, y_pos + self.key_height),
+                    (200, 200, 200),
+                    2)
+        
+        # Key label
+        font_scale = 0.5 if len(key) > 3 else 0.7
+        text_size = cv2.getTextSize(key, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)[0]
+        text_x = x_pos + (key_w - text_size[0]) // 2
+        text_y = y_pos + (self.key_height + text_size[1]) // 2
+        
+        cv2.putText(img, key,
+                  (text_x, text_y),
+                  cv2.FONT_HERSHEY_SIMPLEX,
+                  font_scale,
+                  (255, 255, 255),
+                  2)
+    
+    def _render_keys_layer(self):
+        """
+        Render the static keyboard content (all keys, instructions) once.
+        Returns: (sprite, opaque mask) with origin at (0, layer_y)
+        """
+        layer_h = self.height - self.layer_y
+        sprite = np.zeros((layer_h, self.width, 3), dtype=np.uint8)
+        mask = np.zeros((layer_h, self.width), dtype=np.uint8)
+        
+        for key, x_pos, y_pos, key_w in self.key_rects.values():
+            self._draw_key(sprite, key, x_pos, y_pos - self.layer_y, key_w, False)
+            cv2.rectangle(mask,
+                        (x_pos, y_pos - self.layer_y),
+                        (x_pos + key_w, y_pos - self.layer_y + self.key_height),
+                        255, -1)
+            cv2.rectangle(mask,
+                        (x_pos, y_pos - self.layer_y),
+                        (x_pos + key_w, y_pos - self.layer_y + self.key_height),
+                        255, 2)
+        
         # Instructions
-        cv2.putText(frame, "Point index finger to type | SAVE to place text on canvas",
-                   (self.width // 2 - 300, self.start_y - 55),
+        text = "Point index finger to type | SAVE to place text on canvas"
+        org = (self.width // 2 - 300, self.start_y - 55 - self.layer_y)
+        cv2.putText(sprite, text, org, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+        cv2.putText(mask, text, org, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 1)
+        
+        return sprite, mask
+    
+    def _render_text_display(self):
+        """Render the text input box sprite for the current text"""
+        box_w = self.width - 40
+        sprite = np.full((33, box_w + 3, 3), (200, 200, 200), dtype=np.uint8)
+        cv2.rectangle(sprite, (1, 1), (box_w + 1, 31), (50, 50, 50), -1)
+        cv2.rectangle(sprite, (1, 1), (box_w + 1, 31), (200, 200, 200), 2)
+        
+        # Display current text
+        placeholder = "Swipe across letters..." if self.swipe_mode else "Type here..."
+        display_text = self.text_input if self.text_input else placeholder
+        cv2.putText(sprite, display_text,
+                   (11, 23),
                    cv2.FONT_HERSHEY_SIMPLEX,
-                   0.5,
-                   (200, 200, 200),
-                   1)
+                   0.6,
+                   (255, 255, 255) if self.text_input else (150, 150, 150),
+                   2)
+        
+        # Alternative swipe candidates, right aligned
+        if self.swipe_candidates[1:]:
+            alternatives = " | ".join(self.swipe_candidates[1:])
+            text_size = cv2.getTextSize(alternatives, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
+            cv2.putText(sprite, alternatives,
+                       (box_w - text_size[0] - 9, 22),
+                       cv2.FONT_HERSHEY_SIMPLEX,
+                       0.5,
+                       (150, 200, 150),
+                       1)
+        return sprite, None
+    
+    def draw(self, frame):
+        """Draw QWERTY virtual keyboard on frame"""
+        if not self.visible:
+            return frame
+        
+        # Semi-transparent background - blended over the panel region only
+        blend_sprite(frame, self.background, 0, self.start_y - 60, 0.85)
+        
+        # Static keys and instructions (pre-rendered once)
+        sprite, mask = self.layer_cache.get('keys', None, self._render_keys_layer)
+        stamp_sprite(frame, sprite, 0, self.layer_y, mask)
+        
+        # Draw text input display (re-rendered only when the text changes)
+        text_display_y = self.start_y - 45
+        display_state = (self.text_input, self.swipe_mode, tuple(self.swipe_candidates))
+        sprite, _ = self.layer_cache.get('display', display_state, self._render_text_display)
+        frame[text_display_y - 1:text_display_y + 32, 19:self.width - 18] = sprite
+        
+        # Only the hovered key is redrawn per frame
+        if self.hovered_key is not None:
+            key, x_pos, y_pos, key_w = self.key_rects[self.key_positions[self.hovered_key]]
+            self._draw_key(frame, key, x_pos, y_pos, key_w, True)
+        
+        # Swipe trail
+        if len(self.swipe_path) > 1:
+            cv2.polylines(frame, [np.array(self.swipe_path, dtype=np.int32)], False, (100, 255, 100), 4)
         
         return frame
     
     def check_hover(self, point):
-        """Check if point is hovering over any key"""
+        """Check if point is hovering over any key (constant time layout lookup)"""
         if not self.visible:
             return None
         
         x, y = point
+        self.hovered_key = None
         
-        y_pos = self.start_y
-        for row_idx, row in enumerate(self.keys):
-            if row_idx == 0:
-                row_width = len(row) * (self.key_width + self.key_margin)
-                x_pos = (self.width - row_width) // 2
-            elif row_idx == 1:
-                row_width = len(row) * (self.key_width + self.key_margin)
-                x_pos = (self.width - row_width) // 2 + 30
-            elif row_idx == 2:
-                row_width = len(row) * (self.key_width + self.key_margin)
-                x_pos = (self.width - row_width) // 2 + 60
-            else:
-                row_width = len(row) * (self.key_width + self.key_margin) + 100
-                x_pos = (self.width - row_width) // 2
-            
-            for key in row:
-                key_w = self.key_width
-                if key == 'SPACE':
-                    key_w = self.key_width * 3
-                elif key in ['CLEAR', 'SAVE', 'HIDE', 'DEL']:
-                    key_w = self.key_width + 20
-                
-                if (x_pos <= x <= x_pos + key_w and
-                    y_pos <= y <= y_pos + self.key_height):
-                    self.hovered_key = key
-                    return key
-                
-                x_pos += key_w + self.key_margin
-            
-            y_pos += self.key_height + self.key_margin
+        if not (0 <= x <= self.width and y >= self.start_y):
+            return None
         
-        self.hovered_key = None
-        return None
+        # Row from y, then column from the row's x lookup
+        pitch = self.key_height + self.key_margin
+        row_idx = (y - self.start_y) // pitch
+        if row_idx >= len(self.keys) or y > self.row_tops[row_idx] + self.key_height:
+            return None
+        
+        col_idx = self.col_lookup[row_idx, x]
+        if col_idx < 0:
+            return None
+        
+        self.hovered_key = self.key_rects[(row_idx, int(col_idx))][0]
+        return self.hovered_key
     
     def click_key(self, key):
         """Handle key click with cooldown"""
@@ -201,6 +259,8 @@ class VirtualKeyboard:
                 self.text_input = self.text_input[:-1]
             elif key == 'CLEAR':
                 self.text_input = ''
+            elif key == 'SWIPE':
+                self.toggle_swipe_mode()
             elif key in ['SAVE', 'HIDE']:
                 return key  # Return special commands
             elif len(key) == 1:  # Regular character
@@ -223,4 +283,44 @@ class VirtualKeyboard:
     
     def clear_text(self):
         """Clear text input"""
-        self.text_input = ""
\ No newline at end of file
+        self.text_input = ""
+    
+    def toggle_swipe_mode(self):
+        """Toggle swipe (gesture) typing"""
+        self.swipe_mode = not self.swipe_mode
+        self.swipe_path = []
+        self.swipe_candidates = []
+        return self.swipe_mode
+    
+    def get_decoder(self):
+        """Get swipe decoder, building it from the letter key centers on first use"""
+        if self.decoder is None:
+            key_centers = {}
+            for key, x_pos, y_pos, key_w in self.key_rects.values():
+                if len(key) == 1:
+                    key_centers[key.lower()] = (x_pos + key_w / 2, y_pos + self.key_height / 2)
+            self.decoder = SwipeDecoder(key_centers)
+        return self.decoder
+    
+    def add_swipe_point(self, point):
+        """Record fingertip position along the current swipe"""
+        self.swipe_path.append(point)
+    
+    def end_swipe(self):
+        """
+        Decode the recorded swipe and append the best word to the text.
+        Returns: best word or None
+        """
+        path = self.swipe_path
+        self.swipe_path = []
+        
+        candidates = self.get_decoder().decode(path)
+        self.swipe_candidates = [word for word, _ in candidates]
+        if not candidates:
+            return None
+        
+        word = candidates[0][0]
+        if self.text_input and not self.text_input.endswith(' '):
+            self.text_input += ' '
+        self.text_input += word
+        return word
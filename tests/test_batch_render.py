@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_render import render_session
+from layered_canvas import LayeredCanvas
+from session_file import save_canvas_session
+
+
+def draw_strokes(canvas):
+    """One stroke per brush shape, spray included"""
+    for row, shape in enumerate(('NORMAL', 'CIRCLE', 'SQUARE', 'SPRAY')):
+        canvas.current_brush_shape = shape
+        canvas.start_stroke()
+        for x in range(40, 400, 7):
+            canvas.draw((x, 40 + row * 60 + (x % 30)))
+        canvas.end_stroke()
+
+
+class RenderSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def render(self, canvas):
+        path = os.path.join(self.dir.name, 'board.vhds')
+        output = os.path.join(self.dir.name, 'board.png')
+        save_canvas_session(path, canvas)
+        _, _, segments, _, error = render_session((path, output, 1.0, None, 'png'))
+        self.assertIsNone(error)
+        self.assertGreater(segments, 0)
+        return cv2.imread(output)
+
+    def test_matches_live_board(self):
+        canvas = LayeredCanvas(640, 360)
+        draw_strokes(canvas)
+        np.testing.assert_array_equal(self.render(canvas), canvas.board_image())
+
+    def test_matches_live_board_left_of_origin(self):
+        canvas = LayeredCanvas(640, 360)
+        canvas.pan(-900, -300)
+        draw_strokes(canvas)
+        np.testing.assert_array_equal(self.render(canvas), canvas.board_image())
+
+
+if __name__ == '__main__':
+    unittest.main()
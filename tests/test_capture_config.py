@@ -0,0 +1,172 @@
+import argparse
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from capture_config import (CaptureConfig, CaptureDevice, fourcc_code, fourcc_text, parse_size,
+                            probe_modes)
+
+
+class FakeCamera:
+    """
+    VideoCapture stand-in with a simulated clock: read() advances it by one frame
+    interval instead of sleeping. Raw YUYV is bandwidth-limited, sizes are clamped
+    to max_size and formats outside fourccs are refused, like a real driver.
+    """
+    BANDWIDTH = 1280 * 720 * 10
+
+    def __init__(self, fourccs=('MJPG', 'YUYV'), max_size=(1920, 1080)):
+        self.fourccs = fourccs
+        self.max_size = max_size
+        self.props = {cv2.CAP_PROP_FOURCC: fourcc_code(fourccs[-1]), cv2.CAP_PROP_FRAME_WIDTH: 640,
+                      cv2.CAP_PROP_FRAME_HEIGHT: 480, cv2.CAP_PROP_FPS: 30, cv2.CAP_PROP_BUFFERSIZE: 4}
+        self.clock = 0.0
+        self.reads = 0
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return float(self.props.get(prop, 0))
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FOURCC and fourcc_text(value) not in self.fourccs:
+            return False
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            value = min(value, self.max_size[0])
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            value = min(value, self.max_size[1])
+        self.props[prop] = value
+        return True
+
+    def delivered_fps(self):
+        fps = min(self.props[cv2.CAP_PROP_FPS], 30)
+        if fourcc_text(self.props[cv2.CAP_PROP_FOURCC]) == 'YUYV':
+            area = self.props[cv2.CAP_PROP_FRAME_WIDTH] * self.props[cv2.CAP_PROP_FRAME_HEIGHT]
+            fps = min(fps, self.BANDWIDTH / area)
+        return fps
+
+    def read(self, image=None):
+        self.clock += 1 / self.delivered_fps()
+        self.reads += 1
+        shape = (int(self.props[cv2.CAP_PROP_FRAME_HEIGHT]), int(self.props[cv2.CAP_PROP_FRAME_WIDTH]), 3)
+        return True, np.zeros(shape, dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def mode_of(device):
+    return device.mode['fourcc'], device.mode['width'], device.mode['height']
+
+
+class ParseSizeTest(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(parse_size('1280x720'), (1280, 720))
+        self.assertEqual(parse_size('320X180'), (320, 180))
+
+    def test_rejects_malformed_and_non_positive(self):
+        for text in ('1280', 'axb', '1x2x3', '0x0', '640x0', '0x480', '-640x480', '640x-480'):
+            with self.assertRaises(argparse.ArgumentTypeError, msg=text):
+                parse_size(text)
+
+    def test_argparse_reports_bad_size(self):
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--size', type=parse_size)
+        with mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+            parser.parse_args(['--size', '0x720'])
+
+
+class NegotiateTest(unittest.TestCase):
+    def setUp(self):
+        self.camera = FakeCamera()
+        # measure_fps times reads with the camera's simulated clock
+        patcher = mock.patch('capture_config.time.perf_counter', lambda: self.camera.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requested_mode(self):
+        device = CaptureDevice(self.camera, CaptureConfig(width=960, height=540, fourcc='YUYV'))
+        self.assertEqual(mode_of(device), ('YUYV', 960, 540))
+        self.assertEqual(device.mode['buffer_size'], 1)
+        self.assertEqual(self.camera.reads, 0)  # no probing unless asked for
+        self.assertEqual(device.stats.nominal_fps, 30)
+
+    def test_refused_format_keeps_driver_format(self):
+        device = CaptureDevice(self.camera, CaptureConfig(fourcc='H264'))
+        self.assertEqual(mode_of(device), ('YUYV', 1280, 720))
+
+    def test_default_format_and_buffer(self):
+        device = CaptureDevice(self.camera, CaptureConfig(fourcc=None, buffer_size=None))
+        self.assertEqual(device.mode['fourcc'], 'YUYV')
+        self.assertEqual(device.mode['buffer_size'], 4)
+
+    def test_probe_prefers_full_rate_mode(self):
+        # Raw YUYV only manages 10 fps at 1280x720; MJPG keeps 30
+        device = CaptureDevice(self.camera, CaptureConfig(fourcc='YUYV', probe=True))
+        self.assertEqual(mode_of(device), ('MJPG', 1280, 720))
+
+    def test_probe_trades_size_for_rate(self):
+        self.camera = FakeCamera(fourccs=('YUYV',))
+        device = CaptureDevice(self.camera, CaptureConfig(probe=True))
+        self.assertEqual(mode_of(device), ('YUYV', 640, 480))
+
+    def test_probe_measures_each_mode_once(self):
+        self.camera = FakeCamera(max_size=(960, 540))
+        results = probe_modes(self.camera, CaptureConfig())
+        modes = [(mode['fourcc'], mode['width'], mode['height']) for mode, _ in results]
+        self.assertEqual(len(modes), len(set(modes)))
+        self.assertEqual(sorted(modes), [('MJPG', 640, 480), ('MJPG', 960, 540),
+                                         ('YUYV', 640, 480), ('YUYV', 960, 540)])
+        fps = {(mode['fourcc'], mode['width']): round(fps) for mode, fps in results}
+        self.assertEqual(fps[('YUYV', 960)], round(FakeCamera.BANDWIDTH / (960 * 540)))
+        self.assertEqual(fps[('MJPG', 960)], 30)
+
+    def test_timed_reads(self):
+        device = CaptureDevice(self.camera, CaptureConfig())
+        for _ in range(10):
+            ok, frame = device.read()
+            self.assertTrue(ok)
+        self.assertEqual(frame.shape, (720, 1280, 3))
+        self.assertEqual(device.stats.frames, 10)
+        self.assertEqual(device.stats.dropped, 0)
+
+
+class VideoFileTest(unittest.TestCase):
+    def test_file_source(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'clip.avi')
+            writer = cv2.VideoWriter(path, fourcc_code('MJPG'), 30, (320, 240))
+            if not writer.isOpened():
+                self.skipTest("no MJPG video writer in this OpenCV build")
+            for i in range(5):
+                writer.write(np.full((240, 320, 3), i * 40, dtype=np.uint8))
+            writer.release()
+
+            # Probing is skipped for files, it would consume their frames
+            config = CaptureConfig.from_args(argparse.Namespace(
+                camera=path, capture_size=(1280, 720), capture_fps=30, fourcc='MJPG',
+                buffer_size=1, probe_capture=True))
+            self.assertFalse(config.probe)
+            device = CaptureDevice.open(config)
+            try:
+                self.assertIsNotNone(device.mode)
+                self.assertEqual(device.stats.nominal_fps, 0.0)
+                frames = 0
+                while device.read()[0]:
+                    frames += 1
+                self.assertEqual(frames, 5)
+                self.assertEqual((device.stats.frames, device.stats.failed), (5, 1))
+            finally:
+                device.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
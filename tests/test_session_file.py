@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from drawing_canvas import DrawingCanvas
+from layered_canvas import LayeredCanvas
+from session_file import Session, load_session, save_canvas_session
+from tiled_canvas import TiledCanvas
+
+
+def draw_board(canvas):
+    for row, shape in enumerate(('NORMAL', 'SPRAY', 'CIRCLE')):
+        canvas.current_brush_shape = shape
+        canvas.start_stroke()
+        for x in range(50, 300, 9):
+            canvas.draw((x, 60 + 80 * row + x % 20))
+        canvas.end_stroke()
+        canvas.add_text(f"text {row}", (100 + 40 * row, 300))
+
+
+class LoadSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'board.vhds')
+
+    def check_round_trip(self, cls, pan=None):
+        canvas = cls(640, 360)
+        if pan is not None:
+            canvas.pan(*pan)
+        draw_board(canvas)
+        save_canvas_session(self.path, canvas)
+
+        session = Session(self.path)
+        try:
+            self.assertIsNotNone(session.raster)
+            self.assertEqual((session.x, session.y, session.width, session.height), canvas.bounds())
+        finally:
+            session.close()
+
+        loaded = load_session(self.path, cls(640, 360))
+        np.testing.assert_array_equal(loaded.board_image(), canvas.board_image())
+        self.assertEqual(len(loaded.stroke_history), 3)
+        self.assertEqual([text for text, *_ in loaded.text_items], ["text 0", "text 1", "text 2"])
+
+        # History is usable after a raster load
+        canvas.undo()
+        loaded.undo()
+        np.testing.assert_array_equal(loaded.board_image(), canvas.board_image())
+
+    def test_drawing_canvas(self):
+        self.check_round_trip(DrawingCanvas)
+
+    def test_tiled_canvas_left_of_origin(self):
+        self.check_round_trip(TiledCanvas, pan=(-700, 100))
+
+    def test_layered_canvas_left_of_origin(self):
+        self.check_round_trip(LayeredCanvas, pan=(-700, 100))
+
+    def test_hidden_layer_replays(self):
+        canvas = LayeredCanvas(640, 360)
+        draw_board(canvas)
+        canvas.add_layer()
+        canvas.set_visible("Layer 1", False)
+        save_canvas_session(self.path, canvas)
+        session = Session(self.path)
+        try:
+            self.assertIsNone(session.raster)
+        finally:
+            session.close()
+
+        # Sessions don't keep layers, so the hidden ink comes back visible
+        loaded = load_session(self.path, LayeredCanvas(640, 360))
+        canvas.set_visible("Layer 1", True)
+        np.testing.assert_array_equal(loaded.board_image(), canvas.board_image())
+
+
+if __name__ == '__main__':
+    unittest.main()
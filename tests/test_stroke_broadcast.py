@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from layered_canvas import LayeredCanvas
+from stroke_broadcast import StrokeBroadcaster, StrokeViewer, _synthetic_session
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class LoopbackTest(unittest.TestCase):
+    """A board broadcast over loopback TCP; every viewer must end up with the board's pixels"""
+
+    def setUp(self):
+        self.canvas = LayeredCanvas(640, 360)
+        self.broadcaster = StrokeBroadcaster('127.0.0.1', 0)
+        self.broadcaster.start(self.canvas)
+        self.viewers = []
+        self.threads = []
+        self.addCleanup(self.stop)
+
+    def stop(self):
+        self.broadcaster.close()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+    def join(self):
+        """Connect a viewer once everything queued so far has gone out"""
+        wait_for(lambda: not self.broadcaster.flush_scheduled)
+        viewer = StrokeViewer()
+        thread = threading.Thread(target=asyncio.run, args=(viewer.run('127.0.0.1', self.broadcaster.port),))
+        thread.start()
+        self.viewers.append(viewer)
+        self.threads.append(thread)
+        wait_for(lambda: len(self.broadcaster.clients) == len(self.viewers))
+        return viewer
+
+    def draw(self, key, points, shape='NORMAL', color=(0, 255, 0)):
+        self.canvas.select_stroke(key)
+        self.canvas.current_brush_shape = shape
+        self.canvas.current_color = color
+        for point in points:
+            self.canvas.draw(point)
+
+    def assert_viewers_match(self):
+        self.stop()
+        board = self.canvas.board_image()
+        layers = [(layer.name, layer.visible) for layer in self.canvas.layers]
+        for viewer in self.viewers:
+            self.assertEqual([(layer.name, layer.visible) for layer in viewer.canvas.layers], layers)
+            self.assertEqual(len(viewer.canvas.stroke_history), len(self.canvas.stroke_history))
+            np.testing.assert_array_equal(viewer.canvas.board_image(), board)
+
+    def test_viewer_matches_board(self):
+        self.join()
+        _synthetic_session(self.canvas, np.random.default_rng(0), strokes=20, points=30)
+        self.canvas.add_layer()
+        self.canvas.start_stroke()
+        self.draw(None, [(x, 300 - x // 3) for x in range(20, 600, 11)], 'SPRAY', (255, 0, 255))
+        self.canvas.end_stroke()
+        self.canvas.set_visible("Layer 1", False)
+        self.canvas.move_layer("Layer 2", 0)
+        self.assert_viewers_match()
+
+    def test_viewer_joining_mid_stroke(self):
+        self.join()
+        for key in ('Right', 'Left'):
+            self.canvas.select_stroke(key)
+            self.canvas.start_stroke()
+        self.draw('Right', [(100 + 7 * i, 100 + 3 * i) for i in range(20)], 'CIRCLE')
+        self.draw('Left', [(500 - 9 * i, 200 + 2 * i) for i in range(20)], 'SPRAY', (0, 0, 255))
+        late = self.join()
+        self.draw('Right', [(240 + 7 * i, 160 - 3 * i) for i in range(20)], 'CIRCLE')
+        self.draw('Left', [(320 - 9 * i, 240 + 2 * i) for i in range(20)], 'SPRAY', (0, 0, 255))
+        self.canvas.end_all_strokes()
+        self.canvas.start_stroke()
+        self.draw(None, [(50 + 10 * i, 330) for i in range(30)])
+        self.canvas.end_stroke()
+        self.assert_viewers_match()
+        self.assertLess(late.bytes_received, self.viewers[0].bytes_received)
+
+    def test_erase_all_during_live_stroke(self):
+        self.join()
+        self.canvas.add_layer()
+        self.canvas.start_stroke()
+        self.draw(None, [(30 + 9 * i, 50 + 4 * i) for i in range(25)], 'SQUARE')
+        self.canvas.erase_all()
+        # The hand keeps drawing after the fist: the rest becomes a new stroke
+        self.draw(None, [(250 + 9 * i, 150 - 4 * i) for i in range(25)], 'SQUARE')
+        self.join()
+        self.draw(None, [(475 + 5 * i, 50 + 6 * i) for i in range(25)], 'SQUARE')
+        self.canvas.end_stroke()
+        self.assert_viewers_match()
+        self.assertEqual(len(self.canvas.stroke_history), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from layered_canvas import LayeredCanvas
+from stroke_journal import StrokeJournal, decode_events, encode_event
+
+
+def draw_line(canvas, y):
+    canvas.start_stroke()
+    for x in range(40, 400, 8):
+        canvas.draw((x, y + x % 24))
+    canvas.end_stroke()
+
+
+def layer_state(canvas):
+    return [(layer.name, layer.visible) for layer in canvas.layers], canvas.active.name
+
+
+class JournalRestoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'autosave.journal')
+
+    def restored(self):
+        canvas = LayeredCanvas(640, 360)
+        StrokeJournal(self.path).restore(canvas)
+        return canvas
+
+    def test_layer_state_round_trip(self):
+        canvas = LayeredCanvas(640, 360)
+        journal = StrokeJournal(self.path)
+        journal.start(canvas)
+        draw_line(canvas, 50)
+        canvas.add_layer()
+        draw_line(canvas, 60)
+        canvas.add_layer("Sketch")
+        canvas.set_visible("Layer 2", False)
+        canvas.move_layer("Sketch", 0)
+        canvas.select_layer("Layer 1")
+        draw_line(canvas, 200)
+        journal.close()
+
+        restored = self.restored()
+        self.assertEqual(layer_state(restored), layer_state(canvas))
+        np.testing.assert_array_equal(restored.board_image(), canvas.board_image())
+
+    def test_erase_all_resets_layers(self):
+        canvas = LayeredCanvas(640, 360)
+        journal = StrokeJournal(self.path)
+        journal.start(canvas)
+        canvas.add_layer()
+        draw_line(canvas, 50)
+        canvas.erase_all()
+        draw_line(canvas, 100)
+        journal.close()
+
+        self.assertEqual([layer.name for layer in canvas.layers], ["Layer 1"])
+        restored = self.restored()
+        self.assertEqual(layer_state(restored), layer_state(canvas))
+        np.testing.assert_array_equal(restored.board_image(), canvas.board_image())
+
+    def test_layer_state_records(self):
+        for event, data in (('layer_visible', ("Layer 2", False)), ('layer_visible', ("Ink", True)),
+                            ('layer_order', ("Ink", 3))):
+            record = encode_event(event, data)
+            self.assertEqual([(e, d) for e, d, _ in decode_events(record)], [(event, data)])
+            # A torn record is not decoded
+            self.assertEqual(list(decode_events(record[:-1])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from swipe_decoder import SwipeDecoder
+
+ROWS = ("qwertyuiop", "asdfghjkl", "zxcvbnm")
+KEY_CENTERS = {c: (col * 40 + row * 20, row * 50) for row, keys in enumerate(ROWS) for col, c in enumerate(keys)}
+
+
+def swipe(keys):
+    return [KEY_CENTERS[c] for c in keys]
+
+
+class CandidatesTest(unittest.TestCase):
+    def setUp(self):
+        self.decoder = SwipeDecoder(KEY_CENTERS, words=['a', 'as', 'asa', 'cat', 'catt', 'cart', 'to', 'too'])
+
+    def candidates(self, keys):
+        return sorted(self.decoder._candidates(list(keys)))
+
+    def test_word_must_end_on_the_last_key(self):
+        # 'a' starts and ends on 'a', but the path goes on to 's' and back
+        self.assertEqual(self.candidates("asa"), ['asa'])
+        self.assertEqual(self.candidates("as"), ['as'])
+
+    def test_last_letter_matched_at_the_end(self):
+        # The first 't' is passed over; the word ends on the final one
+        self.assertEqual(self.candidates("catat"), ['cat', 'catt'])
+        self.assertEqual(self.candidates("cart"), ['cart', 'cat', 'catt'])
+
+    def test_double_letter_stays_on_key(self):
+        self.assertEqual(self.candidates("to"), ['to', 'too'])
+        self.assertEqual(self.candidates("tot"), [])
+
+
+class DecodeTest(unittest.TestCase):
+    def test_decodes_key_to_key_swipe(self):
+        decoder = SwipeDecoder(KEY_CENTERS)
+        words = [word for word, _ in decoder.decode(swipe("helo"))]
+        self.assertEqual(words[0], 'hello')
+
+    def test_empty_path(self):
+        self.assertEqual(SwipeDecoder(KEY_CENTERS).decode([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()